@@ -1,21 +1,79 @@
 from django.contrib import admin
+from django.http import QueryDict
+
+from apps.core.paginacion import PaginadorConteoEstimado
+
+from . import busqueda, catalogo
 from .models import Cita, Servicio
+from .transiciones import TRANSICIONES, transicion_queryset
 
 # El modelo Servicio en el panel de administración.
 @admin.register(Servicio)
 class ServicioAdmin(admin.ModelAdmin):
     list_display = ['nombre', 'duracion', 'precio']  # Muestra estos campos en la lista de servicios
-    search_fields = ['nombre']  # Permite buscar un servicio por su nombre
+    search_fields = ['nombre']  # Permite buscar un servicio por su nombre (también lo usa el autocompletado de Cita)
     list_filter = ['duracion']  # Filtro rápido para organizar servicios por duración
 
 
+class ServicioFilter(admin.SimpleListFilter):
+    """Filtro por servicio que toma las opciones del catálogo en caché (sin consultar Servicio)."""
+    title = 'servicio'
+    parameter_name = 'servicio__id__exact'
+
+    def lookups(self, request, model_admin):
+        clave = catalogo.clave(catalogo.version(), QueryDict())
+        servicios = catalogo.obtener(clave)
+        if servicios is None:
+            catalogo.precalentar()
+            servicios = catalogo.obtener(clave) or []
+        return [(str(servicio['id']), servicio['nombre']) for servicio in servicios]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(servicio_id=self.value())
+        return queryset
+
+
+def _accion_transicion(accion, descripcion):
+    """Acción del admin que cambia el estado de las citas seleccionadas con un solo UPDATE."""
+
+    def aplicar(modeladmin, request, queryset):
+        cambiadas = transicion_queryset(queryset, accion, empleado=request.user)
+        origen = TRANSICIONES[accion][0]
+        modeladmin.message_user(
+            request, f"{cambiadas} citas actualizadas (solo cambian las que estaban {origen}s)."
+        )
+
+    aplicar.__name__ = accion
+    aplicar.short_description = descripcion
+    aplicar.allowed_permissions = ('change',)
+    return aplicar
+
+
 # Ajustes del modelo Cita dentro del admin.
+# Pensado para tablas grandes: sin consultas por fila, sin COUNT(*) completos
+# y sin <select> con todos los usuarios o servicios.
 @admin.register(Cita)
 class CitaAdmin(admin.ModelAdmin):
-    list_display = ['servicio', 'cliente', 'fecha', 'hora', 'created_at']  # Campos visibles al listar las citas
-    list_filter = ['fecha', 'servicio', 'created_at']  # Filtros para encontrar citas según fecha o servicio
-    search_fields = ['cliente__username', 'cliente__email', 'servicio__nombre']  # Búsqueda por cliente o nombre del servicio
+    list_display = ['servicio', 'cliente', 'fecha', 'hora', 'estado', 'empleado', 'created_at']  # Campos visibles al listar las citas
+    list_select_related = ['servicio', 'cliente', 'empleado']  # Un solo JOIN en lugar de una consulta por fila
+    list_filter = ['estado', ServicioFilter]  # La fecha se navega con date_hierarchy
+    date_hierarchy = 'fecha'  # Usa el índice (fecha, hora, id)
+    search_fields = ['cliente__username', 'cliente__first_name', 'cliente__last_name', 'cliente__email', 'servicio__nombre']  # Documento de búsqueda indexado
     readonly_fields = ['created_at']  # Evita que la fecha de creación sea modificada
     ordering = ['-fecha', '-hora']  # Muestra primero las citas más recientes
+    autocomplete_fields = ['servicio']  # Búsqueda en lugar de un <select> con todos los servicios
+    raw_id_fields = ['cliente', 'empleado']  # Solo el id: la tabla de usuarios puede ser enorme
+    paginator = PaginadorConteoEstimado
+    show_full_result_count = False  # Evita un segundo COUNT(*) de toda la tabla al filtrar
+    actions = [
+        _accion_transicion('aprobar', "Aprobar las citas pendientes seleccionadas"),
+        _accion_transicion('rechazar', "Rechazar las citas pendientes seleccionadas"),
+        _accion_transicion('completar', "Completar las citas aprobadas seleccionadas"),
+    ]
 
-
+    def get_search_results(self, request, queryset, search_term):
+        """Busca en el documento indexado de la cita (ver busqueda.py) en lugar de hacer joins con icontains."""
+        if not search_term.strip():
+            return queryset, False
+        return busqueda.filtrar(queryset, search_term), False
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class CitasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'  # ID automático tipo BigInteger que guarda números enteros grandes.
     name = 'apps.citas'  # Ruta de la app dentro del proyecto
+
+    def ready(self):
+        """Conecta las señales de la app, los índices de búsqueda y el precalentado del catálogo."""
+        from django.db.models.signals import post_migrate
+        from . import signals
+
+        post_migrate.connect(signals.instalar_indices_busqueda, sender=self)
+        # Se precalienta después de migrate (build.sh) y no aquí, porque Django
+        # desaconseja consultar la base de datos durante ready(). Sin caché
+        # compartida lo llena la primera petición al catálogo (ServicioViewSet.list)
+        post_migrate.connect(signals.precalentar_catalogo, sender=self)
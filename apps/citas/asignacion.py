@@ -0,0 +1,85 @@
+"""
+Asignación automática de empleados a las citas.
+
+Reparte las citas pendientes y aprobadas de un rango de fechas entre los
+empleados activos (is_staff). Lee todas las citas del rango en una consulta,
+arma en memoria la agenda de cada empleado (Intervalos) y recorre las citas
+en orden de inicio: cada una va al empleado libre con menos minutos asignados.
+Los resultados se escriben con un solo bulk_update.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .intervalos import Intervalos
+from .models import Cita
+
+
+# Estados de las citas que el motor puede asignar
+ESTADOS_ASIGNABLES = ('pendiente', 'aprobada')
+
+
+def asignar_empleados(desde, hasta, reasignar=False):
+    """
+    Asigna empleado a las citas asignables entre dos fechas (incluidas).
+    - reasignar=False: solo las citas sin empleado; las asignadas se respetan.
+    - reasignar=True: vuelve a repartir también las asignables que ya tenían
+      empleado; las que no entran en ninguna agenda quedan sin empleado (su
+      horario anterior pudo pasar a otra cita) y se informan en sin_empleado.
+    Retorna {'asignadas': n, 'sin_empleado': [ids], 'por_empleado': {id: n}}.
+    """
+    empleados = list(
+        get_user_model().objects.filter(is_staff=True, is_active=True).order_by('pk').values_list('pk', flat=True)
+    )
+    agendas = {pk: Intervalos() for pk in empleados}
+    carga = dict.fromkeys(empleados, 0)
+
+    with transaction.atomic():
+        citas = (
+            Cita.objects
+            .select_for_update()
+            .filter(fecha__gte=desde, fecha__lte=hasta)
+            .exclude(estado__in=Cita.ESTADOS_INACTIVOS)
+            .order_by('inicio', 'id')
+            .values_list('id', 'empleado_id', 'estado', 'inicio', 'fin')
+        )
+
+        # 1. Las citas que se respetan ocupan la agenda de su empleado
+        candidatas = []
+        for pk, empleado_id, estado, inicio, fin in citas:
+            asignable = estado in ESTADOS_ASIGNABLES and (empleado_id is None or reasignar)
+            if asignable:
+                candidatas.append((pk, empleado_id, inicio, fin))
+            elif empleado_id in agendas and inicio is not None:
+                agendas[empleado_id].agregar(inicio, fin)
+                carga[empleado_id] += (fin - inicio).total_seconds() // 60
+
+        # 2. Cada candidata va al empleado libre con menos carga
+        cambios = []
+        sin_empleado = []
+        por_empleado = dict.fromkeys(empleados, 0)
+        for pk, anterior, inicio, fin in candidatas:
+            libres = [] if inicio is None else [e for e in empleados if not agendas[e].se_cruza(inicio, fin)]
+            if not libres:
+                sin_empleado.append(pk)
+                if anterior is not None:
+                    cambios.append(Cita(pk=pk, empleado_id=None))
+                continue
+            elegido = min(libres, key=lambda e: (carga[e], e))
+            agendas[elegido].agregar(inicio, fin)
+            carga[elegido] += (fin - inicio).total_seconds() // 60
+            por_empleado[elegido] += 1
+            if elegido != anterior:
+                cambios.append(Cita(pk=pk, empleado_id=elegido))
+
+        # 3. Una sola escritura (bulk_update no llena auto_now: se pone updated_at a mano)
+        ahora = timezone.now()
+        for cita in cambios:
+            cita.updated_at = ahora
+        Cita.objects.bulk_update(cambios, ['empleado', 'updated_at'])
+
+    return {
+        'asignadas': len(candidatas) - len(sin_empleado),
+        'sin_empleado': sin_empleado,
+        'por_empleado': {pk: n for pk, n in por_empleado.items() if n},
+    }
@@ -0,0 +1,188 @@
+"""
+Búsqueda indexada de Citas y Servicios.
+
+Cada fila guarda un documento de búsqueda (campo `busqueda`) con el texto de
+sus CAMPOS_BUSQUEDA ya normalizado: minúsculas y sin acentos. Así una búsqueda
+filtra una sola columna de la propia tabla, sin joins, y esa columna se puede
+indexar:
+
+- PostgreSQL: índice GIN de trigramas (pg_trgm), que sirve a LIKE '%x%'.
+- SQLite: tabla virtual FTS5 con tokenizador trigram, sincronizada por triggers.
+- Otros motores: LIKE sobre la columna del documento.
+
+Los índices se instalan en post_migrate y no en una migración: en SQLite
+cualquier migración que reconstruya la tabla borra sus triggers, y así se
+vuelven a crear (y el índice se reconstruye) en el siguiente migrate.
+"""
+import logging
+import unicodedata
+
+from django.db import DatabaseError, connections
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from rest_framework.filters import SearchFilter
+
+logger = logging.getLogger(__name__)
+
+# FTS5 con trigramas no encuentra términos de menos de 3 caracteres
+LONGITUD_MINIMA_FTS = 3
+
+LOTE_SINCRONIZACION = 1000
+
+# Índices de PostgreSQL; también habilitan la extensión pg_trgm si falta
+SQL_TRIGRAMAS = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS {tabla}_busqueda_trgm ON {tabla} USING gin (busqueda gin_trgm_ops)",
+)
+
+# Tabla FTS5 de contenido externo: guarda solo el índice, el texto sigue en la tabla original
+SQL_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+    "busqueda, content='{tabla}', content_rowid='id', tokenize='trigram')",
+    "DROP TRIGGER IF EXISTS {fts}_ai",
+    "DROP TRIGGER IF EXISTS {fts}_ad",
+    "DROP TRIGGER IF EXISTS {fts}_au",
+    "CREATE TRIGGER {fts}_ai AFTER INSERT ON {tabla} BEGIN "
+    "INSERT INTO {fts}(rowid, busqueda) VALUES (new.id, new.busqueda); END",
+    "CREATE TRIGGER {fts}_ad AFTER DELETE ON {tabla} BEGIN "
+    "INSERT INTO {fts}({fts}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda); END",
+    "CREATE TRIGGER {fts}_au AFTER UPDATE OF busqueda ON {tabla} BEGIN "
+    "INSERT INTO {fts}({fts}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda); "
+    "INSERT INTO {fts}(rowid, busqueda) VALUES (new.id, new.busqueda); END",
+    "INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+)
+
+# Tablas FTS ya verificadas por conexión: (alias, nombre de la base, tabla)
+_fts_verificadas = set()
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos: 'Pérez' -> 'perez'."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def _valor(objeto, campo):
+    """Sigue un camino 'cliente__first_name' sobre instancias o dicts de values()."""
+    if isinstance(objeto, dict):
+        return objeto[campo]
+    for parte in campo.split('__'):
+        objeto = getattr(objeto, parte, None)
+        if objeto is None:
+            return None
+    return objeto
+
+
+def documento(objeto, campos):
+    """Documento de búsqueda de una instancia o de una fila de values()."""
+    return ' '.join(normalizar(valor) for valor in (_valor(objeto, campo) for campo in campos) if valor)
+
+
+def sincronizar(queryset):
+    """
+    Recalcula el documento de las filas del queryset y guarda solo los que cambiaron.
+    Se usa cuando cambia un dato de otra tabla que forma parte del documento
+    (nombre del cliente, nombre del servicio).
+    """
+    modelo = queryset.model
+    campos = modelo.CAMPOS_BUSQUEDA
+    actualizar = ['busqueda']
+    extra = {}
+    if any(campo.name == 'updated_at' for campo in modelo._meta.concrete_fields):
+        # El cambio también modifica la representación de la fila: invalida su ETag
+        actualizar.append('updated_at')
+        extra['updated_at'] = timezone.now()
+
+    pendientes = []
+    total = 0
+    for fila in queryset.order_by().values('pk', 'busqueda', *campos).iterator(chunk_size=LOTE_SINCRONIZACION):
+        nuevo = documento(fila, campos)
+        if nuevo == fila['busqueda']:
+            continue
+        pendientes.append(modelo(pk=fila['pk'], busqueda=nuevo, **extra))
+        if len(pendientes) >= LOTE_SINCRONIZACION:
+            total += modelo.objects.bulk_update(pendientes, actualizar)
+            pendientes = []
+    if pendientes:
+        total += modelo.objects.bulk_update(pendientes, actualizar)
+    return total
+
+
+def _tabla_fts(modelo):
+    return f"{modelo._meta.db_table}_fts"
+
+
+def instalar_indices(modelos, using='default'):
+    """Crea los índices de búsqueda del motor (idempotente)."""
+    connection = connections[using]
+    for modelo in modelos:
+        tabla = modelo._meta.db_table
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    for sql in SQL_TRIGRAMAS:
+                        cursor.execute(sql.format(tabla=tabla))
+                elif connection.vendor == 'sqlite':
+                    fts = _tabla_fts(modelo)
+                    cursor.execute(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = %s", [f"{fts}_au"]
+                    )
+                    if cursor.fetchone() is None:
+                        for sql in SQL_FTS:
+                            cursor.execute(sql.format(tabla=tabla, fts=fts))
+        except DatabaseError as e:
+            # Sin índice la búsqueda sigue funcionando con LIKE sobre el documento
+            logger.warning(f"No se pudo crear el índice de búsqueda de {tabla}: {e}")
+
+
+def _fts_disponible(connection, modelo):
+    clave = (connection.alias, connection.settings_dict['NAME'], _tabla_fts(modelo))
+    if clave in _fts_verificadas:
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = %s", [f"{_tabla_fts(modelo)}_au"]
+        )
+        existe = cursor.fetchone() is not None
+    if existe:
+        _fts_verificadas.add(clave)
+    return existe
+
+
+def filtrar(queryset, texto):
+    """Filtra el queryset con todos los términos del texto (AND), usando el índice del motor."""
+    terminos = [normalizar(termino) for termino in texto.split()]
+    return filtrar_terminos(queryset, [termino for termino in terminos if termino])
+
+
+def filtrar_terminos(queryset, terminos):
+    connection = connections[queryset.db]
+    largos = [termino for termino in terminos if len(termino) >= LONGITUD_MINIMA_FTS]
+
+    if largos and connection.vendor == 'sqlite' and _fts_disponible(connection, queryset.model):
+        fts = connection.ops.quote_name(_tabla_fts(queryset.model))
+        # Cada término va como frase entre comillas: coincide como subcadena
+        consulta = ' AND '.join('"{}"'.format(termino.replace('"', '""')) for termino in largos)
+        queryset = queryset.filter(pk__in=RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", [consulta]))
+        terminos = [termino for termino in terminos if len(termino) < LONGITUD_MINIMA_FTS]
+
+    for termino in terminos:
+        queryset = queryset.filter(busqueda__contains=termino)
+    return queryset
+
+
+class BusquedaIndexada(SearchFilter):
+    """
+    SearchFilter que busca en el documento indexado del modelo.
+    Usa el mismo parámetro (?search=) y separa los términos igual que SearchFilter;
+    los modelos sin CAMPOS_BUSQUEDA siguen con la búsqueda de search_fields.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if not hasattr(queryset.model, 'CAMPOS_BUSQUEDA'):
+            return super().filter_queryset(request, queryset, view)
+        terminos = [normalizar(termino) for termino in self.get_search_terms(request)]
+        terminos = [termino for termino in terminos if termino]
+        if not terminos:
+            return queryset
+        return filtrar_terminos(queryset, terminos)
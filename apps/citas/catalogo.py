@@ -0,0 +1,89 @@
+"""
+Caché del catálogo de Servicios.
+
+El catálogo cambia poco y lo piden todas las pantallas. Cada combinación de
+filtros, búsqueda y orden se guarda ya serializada en la caché de Django bajo
+una "versión" del catálogo. Guardar o borrar un Servicio cambia la versión
+(señales post_save/post_delete), lo que invalida de una vez todas las
+entradas y todos los ETag entregados a los clientes.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import QueryDict
+
+from .models import Servicio
+from .serializers import ServicioSerializer
+
+
+CLAVE_VERSION = 'citas:catalogo:version'
+
+# Parámetros que no cambian el contenido del catálogo, solo la página que se muestra
+PARAMETROS_PAGINA = ('page', 'page_size', 'format')
+
+
+def _timeout():
+    return getattr(settings, 'CITAS_CATALOGO_TIMEOUT', 3600)
+
+
+def version():
+    """Versión actual del catálogo (se crea si no existe)."""
+    return cache.get_or_set(CLAVE_VERSION, lambda: str(time.time_ns()), timeout=None)
+
+
+async def aversion():
+    """version() con la API asíncrona de la caché (vistas del modo ASGI)."""
+    return await cache.aget_or_set(CLAVE_VERSION, lambda: str(time.time_ns()), timeout=None)
+
+
+def invalidar():
+    """Cambia la versión: las entradas y ETag anteriores dejan de ser válidos."""
+    cache.set(CLAVE_VERSION, str(time.time_ns()), timeout=None)
+
+
+def _resumen(*partes):
+    return hashlib.md5('|'.join(partes).encode()).hexdigest()
+
+
+def _parametros(query_params, excluir=()):
+    return urlencode(sorted(
+        (clave, valor)
+        for clave in query_params
+        if clave not in excluir
+        for valor in query_params.getlist(clave)
+    ))
+
+
+def clave(version_actual, query_params):
+    """Clave de caché para los filtros, búsqueda y orden pedidos (sin paginación)."""
+    return f"citas:catalogo:{version_actual}:{_resumen(_parametros(query_params, PARAMETROS_PAGINA))}"
+
+
+def etag(version_actual, request):
+    """ETag de la respuesta completa: versión del catálogo + host + todos los parámetros."""
+    return f'"{_resumen(version_actual, request.get_host(), _parametros(request.query_params))}"'
+
+
+def obtener(clave_catalogo):
+    return cache.get(clave_catalogo)
+
+
+def guardar(clave_catalogo, datos):
+    cache.set(clave_catalogo, list(datos), timeout=_timeout())
+
+
+async def aobtener(clave_catalogo):
+    return await cache.aget(clave_catalogo)
+
+
+async def aguardar(clave_catalogo, datos):
+    await cache.aset(clave_catalogo, list(datos), timeout=_timeout())
+
+
+def precalentar():
+    """Guarda el catálogo por defecto (sin filtros) para que la primera petición no consulte la base de datos."""
+    datos = ServicioSerializer(Servicio.objects.all(), many=True).data
+    guardar(clave(version(), QueryDict()), datos)
@@ -0,0 +1,72 @@
+"""
+Peticiones condicionales (ETag / Last-Modified) para las citas.
+
+El detalle usa el updated_at de la cita; los listados usan MAX(updated_at)
+y COUNT(*) del queryset filtrado, que se calculan con una sola consulta
+agregada. Si el cliente ya tiene la versión vigente recibe un 304 sin que
+se serialice nada.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from . import catalogo
+
+RESUMEN_LISTA = {'ultimo': Max('updated_at'), 'total': Count('id')}
+
+
+def _etag(*partes):
+    return '"%s"' % hashlib.md5('|'.join(str(parte) for parte in partes).encode()).hexdigest()
+
+
+def validadores_cita(request, pk, updated_at):
+    """ETag y Last-Modified del detalle de una cita."""
+    # La versión del catálogo cubre cambios en el servicio anidado (servicio_detalle)
+    etag = _etag(pk, updated_at.isoformat(), catalogo.version())
+    return etag, updated_at
+
+
+def validadores_lista(request, queryset):
+    """ETag y Last-Modified de un listado a partir de MAX(updated_at) + COUNT(*)."""
+    return _validadores_lista(request, queryset.order_by().aggregate(**RESUMEN_LISTA), catalogo.version())
+
+
+async def avalidadores_lista(request, queryset):
+    """validadores_lista() con el ORM asíncrono (vistas del modo ASGI)."""
+    resumen = await queryset.order_by().aaggregate(**RESUMEN_LISTA)
+    return _validadores_lista(request, resumen, await catalogo.aversion())
+
+
+def _validadores_lista(request, resumen, version_catalogo):
+    ultimo = resumen['ultimo']
+    etag = _etag(
+        request.user.pk,
+        request.get_full_path(),
+        ultimo.isoformat() if ultimo else '',
+        resumen['total'],
+        version_catalogo,
+    )
+    return etag, ultimo
+
+
+def respuesta_no_modificada(request, etag, ultimo=None):
+    """
+    Devuelve un 304 si el cliente ya tiene la versión vigente, o None.
+    Para listados no se pasa `ultimo`: MAX(updated_at) no cambia al borrar
+    una cita, así que solo el ETag (que incluye el conteo) es confiable.
+    """
+    return get_conditional_response(
+        request._request,
+        etag=etag,
+        last_modified=int(ultimo.timestamp()) if ultimo else None,
+    )
+
+
+def marcar(response, etag, ultimo):
+    """Agrega ETag y Last-Modified a la respuesta."""
+    response['ETag'] = etag
+    if ultimo:
+        response['Last-Modified'] = http_date(ultimo.timestamp())
+    return response
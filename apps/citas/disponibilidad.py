@@ -0,0 +1,154 @@
+"""
+Motor de disponibilidad de Citas.
+
+Calcula los horarios libres de un Servicio para un rango de fechas con una
+sola consulta a la base de datos. La ocupación de cada día se guarda en un
+mapa de bits (un entero de Python donde cada bit es un minuto del día), así
+comprobar si un horario está libre es una operación AND sobre enteros.
+"""
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Cita
+
+
+def _a_minutos(hora):
+    """Convierte una hora (time) en minutos desde la medianoche."""
+    return hora.hour * 60 + hora.minute
+
+
+def _a_hora(minutos):
+    """Convierte minutos desde la medianoche en una hora (time)."""
+    return time(minutos // 60, minutos % 60)
+
+
+def horario_laboral():
+    """Devuelve (apertura, cierre) en minutos según la configuración."""
+    apertura = time.fromisoformat(getattr(settings, 'CITAS_HORARIO_INICIO', '08:00'))
+    cierre = time.fromisoformat(getattr(settings, 'CITAS_HORARIO_FIN', '18:00'))
+    return _a_minutos(apertura), _a_minutos(cierre)
+
+
+def ocupacion_por_dia(servicio, desde, hasta):
+    """
+    Construye el mapa de ocupación {fecha: bitmap} de un servicio.
+    Una única consulta (índice servicio, fecha, hora) trae las citas activas
+    del rango; cada cita marca los minutos que ocupa según su rango
+    materializado (o la duración actual del servicio si no lo tiene).
+    """
+    ocupacion = {}
+
+    citas = (
+        Cita.objects
+        .filter(servicio=servicio, fecha__gte=desde, fecha__lte=hasta)
+        .exclude(estado__in=Cita.ESTADOS_INACTIVOS)
+        .order_by()
+        .values_list('fecha', 'hora', 'inicio', 'fin')
+    )
+    for fecha, hora, inicio, fin in citas:
+        duracion = int((fin - inicio).total_seconds() // 60) if inicio and fin else servicio.duracion
+        mascara = (1 << duracion) - 1
+        ocupacion[fecha] = ocupacion.get(fecha, 0) | (mascara << _a_minutos(hora))
+    return ocupacion
+
+
+def horarios_libres(servicio, desde, hasta, ahora=None):
+    """
+    Lista los horarios libres del servicio entre dos fechas (incluidas).
+    Retorna una lista de {'fecha': date, 'horarios': [time, ...]} por día.
+    Los horarios que ya pasaron no se ofrecen.
+    """
+    ahora = ahora or timezone.localtime()
+    apertura, cierre = horario_laboral()
+    duracion = servicio.duracion
+    paso = max(getattr(settings, 'CITAS_INTERVALO_MINUTOS', None) or duracion, 1)
+    mascara = (1 << duracion) - 1
+
+    ocupacion = ocupacion_por_dia(servicio, desde, hasta)
+
+    dias = []
+    fecha = desde
+    while fecha <= hasta:
+        # Primer minuto que todavía se puede reservar ese día
+        if fecha < ahora.date():
+            minimo = cierre
+        elif fecha == ahora.date():
+            minimo = _a_minutos(ahora.time()) + 1
+        else:
+            minimo = apertura
+
+        ocupado = ocupacion.get(fecha, 0)
+        horarios = []
+        inicio = apertura
+        while inicio + duracion <= cierre:
+            if inicio >= minimo and not ocupado & (mascara << inicio):
+                horarios.append(_a_hora(inicio))
+            inicio += paso
+
+        dias.append({'fecha': fecha, 'horarios': horarios})
+        fecha += timedelta(days=1)
+    return dias
+
+
+def _texto_hora(minutos):
+    """Minutos desde la medianoche como 'HH:MM' (admite pasar de medianoche: '24:30')."""
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def agenda_empleado(empleado_id, desde, hasta):
+    """
+    Agenda de un empleado entre dos fechas (incluidas), con los huecos libres.
+    Una sola consulta sobre el índice (empleado, fecha, hora) trae las citas
+    activas ya ordenadas, con el nombre del servicio y del cliente en la misma fila.
+    Retorna [{'fecha': date, 'bloques': [...]}, ...] con un bloque 'cita' por cita
+    y un bloque 'libre' por cada hueco dentro del horario laboral.
+    """
+    apertura, cierre = horario_laboral()
+
+    citas = (
+        Cita.objects
+        .filter(empleado_id=empleado_id, fecha__gte=desde, fecha__lte=hasta)
+        .exclude(estado__in=Cita.ESTADOS_INACTIVOS)
+        .order_by('fecha', 'hora')
+        .values_list(
+            'id', 'fecha', 'hora', 'inicio', 'fin', 'estado',
+            'servicio_id', 'servicio__nombre', 'servicio__duracion',
+            'cliente_id', 'cliente__first_name', 'cliente__last_name',
+        )
+    )
+    por_dia = {}
+    for (pk, fecha, hora, inicio, fin, estado, servicio_id, servicio_nombre, duracion,
+         cliente_id, nombre, apellido) in citas:
+        desde_minuto = _a_minutos(hora)
+        if inicio and fin:
+            duracion = int((fin - inicio).total_seconds() // 60)
+        por_dia.setdefault(fecha, []).append({
+            'tipo': 'cita',
+            'id': pk,
+            'inicio': desde_minuto,
+            'fin': desde_minuto + duracion,
+            'estado': estado,
+            'servicio': servicio_id,
+            'servicio_nombre': servicio_nombre,
+            'cliente': cliente_id,
+            'cliente_nombre': f"{nombre} {apellido}".strip(),
+        })
+
+    dias = []
+    fecha = desde
+    while fecha <= hasta:
+        bloques = []
+        cursor = apertura
+        for cita in por_dia.get(fecha, []):
+            if cita['inicio'] > cursor:
+                bloques.append({'tipo': 'libre', 'inicio': _texto_hora(cursor), 'fin': _texto_hora(cita['inicio'])})
+            cursor = max(cursor, cita['fin'])
+            bloques.append({**cita, 'inicio': _texto_hora(cita['inicio']), 'fin': _texto_hora(cita['fin'])})
+        if cursor < cierre:
+            bloques.append({'tipo': 'libre', 'inicio': _texto_hora(cursor), 'fin': _texto_hora(cierre)})
+
+        dias.append({'fecha': fecha, 'bloques': bloques})
+        fecha += timedelta(days=1)
+    return dias
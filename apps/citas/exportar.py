@@ -0,0 +1,84 @@
+"""
+Exportación de citas en CSV o NDJSON.
+
+Las filas se leen con queryset.iterator() y se escriben a medida que llegan
+con StreamingHttpResponse: la memoria se mantiene constante sin importar el
+tamaño de la exportación y el cliente recibe los primeros bytes de inmediato.
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+
+# Columnas exportadas: (nombre en la exportación, campo de values())
+COLUMNAS = (
+    ('id', 'id'),
+    ('fecha', 'fecha'),
+    ('hora', 'hora'),
+    ('estado', 'estado'),
+    ('cliente', 'cliente_id'),
+    ('cliente_nombre', None),
+    ('servicio', 'servicio_id'),
+    ('servicio_nombre', 'servicio__nombre'),
+    ('empleado', 'empleado_id'),
+    ('created_at', 'created_at'),
+)
+
+CAMPOS = [campo for _, campo in COLUMNAS if campo] + ['cliente__first_name', 'cliente__last_name']
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _filas(queryset):
+    """Recorre el queryset por bloques y produce un dict por cita."""
+    chunk_size = getattr(settings, 'CITAS_EXPORTAR_CHUNK_SIZE', 2000)
+    for valores in queryset.values(*CAMPOS).iterator(chunk_size=chunk_size):
+        nombre = f"{valores['cliente__first_name']} {valores['cliente__last_name']}".strip()
+        yield {
+            columna: nombre if campo is None else valores[campo]
+            for columna, campo in COLUMNAS
+        }
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return valor
+
+
+def _csv(queryset):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([columna for columna, _ in COLUMNAS])
+    for fila in _filas(queryset):
+        yield escritor.writerow([_texto(valor) for valor in fila.values()])
+
+
+def _ndjson(queryset):
+    for fila in _filas(queryset):
+        yield json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+FORMATOS = {
+    'csv': (_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (_ndjson, 'application/x-ndjson; charset=utf-8'),
+}
+
+
+def respuesta_exportacion(queryset, formato):
+    """Construye la StreamingHttpResponse de la exportación en el formato pedido."""
+    generador, content_type = FORMATOS[formato]
+    response = StreamingHttpResponse(generador(queryset), content_type=content_type)
+    nombre = f"citas_{timezone.localdate().isoformat()}.{formato}"
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return response
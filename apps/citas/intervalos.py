@@ -0,0 +1,37 @@
+"""
+Índice en memoria de intervalos ocupados.
+
+Se usa para validar muchas citas contra la agenda de un servicio o de un
+empleado sin hacer una consulta por cita.
+"""
+from bisect import bisect_left
+
+
+class Intervalos:
+    """
+    Intervalos [inicio, fin) ocupados, ordenados por inicio.
+    Al agregar se fusionan los que se cruzan o se tocan, así los guardados
+    nunca se solapan y basta mirar el último que empieza antes de un `fin`.
+    """
+
+    def __init__(self):
+        self.inicios = []
+        self.fines = []
+
+    def agregar(self, inicio, fin):
+        pos = bisect_left(self.inicios, inicio)
+        if pos > 0 and self.fines[pos - 1] >= inicio:
+            pos -= 1
+            inicio = self.inicios[pos]
+            fin = max(fin, self.fines[pos])
+        hasta = pos
+        while hasta < len(self.inicios) and self.inicios[hasta] <= fin:
+            fin = max(fin, self.fines[hasta])
+            hasta += 1
+        self.inicios[pos:hasta] = [inicio]
+        self.fines[pos:hasta] = [fin]
+
+    def se_cruza(self, inicio, fin):
+        # Los intervalos están fusionados (no se cruzan entre sí): basta mirar el último que empieza antes de `fin`
+        pos = bisect_left(self.inicios, fin)
+        return pos > 0 and self.fines[pos - 1] > inicio
@@ -0,0 +1,125 @@
+"""
+Reserva de citas por lote.
+
+Valida todas las citas de la petición contra la base de datos con unas pocas
+consultas por conjunto (servicios, clientes y citas existentes de esos días)
+y las inserta con un solo bulk_create dentro de una transacción.
+Cada elemento del lote recibe su propio resultado o error.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .intervalos import Intervalos
+from .models import Cita, Servicio
+from .serializers import CitaLoteItemSerializer
+
+
+def reservar_lote(items, usuario):
+    """
+    Crea las citas válidas de `items` (lista de dicts) para `usuario`.
+    Retorna (resultados, creadas) donde resultados tiene un dict por elemento
+    en el mismo orden de entrada.
+    """
+    resultados = [None] * len(items)
+    validos = []
+
+    # 1. Validación de formato, sin consultas
+    for indice, item in enumerate(items):
+        serializer = CitaLoteItemSerializer(data=item)
+        if not serializer.is_valid():
+            resultados[indice] = {"indice": indice, "estado": "error", "errores": serializer.errors}
+        else:
+            validos.append((indice, serializer.validated_data))
+
+    # 2. Servicios y clientes del lote en una consulta cada uno
+    servicios = Servicio.objects.in_bulk({datos['servicio'] for _, datos in validos})
+    ids_clientes = {datos['cliente'] for _, datos in validos if 'cliente' in datos}
+    clientes = get_user_model().objects.in_bulk(ids_clientes) if usuario.is_staff and ids_clientes else {}
+
+    ahora = timezone.now()
+    candidatas = []
+    for indice, datos in validos:
+        errores = {}
+        servicio = servicios.get(datos['servicio'])
+        cliente = usuario
+        if servicio is None:
+            errores['servicio'] = ["El servicio no existe."]
+        if 'cliente' in datos:
+            if not usuario.is_staff:
+                errores['cliente'] = ["Solo empleados pueden reservar para otro cliente."]
+            else:
+                cliente = clientes.get(datos['cliente'])
+                if cliente is None:
+                    errores['cliente'] = ["El cliente no existe."]
+        if servicio is not None:
+            inicio, fin = Cita.rango_horario(datos['fecha'], datos['hora'], servicio.duracion)
+            if inicio < ahora:
+                errores['fecha'] = ["No se pueden crear citas en el pasado."]
+        if errores:
+            resultados[indice] = {"indice": indice, "estado": "error", "errores": errores}
+            continue
+
+        cita = Cita(
+            fecha=datos['fecha'],
+            hora=datos['hora'],
+            notas=datos.get('notas'),
+            servicio=servicio,
+            cliente=cliente,
+            inicio=inicio,
+            fin=fin,
+        )
+        cita.calcular_busqueda()
+        candidatas.append((indice, cita))
+
+    creadas = []
+    if candidatas:
+        with transaction.atomic():
+            # 3. Bloquear los servicios del lote y traer sus citas activas de esos días
+            ids_servicios = {cita.servicio_id for _, cita in candidatas}
+            list(Servicio.objects.select_for_update().filter(pk__in=ids_servicios).values_list('pk', flat=True))
+            existentes = (
+                Cita.objects
+                .filter(servicio_id__in=ids_servicios, fecha__in={cita.fecha for _, cita in candidatas})
+                .exclude(estado__in=Cita.ESTADOS_INACTIVOS)
+                .order_by()
+                .values_list('servicio_id', 'inicio', 'fin')
+            )
+            agendas = {pk: Intervalos() for pk in ids_servicios}
+            for servicio_id, inicio, fin in existentes:
+                if inicio is not None:
+                    agendas[servicio_id].agregar(inicio, fin)
+
+            # 4. Cruces contra lo existente y contra el resto del lote
+            for indice, cita in candidatas:
+                agenda = agendas[cita.servicio_id]
+                if agenda.se_cruza(cita.inicio, cita.fin):
+                    resultados[indice] = {
+                        "indice": indice,
+                        "estado": "error",
+                        "errores": {"hora": ["El horario se cruza con otra cita del mismo servicio."]},
+                    }
+                    continue
+                agenda.agregar(cita.inicio, cita.fin)
+                creadas.append((indice, cita))
+
+            Cita.objects.bulk_create([cita for _, cita in creadas])
+
+        if creadas and not connection.features.can_return_rows_from_bulk_insert:
+            _asignar_ids(cita for _, cita in creadas)
+
+    return resultados, creadas
+
+
+def _asignar_ids(citas):
+    """Recupera los ids de las citas creadas en motores sin RETURNING (MySQL)."""
+    citas = list(citas)
+    filas = (
+        Cita.objects
+        .filter(servicio_id__in={c.servicio_id for c in citas}, inicio__in={c.inicio for c in citas})
+        .exclude(estado__in=Cita.ESTADOS_INACTIVOS)
+        .values_list('pk', 'servicio_id', 'inicio')
+    )
+    ids = {(servicio_id, inicio): pk for pk, servicio_id, inicio in filas}
+    for cita in citas:
+        cita.pk = ids.get((cita.servicio_id, cita.inicio))
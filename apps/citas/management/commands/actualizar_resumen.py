@@ -0,0 +1,25 @@
+"""
+Pone al día el resumen diario de citas (ResumenDiario) que usan los reportes.
+
+Uso:
+    python manage.py actualizar_resumen
+
+Se corre de forma periódica (cron, p. ej. cada hora): el endpoint de
+reportes solo lee y agrega sobre Cita los días que el resumen todavía no
+cubre, así que cuanto más al día esté, menos citas recorre cada reporte.
+"""
+import time as reloj
+
+from django.core.management.base import BaseCommand
+
+from apps.citas.reportes import actualizar_resumen
+
+
+class Command(BaseCommand):
+    help = "Resume los días cerrados y los que cambiaron desde la última actualización."
+
+    def handle(self, *args, **options):
+        t0 = reloj.perf_counter()
+        filas = actualizar_resumen()
+        duracion = (reloj.perf_counter() - t0) * 1000
+        self.stdout.write(self.style.SUCCESS(f"{filas} filas de resumen escritas en {duracion:.0f} ms."))
@@ -0,0 +1,45 @@
+"""
+Asigna empleados a las citas pendientes y aprobadas de un rango de fechas.
+
+Uso:
+    python manage.py asignar_empleados --desde 2026-10-18 --hasta 2026-10-18
+    python manage.py asignar_empleados --reasignar   # mañana, repartiendo de nuevo
+"""
+import time as reloj
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.citas.asignacion import asignar_empleados
+
+
+class Command(BaseCommand):
+    help = "Reparte entre los empleados las citas pendientes y aprobadas de un rango de fechas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="YYYY-MM-DD (por defecto mañana)")
+        parser.add_argument('--hasta', help="YYYY-MM-DD (por defecto igual a --desde)")
+        parser.add_argument('--reasignar', action='store_true',
+                            help="Repartir también las citas que ya tienen empleado")
+
+    def handle(self, *args, **options):
+        try:
+            desde = date.fromisoformat(options['desde'] or (timezone.localdate() + timedelta(days=1)).isoformat())
+            hasta = date.fromisoformat(options['hasta'] or desde.isoformat())
+        except ValueError:
+            raise CommandError("Las fechas deben tener formato YYYY-MM-DD.")
+
+        t0 = reloj.perf_counter()
+        resultado = asignar_empleados(desde, hasta, reasignar=options['reasignar'])
+        duracion = (reloj.perf_counter() - t0) * 1000
+
+        for empleado, cantidad in resultado['por_empleado'].items():
+            self.stdout.write(f"Empleado {empleado}: {cantidad} citas")
+        if resultado['sin_empleado']:
+            self.stdout.write(self.style.WARNING(
+                f"{len(resultado['sin_empleado'])} citas sin empleado libre: {resultado['sin_empleado']}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['asignadas']} citas asignadas entre {desde} y {hasta} en {duracion:.0f} ms."
+        ))
@@ -0,0 +1,82 @@
+"""
+Compara el tiempo de CitaSerializer(many=True) contra CitaLecturaRapida.
+
+Uso:
+    python manage.py benchmark_lectura --filas 500 --repeticiones 20
+
+Crea los datos de prueba dentro de una transacción que se revierte al final,
+así que no deja nada en la base de datos.
+"""
+import statistics
+import time as reloj
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from apps.citas.models import Cita, Servicio
+from apps.citas.serializers import CitaSerializer, CitaLecturaRapida
+
+
+class _Revertir(Exception):
+    """Se lanza para deshacer los datos de prueba."""
+
+
+class Command(BaseCommand):
+    help = "Mide la serialización de listados de citas: CitaSerializer vs CitaLecturaRapida."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=500)
+        parser.add_argument('--repeticiones', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._medir(options['filas'], options['repeticiones'])
+                raise _Revertir
+        except _Revertir:
+            pass
+
+    def _crear_datos(self, filas):
+        cliente = get_user_model().objects.create_user(
+            username='benchmark_lectura', first_name='Ana', last_name='Pérez'
+        )
+        servicio = Servicio.objects.create(nombre='Benchmark lectura', duracion=30, precio='45.50')
+        inicio = date.today() + timedelta(days=1)
+        citas = []
+        for i in range(filas):
+            fecha = inicio + timedelta(days=i // 16)
+            hora = time(8 + (i % 16) // 2, 30 * (i % 2))
+            desde, hasta = Cita.rango_horario(fecha, hora, servicio.duracion)
+            citas.append(Cita(cliente=cliente, servicio=servicio, fecha=fecha, hora=hora,
+                              notas='x' * 200, inicio=desde, fin=hasta))
+        Cita.objects.bulk_create(citas)
+        return Cita.objects.filter(servicio=servicio).order_by('-created_at', 'id')
+
+    def _medir(self, filas, repeticiones):
+        qs = self._crear_datos(filas)
+        renderer = JSONRenderer()
+
+        def clasico():
+            return renderer.render(CitaSerializer(qs.select_related('cliente', 'servicio', 'empleado'), many=True).data)
+
+        def rapido():
+            return renderer.render(CitaLecturaRapida.representar(CitaLecturaRapida.valores(qs)))
+
+        if clasico() != rapido():
+            raise CommandError("La representación rápida no produce el mismo JSON que CitaSerializer.")
+
+        resultados = {}
+        for nombre, funcion in (('CitaSerializer', clasico), ('CitaLecturaRapida', rapido)):
+            tiempos = []
+            for _ in range(repeticiones):
+                t0 = reloj.perf_counter()
+                funcion()
+                tiempos.append((reloj.perf_counter() - t0) * 1000)
+            resultados[nombre] = statistics.median(tiempos)
+            self.stdout.write(f"{nombre:<20} mediana {resultados[nombre]:8.2f} ms  ({filas} filas, consulta + JSON)")
+
+        factor = resultados['CitaSerializer'] / resultados['CitaLecturaRapida']
+        self.stdout.write(self.style.SUCCESS(f"Salida idéntica; la lectura rápida es {factor:.1f}x más rápida."))
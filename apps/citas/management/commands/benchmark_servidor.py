@@ -0,0 +1,237 @@
+"""
+Compara el servidor WSGI (gunicorn con workers sync) contra el modo ASGI
+(gunicorn con workers de uvicorn y las vistas asíncronas de config.urls_asgi),
+con la misma cantidad de workers.
+
+Uso:
+    python manage.py benchmark_servidor --workers 2 --concurrencia 16 --duracion 10
+
+Para cada modo levanta el servidor en un puerto libre, espera la sonda de
+liveness y, endpoint por endpoint, envía GETs desde --concurrencia conexiones
+durante --duracion segundos. Informa peticiones por segundo y latencias p50 y
+p99. Modos: wsgi, asgi y asgi_sync (uvicorn con las vistas síncronas, para
+separar el efecto del servidor del de las vistas).
+
+Los datos de prueba (un cliente, un servicio y --filas citas) se guardan en la
+base de datos configurada, que los servidores deben poder abrir (no sirve una
+SQLite en memoria), y se borran al final. El generador de carga corre en este
+proceso: en una máquina con pocas CPU compite con los workers, así que conviene
+comparar los modos entre sí y no tomar los números como absolutos.
+"""
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time as reloj
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.citas.models import Cita, Servicio
+from apps.core.health import percentil
+
+USUARIO = 'benchmark_servidor'
+
+ENDPOINTS = {
+    'citas': '/api/citas/citas/',
+    'mis_citas': '/api/citas/citas/mis_citas/',
+    'pendientes': '/api/citas/citas/pendientes/',
+    'servicios': '/api/citas/servicios/',
+    'live': '/api/health/live/',
+    'ready': '/api/health/ready/',
+}
+
+# Modo -> (aplicación y worker de gunicorn, ASGI_VISTAS_ASYNC)
+MODOS = {
+    'wsgi': (['config.wsgi:application'], 'False'),
+    'asgi': (['config.asgi:application', '--worker-class', 'uvicorn_worker.UvicornWorker'], 'True'),
+    'asgi_sync': (['config.asgi:application', '--worker-class', 'uvicorn_worker.UvicornWorker'], 'False'),
+}
+
+
+class Command(BaseCommand):
+    help = "Compara peticiones por segundo y p99 de gunicorn WSGI contra uvicorn ASGI con los mismos workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrencia', type=int, default=16)
+        parser.add_argument('--duracion', type=float, default=10)
+        parser.add_argument('--filas', type=int, default=200)
+        parser.add_argument('--modos', default='wsgi,asgi', help=f"Separados por comas: {', '.join(MODOS)}")
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                            help=f"Separados por comas: {', '.join(ENDPOINTS)}")
+
+    def handle(self, *args, **options):
+        modos = [modo.strip() for modo in options['modos'].split(',') if modo.strip()]
+        endpoints = [nombre.strip() for nombre in options['endpoints'].split(',') if nombre.strip()]
+        desconocidos = [m for m in modos if m not in MODOS] + [e for e in endpoints if e not in ENDPOINTS]
+        if desconocidos:
+            raise CommandError(f"Valores desconocidos: {', '.join(desconocidos)}")
+        if connection.vendor == 'sqlite' and str(connection.settings_dict['NAME']) in ('', ':memory:'):
+            raise CommandError("Los servidores no pueden abrir una base SQLite en memoria.")
+
+        token = self._crear_datos(options['filas'])
+        resultados = {}
+        try:
+            for modo in modos:
+                with _Servidor(modo, options['workers']) as puerto:
+                    for nombre in endpoints:
+                        resultados[modo, nombre] = _carga(
+                            puerto, ENDPOINTS[nombre], token, options['concurrencia'], options['duracion'],
+                        )
+                        self._fila(modo, nombre, resultados[modo, nombre])
+        finally:
+            self._borrar_datos()
+
+        if 'wsgi' in modos:
+            for modo in (m for m in modos if m != 'wsgi'):
+                for nombre in endpoints:
+                    base, otro = resultados['wsgi', nombre], resultados[modo, nombre]
+                    if base['rps'] and otro['p99_ms'] and base['p99_ms']:
+                        self.stdout.write(self.style.SUCCESS(
+                            f"{nombre:<11} {modo} vs wsgi: {otro['rps'] / base['rps']:.2f}x peticiones/s, "
+                            f"p99 {otro['p99_ms']:.1f} ms vs {base['p99_ms']:.1f} ms"
+                        ))
+
+    # -------------------------
+    #     DATOS DE PRUEBA
+    # -------------------------
+
+    def _crear_datos(self, filas):
+        self._borrar_datos()
+        cliente = get_user_model().objects.create_user(username=USUARIO, first_name='Ana', last_name='Pérez')
+        servicio = Servicio.objects.create(nombre='Benchmark servidor', duracion=30, precio='45.50')
+        inicio = date.today() + timedelta(days=1)
+        citas = []
+        for i in range(filas):
+            fecha = inicio + timedelta(days=i // 16)
+            hora = time(8 + (i % 16) // 2, 30 * (i % 2))
+            desde, hasta = Cita.rango_horario(fecha, hora, servicio.duracion)
+            citas.append(Cita(cliente=cliente, servicio=servicio, fecha=fecha, hora=hora, inicio=desde, fin=hasta))
+        Cita.objects.bulk_create(citas)
+        return str(RefreshToken.for_user(cliente).access_token)
+
+    def _borrar_datos(self):
+        Cita.objects.filter(cliente__username=USUARIO).delete()
+        Servicio.objects.filter(nombre='Benchmark servidor').delete()
+        get_user_model().objects.filter(username=USUARIO).delete()
+
+    def _fila(self, modo, nombre, resultado):
+        self.stdout.write(
+            f"{modo:<10} {nombre:<11} {resultado['rps']:9.1f} peticiones/s  "
+            f"p50 {_ms(resultado['p50_ms'])}  p99 {_ms(resultado['p99_ms'])}  "
+            f"({resultado['peticiones']} peticiones, {resultado['errores']} errores)"
+        )
+
+
+def _ms(valor):
+    return f"{valor:7.1f} ms" if valor is not None else "      - ms"
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class _Servidor:
+    """gunicorn en un subproceso, mientras dura el bloque `with`."""
+
+    def __init__(self, modo, workers):
+        self.modo, self.workers = modo, workers
+        self.puerto = _puerto_libre()
+        self.log = tempfile.TemporaryFile()
+
+    def __enter__(self):
+        aplicacion, vistas_async = MODOS[self.modo]
+        entorno = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE, ASGI_VISTAS_ASYNC=vistas_async)
+        self.proceso = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *aplicacion, '--workers', str(self.workers),
+             '--bind', f'127.0.0.1:{self.puerto}', '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=entorno, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        limite = reloj.monotonic() + 30
+        while reloj.monotonic() < limite and self.proceso.poll() is None:
+            try:
+                conexion = http.client.HTTPConnection('127.0.0.1', self.puerto, timeout=1)
+                conexion.request('GET', ENDPOINTS['live'])
+                if conexion.getresponse().status == 200:
+                    return self.puerto
+            except OSError:
+                reloj.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise CommandError(f"El servidor {self.modo} no respondió:\n{self._salida()}")
+
+    def __exit__(self, *exc):
+        self.proceso.terminate()
+        try:
+            self.proceso.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proceso.kill()
+            self.proceso.wait()
+        self.log.close()
+
+    def _salida(self):
+        self.log.seek(0)
+        return self.log.read().decode(errors='replace')[-2000:]
+
+
+def _carga(puerto, ruta, token, concurrencia, duracion):
+    """GETs a `ruta` desde `concurrencia` hilos durante `duracion` segundos (tras un breve calentamiento)."""
+    cabeceras = {'Authorization': f'Bearer {token}', 'Accept': 'application/json'}
+    latencias, errores = [], [0]
+    lock = threading.Lock()
+    inicio = threading.Barrier(concurrencia + 1)
+    fin = [0.0]
+
+    def trabajador():
+        conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=30)
+        propias, fallidas = [], 0
+        calentar = 3
+        inicio.wait()
+        while reloj.monotonic() < fin[0]:
+            t0 = reloj.perf_counter()
+            try:
+                conexion.request('GET', ruta, headers=cabeceras)
+                respuesta = conexion.getresponse()
+                respuesta.read()
+                correcta = respuesta.status == 200
+            except (OSError, http.client.HTTPException):
+                conexion.close()
+                correcta = False
+            if calentar:
+                calentar -= 1
+            elif correcta:
+                propias.append((reloj.perf_counter() - t0) * 1000)
+            else:
+                fallidas += 1
+        conexion.close()
+        with lock:
+            latencias.extend(propias)
+            errores[0] += fallidas
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    t0 = reloj.monotonic()
+    fin[0] = t0 + duracion
+    inicio.wait()
+    for hilo in hilos:
+        hilo.join()
+    transcurrido = reloj.monotonic() - t0
+
+    latencias.sort()
+    return {
+        'rps': len(latencias) / transcurrido,
+        'p50_ms': percentil(latencias, 50),
+        'p99_ms': percentil(latencias, 99),
+        'peticiones': len(latencias),
+        'errores': errores[0],
+    }
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0003_remove_cita_unique_cita_slot_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['servicio', 'fecha', 'hora'], name='citas_cita_servici_603fd1_idx'),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:48
+
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def calcular_rangos(apps, schema_editor):
+    """Materializa inicio y fin de las citas existentes."""
+    Cita = apps.get_model('citas', 'Cita')
+    pendientes = []
+    for cita in Cita.objects.select_related('servicio').iterator(chunk_size=1000):
+        cita.inicio = timezone.make_aware(datetime.combine(cita.fecha, cita.hora))
+        cita.fin = cita.inicio + timedelta(minutes=cita.servicio.duracion)
+        pendientes.append(cita)
+        if len(pendientes) >= 1000:
+            Cita.objects.bulk_update(pendientes, ['inicio', 'fin'])
+            pendientes = []
+    if pendientes:
+        Cita.objects.bulk_update(pendientes, ['inicio', 'fin'])
+
+
+# En PostgreSQL la base de datos garantiza que no haya cruces con una restricción de exclusión
+SQL_EXCLUSION = """
+    CREATE EXTENSION IF NOT EXISTS btree_gist;
+    ALTER TABLE citas_cita ADD CONSTRAINT cita_sin_solape
+        EXCLUDE USING gist (servicio_id WITH =, tstzrange(inicio, fin) WITH &&)
+        WHERE (estado NOT IN ('cancelada', 'rechazada') AND inicio IS NOT NULL);
+"""
+
+
+# Pares de citas activas del mismo servicio que ya se cruzan (reservas dobles heredadas)
+SQL_SOLAPES = """
+    SELECT a.id, b.id, a.servicio_id, a.inicio
+    FROM citas_cita a
+    JOIN citas_cita b ON b.servicio_id = a.servicio_id AND b.id > a.id
+        AND b.inicio < a.fin AND a.inicio < b.fin
+    WHERE a.estado NOT IN ('cancelada', 'rechazada') AND b.estado NOT IN ('cancelada', 'rechazada')
+    ORDER BY a.servicio_id, a.inicio
+    LIMIT 50
+"""
+
+
+def crear_exclusion(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # Con citas que ya se cruzan la restricción no se puede crear: se informa
+    # cuáles son para resolverlas (cancelar o reprogramar) antes de migrar
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(SQL_SOLAPES)
+        solapes = cursor.fetchall()
+    if solapes:
+        detalle = "\n".join(
+            f"  citas {a} y {b} (servicio {servicio}, {timezone.localtime(inicio):%Y-%m-%d %H:%M})"
+            for a, b, servicio, inicio in solapes
+        )
+        raise RuntimeError(
+            "No se puede crear la restricción cita_sin_solape: hay citas activas del mismo "
+            f"servicio que se cruzan (primeros {len(solapes)} pares):\n{detalle}\n"
+            "Cancele o reprograme una de cada par y vuelva a ejecutar migrate."
+        )
+    schema_editor.execute(SQL_EXCLUSION)
+
+
+def eliminar_exclusion(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE citas_cita DROP CONSTRAINT IF EXISTS cita_sin_solape;")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0004_cita_servicio_fecha_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='cita',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='cita',
+            name='fin',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Fin calculado de la cita', null=True),
+        ),
+        migrations.AddField(
+            model_name='cita',
+            name='inicio',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Inicio calculado de la cita', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['servicio', 'inicio'], name='citas_cita_servici_ef6d3f_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cita',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['cancelada', 'rechazada']), _negated=True), fields=('fecha', 'hora', 'servicio'), name='unique_cita_slot_activa'),
+        ),
+        migrations.RunPython(calcular_rangos, migrations.RunPython.noop),
+        migrations.RunPython(crear_exclusion, eliminar_exclusion),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:53
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def completar_created_at(apps, schema_editor):
+    """Las citas antiguas sin created_at toman updated_at o el momento actual."""
+    Cita = apps.get_model('citas', 'Cita')
+    Cita.objects.filter(created_at__isnull=True).update(
+        created_at=Coalesce('updated_at', models.Value(django.utils.timezone.now()))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0005_cita_rango_horario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(completar_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cita',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['-created_at', 'id'], name='citas_cita_created_83e855_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['cliente', '-created_at', 'id'], name='citas_cita_cliente_e336e6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['estado', '-created_at', 'id'], name='citas_cita_estado_b2a9a9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['fecha', 'hora', 'id'], name='citas_cita_fecha_31bddb_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def completar_updated_at(apps, schema_editor):
+    """Las citas sin updated_at toman su created_at."""
+    Cita = apps.get_model('citas', 'Cita')
+    Cita.objects.filter(updated_at__isnull=True).update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0006_cita_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(completar_updated_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cita',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:40
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def _documento(*valores):
+    return ' '.join(_normalizar(valor) for valor in valores if valor)
+
+
+def calcular_documentos(apps, schema_editor):
+    """Arma el documento de búsqueda de los servicios y citas existentes."""
+    Servicio = apps.get_model('citas', 'Servicio')
+    Cita = apps.get_model('citas', 'Cita')
+
+    servicios = list(Servicio.objects.all())
+    for servicio in servicios:
+        servicio.busqueda = _documento(servicio.nombre, servicio.descripcion)
+    Servicio.objects.bulk_update(servicios, ['busqueda'], batch_size=1000)
+
+    pendientes = []
+    for cita in Cita.objects.select_related('cliente', 'servicio').iterator(chunk_size=1000):
+        cita.busqueda = _documento(cita.cliente.first_name, cita.cliente.last_name,
+                                   cita.cliente.email, cita.servicio.nombre)
+        pendientes.append(cita)
+        if len(pendientes) >= 1000:
+            Cita.objects.bulk_update(pendientes, ['busqueda'])
+            pendientes = []
+    if pendientes:
+        Cita.objects.bulk_update(pendientes, ['busqueda'])
+
+
+class Migration(migrations.Migration):
+    # Los índices (trigramas en PostgreSQL, FTS5 en SQLite) se crean en post_migrate: ver apps/citas/busqueda.py
+
+    dependencies = [
+        ('citas', '0007_cita_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='busqueda',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Texto de búsqueda normalizado'),
+        ),
+        migrations.AddField(
+            model_name='servicio',
+            name='busqueda',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Texto de búsqueda normalizado'),
+        ),
+        migrations.RunPython(calcular_documentos, migrations.RunPython.noop),
+    ]
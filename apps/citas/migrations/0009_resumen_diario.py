@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0008_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorteResumen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hasta', models.DateField(blank=True, null=True)),
+                ('actualizado', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Corte del resumen',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('aprobada', 'Aprobada'), ('rechazada', 'Rechazada'), ('completada', 'Completada'), ('cancelada', 'Cancelada')], max_length=20)),
+                ('citas', models.PositiveIntegerField(default=0)),
+                ('minutos', models.PositiveIntegerField(default=0, help_text='Minutos reservados (duración del servicio)')),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('pendiente', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name': 'Resumen diario',
+                'verbose_name_plural': 'Resúmenes diarios',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['updated_at'], name='citas_cita_updated_0c92c4_idx'),
+        ),
+        migrations.AddField(
+            model_name='resumendiario',
+            name='empleado',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='resumendiario',
+            name='servicio',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='citas.servicio'),
+        ),
+        migrations.AddIndex(
+            model_name='resumendiario',
+            index=models.Index(fields=['fecha'], name='citas_resum_fecha_590e39_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0009_resumen_diario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['empleado', 'fecha', 'hora'], name='citas_cita_emplead_f6519e_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0010_cita_agenda_empleado_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['servicio', 'fin'], name='citas_cita_servici_2f535f_idx'),
+        ),
+    ]
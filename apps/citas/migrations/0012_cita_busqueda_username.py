@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:40
+
+import unicodedata
+
+from django.db import migrations
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def _documento(*valores):
+    return ' '.join(_normalizar(valor) for valor in valores if valor)
+
+
+def agregar_usuario(apps, schema_editor):
+    """Vuelve a armar el documento de búsqueda de las citas, ahora con el usuario del cliente."""
+    Cita = apps.get_model('citas', 'Cita')
+
+    pendientes = []
+    for cita in Cita.objects.select_related('cliente', 'servicio').iterator(chunk_size=1000):
+        cita.busqueda = _documento(cita.cliente.username, cita.cliente.first_name, cita.cliente.last_name,
+                                   cita.cliente.email, cita.servicio.nombre)
+        pendientes.append(cita)
+        if len(pendientes) >= 1000:
+            Cita.objects.bulk_update(pendientes, ['busqueda'])
+            pendientes = []
+    if pendientes:
+        Cita.objects.bulk_update(pendientes, ['busqueda'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0011_cita_servicio_fin_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(agregar_usuario, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:46
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0012_cita_busqueda_username'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cita',
+            name='citas_cita_servici_2f535f_idx',
+        ),
+        migrations.AlterField(
+            model_name='servicio',
+            name='duracion',
+            field=models.IntegerField(help_text='Duración en minutos', validators=[django.core.validators.MaxValueValidator(1440)]),
+        ),
+    ]
@@ -1,7 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from datetime import datetime
+from django.core.validators import MaxValueValidator
+from django.utils import timezone
+from datetime import datetime, timedelta
+
+from .busqueda import documento
 
 # Modelo para representar los servicios que ofrece la empresa.
 class Servicio(models.Model):
@@ -10,12 +15,19 @@ class Servicio(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     # Descripción del servicio, opcional
     descripcion = models.TextField(blank=True, null=True)
+    # Duración máxima de un servicio en minutos: acota la búsqueda de cruces (Cita.hay_solape)
+    DURACION_MAXIMA = 24 * 60
     # Duración del servicio en minutos
-    duracion = models.IntegerField(help_text="Duración en minutos")
+    duracion = models.IntegerField(help_text="Duración en minutos", validators=[MaxValueValidator(DURACION_MAXIMA)])
     # Precio del servicio
     precio = models.DecimalField(max_digits=10, decimal_places=2)
     # Estado del servicio, por defecto activo
     activo = models.BooleanField(default=True)
+    # Documento de búsqueda normalizado (ver busqueda.py)
+    busqueda = models.TextField(blank=True, default='', editable=False, help_text="Texto de búsqueda normalizado")
+
+    # Campos que forman el documento de búsqueda
+    CAMPOS_BUSQUEDA = ('nombre', 'descripcion')
 
     class Meta:
         # Ordenar por nombre del servicio en la base de datos
@@ -27,6 +39,10 @@ class Servicio(models.Model):
     def __str__(self): # sirve para que el objeto tenga un nombre legible.
         return f"{self.nombre} ({self.duracion}min - ${self.precio})"
 
+    def save(self, *args, **kwargs):
+        self.busqueda = documento(self, self.CAMPOS_BUSQUEDA)
+        super().save(*args, **kwargs)
+
 
 # Modelo para manejar las citas o reservas de los servicios.
 class Cita(models.Model):
@@ -40,6 +56,12 @@ class Cita(models.Model):
         ('completada', 'Completada'),
         ('cancelada', 'Cancelada'),
     )
+    # Estados que ya no ocupan el horario del servicio
+    ESTADOS_INACTIVOS = ('cancelada', 'rechazada')
+    # Campos que forman el documento de búsqueda
+    CAMPOS_BUSQUEDA = (
+        'cliente__username', 'cliente__first_name', 'cliente__last_name', 'cliente__email', 'servicio__nombre',
+    )
 
     # Campos principales de la cita
     fecha = models.DateField(help_text="Fecha de la cita")
@@ -74,36 +96,143 @@ class Cita(models.Model):
         help_text="Empleado asignado (opcional)"
     )
 
+    # Rango materializado de la cita: se calcula con fecha, hora y la duración del servicio
+    inicio = models.DateTimeField(null=True, blank=True, editable=False, help_text="Inicio calculado de la cita")
+    fin = models.DateTimeField(null=True, blank=True, editable=False, help_text="Fin calculado de la cita")
+    # Documento de búsqueda normalizado con los datos del cliente y del servicio (ver busqueda.py)
+    busqueda = models.TextField(blank=True, default='', editable=False, help_text="Texto de búsqueda normalizado")
+
     # Campos de auditoría (fecha de creación y última actualización)
-    created_at = models.DateTimeField(null=True, blank=True)
-    updated_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)  # Con valor siempre: es la clave de la paginación por cursor
+    updated_at = models.DateTimeField(auto_now=True)  # Se actualiza en cada escritura; sirve para ETag y Last-Modified
 
     class Meta:
         # Ordenar las citas por fecha y hora (más reciente primero)
         ordering = ['-fecha', '-hora']
         verbose_name = 'Cita'
         verbose_name_plural = 'Citas'
-        # Asegurarse de que no haya citas duplicadas para el mismo servicio en el mismo horario
-        unique_together = [['fecha', 'hora', 'servicio']] #evitar que se repitan combinaciones específicas de campos en la base de datos.
+        # Asegurarse de que no haya citas activas duplicadas para el mismo servicio en el mismo horario
+        # (las canceladas o rechazadas liberan el horario)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'hora', 'servicio'],
+                condition=~Q(estado__in=['cancelada', 'rechazada']),
+                name='unique_cita_slot_activa',
+            ),
+        ]
         indexes = [
             models.Index(fields=['estado', '-fecha']),  # Índice para facilitar las búsquedas por estado y fecha
             models.Index(fields=['cliente', '-fecha']),  # Índice para facilitar las búsquedas por cliente y fecha
+            models.Index(fields=['servicio', 'fecha', 'hora']),  # Índice para calcular la disponibilidad de un servicio por rango de fechas
+            models.Index(fields=['servicio', 'inicio']),  # Índice para detectar cruces de horario en una sola búsqueda
+            # Índices para la paginación por cursor de los listados
+            models.Index(fields=['-created_at', 'id']),
+            models.Index(fields=['cliente', '-created_at', 'id']),
+            models.Index(fields=['estado', '-created_at', 'id']),
+            models.Index(fields=['fecha', 'hora', 'id']),
+            models.Index(fields=['updated_at']),  # Índice para encontrar los días del resumen que cambiaron
+            models.Index(fields=['empleado', 'fecha', 'hora']),  # Índice para la agenda de cada empleado
         ]
         app_label = 'citas'
 
     def __str__(self): # sirve para que el objeto tenga un nombre legible.
         return f"Cita {self.id} - {self.cliente.get_full_name()} - {self.servicio.nombre} ({self.fecha} {self.hora})"
 
+    @staticmethod
+    def rango_horario(fecha, hora, duracion):
+        """Devuelve (inicio, fin) de una cita como datetimes con zona horaria."""
+        inicio = timezone.make_aware(datetime.combine(fecha, hora))
+        return inicio, inicio + timedelta(minutes=duracion)
+
+    @classmethod
+    def hay_solape(cls, servicio_id, inicio, fin, excluir_id=None):
+        """
+        Indica si el rango [inicio, fin) se cruza con otra cita activa del servicio.
+        Revisa toda la ventana (no supone que las citas existentes no se cruzan:
+        fuera de PostgreSQL no hay restricción que lo garantice). Una cita que
+        se cruza empieza antes de `fin` y, como ninguna dura más de
+        Servicio.DURACION_MAXIMA, después de `inicio` menos esa duración: el
+        índice (servicio, inicio) lee solo ese rango acotado.
+        """
+        desde = inicio - timedelta(minutes=Servicio.DURACION_MAXIMA)
+        qs = cls.objects.filter(servicio_id=servicio_id, inicio__gt=desde, inicio__lt=fin, fin__gt=inicio)
+        qs = qs.exclude(estado__in=cls.ESTADOS_INACTIVOS)
+        if excluir_id is not None:
+            qs = qs.exclude(pk=excluir_id)
+        return qs.exists()
+
+    def calcular_rango(self):
+        """Materializa inicio y fin a partir de fecha, hora y la duración del servicio."""
+        if self.fecha and self.hora and self.servicio_id:
+            self.inicio, self.fin = self.rango_horario(self.fecha, self.hora, self.servicio.duracion)
+
+    def calcular_busqueda(self):
+        """Arma el documento de búsqueda con los datos actuales del cliente y del servicio."""
+        self.busqueda = documento(self, self.CAMPOS_BUSQUEDA)
+
     def clean(self): #validar datos antes de que se guarden en la base de datos.
         """Validaciones del modelo"""
         # No permitir citas con fecha y hora en el pasado
-        from django.utils import timezone
         if self.fecha and self.hora:
             cita_datetime = datetime.combine(self.fecha, self.hora)
             if cita_datetime < datetime.now():
                 raise ValidationError("No se pueden crear citas en el pasado.") #sirve para detener la ejecución y lanzar un erro
+
+        # No permitir que la cita se cruce con otra activa del mismo servicio
+        if self.inicio and self.estado not in self.ESTADOS_INACTIVOS:
+            if Cita.hay_solape(self.servicio_id, self.inicio, self.fin, excluir_id=self.pk):
+                raise ValidationError("El horario se cruza con otra cita del mismo servicio.")
     
     def save(self, *args, **kwargs):#Sobrescribe el guardado para correr validaciones antes de guardar
-        # Ejecutar validaciones antes de guardar
-        self.full_clean()
-        super().save(*args, **kwargs)
+        self.calcular_rango()
+        self.calcular_busqueda()
+        with transaction.atomic():
+            # Bloquear el servicio serializa las reservas concurrentes del mismo servicio
+            # (en PostgreSQL además lo garantiza la restricción de exclusión)
+            list(Servicio.objects.select_for_update().filter(pk=self.servicio_id).values_list('pk', flat=True))
+            # Ejecutar validaciones antes de guardar
+            self.full_clean()
+            super().save(*args, **kwargs)
+
+
+# Resumen de citas por día para los reportes (ver reportes.py).
+class ResumenDiario(models.Model):
+    """Totales de un día ya cerrado por servicio, empleado y estado"""
+    fecha = models.DateField()
+    servicio = models.ForeignKey(Servicio, on_delete=models.CASCADE, related_name='resumenes')
+    empleado = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    estado = models.CharField(max_length=20, choices=Cita.ESTADOS)
+    citas = models.PositiveIntegerField(default=0)
+    minutos = models.PositiveIntegerField(default=0, help_text="Minutos reservados (duración del servicio)")
+    ingresos = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Se marca cuando una cita del día se mueve o se borra: el día se recalcula en la próxima actualización
+    pendiente = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = 'Resumen diario'
+        verbose_name_plural = 'Resúmenes diarios'
+        indexes = [
+            models.Index(fields=['fecha']),
+        ]
+        app_label = 'citas'
+
+    def __str__(self):
+        return f"{self.fecha} - {self.servicio_id} - {self.estado}: {self.citas}"
+
+
+class CorteResumen(models.Model):
+    """Hasta dónde está al día ResumenDiario (una sola fila)"""
+    # Todos los días anteriores a esta fecha están resumidos
+    hasta = models.DateField(null=True, blank=True)
+    # Momento de la última actualización: las citas modificadas después se vuelven a resumir
+    actualizado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Corte del resumen'
+        app_label = 'citas'
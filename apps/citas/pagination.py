@@ -0,0 +1,159 @@
+"""
+Paginación por cursor (keyset) para los listados de Citas.
+
+En lugar de COUNT(*) + OFFSET, cada página filtra por los valores de la
+última fila vista usando un orden compuesto y único (p. ej. -created_at, id).
+Con un índice sobre esas columnas, la página 1000 cuesta lo mismo que la 1.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación keyset con orden compuesto.
+    La vista puede definir `keyset_ordering` (también como argumento de @action)
+    para cambiar el orden; el último campo debe ser único (normalmente 'id').
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', 'id')
+
+    def get_page_size(self, request):
+        try:
+            tamano = int(request.query_params[self.page_size_query_param])
+            if tamano > 0:
+                return min(tamano, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        """Orden de la vista; en el listado general se respeta ?ordering= más 'id' para desempatar."""
+        ordering = list(getattr(view, 'keyset_ordering', self.ordering))
+        if getattr(view, 'action', None) == 'list' and request.query_params.get('ordering'):
+            pedido = OrderingFilter().get_ordering(request, queryset, view) or ordering
+            ordering = [campo for campo in pedido if campo.lstrip('-') != 'id'] + ['id']
+        return ordering
+
+    # -------------------------
+    #     CURSOR
+    # -------------------------
+
+    @staticmethod
+    def _valor(fila, nombre):
+        """Valor de un campo del orden, tanto para instancias como para filas de values()."""
+        valor = fila[nombre] if isinstance(fila, dict) else getattr(fila, nombre)
+        return valor.isoformat() if hasattr(valor, 'isoformat') else valor
+
+    def encode_cursor(self, fila, reverso):
+        valores = [self._valor(fila, campo.lstrip('-')) for campo in self.ordering]
+        token = urlsafe_b64encode(json.dumps({'v': valores, 'r': reverso}).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            datos = json.loads(urlsafe_b64decode(token.encode()).decode())
+            valores = [
+                model._meta.get_field(campo.lstrip('-')).to_python(valor)
+                for campo, valor in zip(self.ordering, datos['v'], strict=True)
+            ]
+            return valores, bool(datos.get('r'))
+        except Exception:
+            raise NotFound("Cursor inválido.")
+
+    # -------------------------
+    #     CONSULTA
+    # -------------------------
+
+    @staticmethod
+    def _despues_de(ordering, valores):
+        """
+        Q que selecciona las filas posteriores a `valores` en el orden dado:
+        (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...
+        """
+        condicion = Q()
+        iguales = Q()
+        for campo, valor in zip(ordering, valores):
+            nombre = campo.lstrip('-')
+            lookup = 'lt' if campo.startswith('-') else 'gt'
+            condicion |= iguales & Q(**{f'{nombre}__{lookup}': valor})
+            iguales &= Q(**{nombre: valor})
+        return condicion
+
+    @staticmethod
+    def _invertir(ordering):
+        return [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in ordering]
+
+    def _consulta(self, queryset, request, view):
+        """Queryset de la página pedida (con una fila de más), valores del cursor y dirección."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        valores, reverso = self.decode_cursor(request, queryset.model)
+        orden = self._invertir(self.ordering) if reverso else self.ordering
+
+        queryset = queryset.order_by(*orden)
+        if valores is not None:
+            queryset = queryset.filter(self._despues_de(orden, valores))
+
+        # Se pide una fila de más para saber si hay otra página
+        return queryset[:self.page_size + 1], valores, reverso
+
+    def _pagina(self, filas, valores, reverso):
+        hay_mas = len(filas) > self.page_size
+        filas = filas[:self.page_size]
+        if reverso:
+            filas.reverse()
+
+        self.next_url = self.previous_url = None
+        if filas:
+            if hay_mas or reverso:
+                self.next_url = self.encode_cursor(filas[-1], reverso=False)
+            if (hay_mas and reverso) or (valores is not None and not reverso):
+                self.previous_url = self.encode_cursor(filas[0], reverso=True)
+        elif reverso:
+            self.next_url = remove_query_param(self.base_url, self.cursor_query_param)
+        return filas
+
+    def paginate_queryset(self, queryset, request, view=None):
+        consulta, valores, reverso = self._consulta(queryset, request, view)
+        return self._pagina(list(consulta), valores, reverso)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() con el ORM asíncrono (vistas del modo ASGI)."""
+        consulta, valores, reverso = self._consulta(queryset, request, view)
+        return self._pagina([fila async for fila in consulta], valores, reverso)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_url,
+            'previous': self.previous_url,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,216 @@
+"""
+Reportes de ocupación e ingresos de las citas.
+
+Los totales se calculan en la base de datos (values + annotate). Los días ya
+resumidos se leen de ResumenDiario, una fila por día, servicio, empleado y
+estado; el resto (hoy, los días futuros, los días cerrados que aún no se
+resumieron y los resumidos que quedaron desactualizados) se agrega sobre Cita.
+Así un reporte de varios años no vuelve a recorrer todas las citas.
+
+El reporte solo lee. El resumen lo pone al día actualizar_resumen, desde el
+comando manage.py actualizar_resumen (periódico, p. ej. cada hora), de forma
+incremental:
+- los días que se cerraron desde la última actualización,
+- los días con citas modificadas después de esa actualización (updated_at)
+  menos CITAS_RESUMEN_MARGEN segundos: una transacción que empezó antes y
+  confirmó después deja un updated_at anterior a la marca, y el margen la
+  vuelve a ver (recalcular un día es idempotente),
+- los días marcados como pendientes (citas movidas de fecha o borradas).
+
+Los ingresos usan el precio del servicio al momento de resumir el día.
+"""
+import calendar
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .disponibilidad import horario_laboral
+from .models import Cita, CorteResumen, ResumenDiario, Servicio
+
+
+# Periodo del reporte: unidad de truncado de la fecha
+PERIODOS = {'dia': 'day', 'semana': 'week', 'mes': 'month'}
+
+# Dimensión: campos de values() que la identifican (id y nombre)
+DIMENSIONES = {
+    'servicio': ('servicio', 'servicio__nombre'),
+    'empleado': ('empleado', 'empleado__username'),
+    'estado': ('estado',),
+}
+
+# Nombre de cada campo de values() en la respuesta
+NOMBRES = {
+    'servicio__nombre': 'servicio_nombre',
+    'empleado__username': 'empleado_nombre',
+}
+
+# Las citas canceladas o rechazadas se cuentan, pero no ocupan minutos ni generan ingresos
+ACTIVAS = ~Q(estado__in=Cita.ESTADOS_INACTIVOS)
+
+CENTAVOS = Decimal('0.01')
+
+
+def _dias_sucios(corte):
+    """Días ya resumidos cuyo resumen puede no coincidir con las citas."""
+    margen = timedelta(seconds=getattr(settings, 'CITAS_RESUMEN_MARGEN', 300))
+    sucios = set(
+        Cita.objects
+        .filter(fecha__lt=corte.hasta, updated_at__gt=corte.actualizado - margen)
+        .order_by().values_list('fecha', flat=True).distinct()
+    )
+    sucios.update(
+        ResumenDiario.objects.filter(pendiente=True).order_by().values_list('fecha', flat=True).distinct()
+    )
+    return sucios
+
+
+def actualizar_resumen(hoy=None):
+    """
+    Pone al día ResumenDiario hasta ayer. Devuelve cuántas filas escribió.
+    El corte se bloquea, así dos actualizaciones simultáneas no resumen el mismo día a la vez.
+    """
+    hoy = hoy or timezone.localdate()
+    with transaction.atomic():
+        corte, _ = CorteResumen.objects.select_for_update().get_or_create(pk=1)
+        # Se toma antes de leer: lo que cambie mientras tanto se resume en la próxima vuelta
+        ahora = timezone.now()
+
+        if corte.hasta is None:
+            dias = Q(fecha__lt=hoy)
+        else:
+            sucios = _dias_sucios(corte)
+            if corte.hasta >= hoy and not sucios:
+                return 0
+            dias = Q(fecha__gte=corte.hasta, fecha__lt=hoy) | Q(fecha__in=sucios)
+
+        ResumenDiario.objects.filter(dias).delete()
+        filas = (
+            Cita.objects
+            .filter(dias)
+            .order_by()
+            .values('fecha', 'servicio', 'empleado', 'estado')
+            .annotate(
+                total=Count('id'),
+                minutos_reservados=Sum('servicio__duracion'),
+                monto=Sum('servicio__precio'),
+            )
+        )
+        creadas = ResumenDiario.objects.bulk_create(
+            (
+                ResumenDiario(
+                    fecha=fila['fecha'],
+                    servicio_id=fila['servicio'],
+                    empleado_id=fila['empleado'],
+                    estado=fila['estado'],
+                    citas=fila['total'],
+                    minutos=fila['minutos_reservados'] or 0,
+                    ingresos=fila['monto'] or 0,
+                )
+                for fila in filas
+            ),
+            batch_size=1000,
+        )
+
+        corte.hasta = max(hoy, corte.hasta or hoy)
+        corte.actualizado = ahora
+        corte.save()
+    return len(creadas)
+
+
+def _fin_periodo(inicio, periodo):
+    if periodo == 'dia':
+        return inicio
+    if periodo == 'semana':
+        return inicio + timedelta(days=6)
+    return inicio.replace(day=calendar.monthrange(inicio.year, inicio.month)[1])
+
+
+def _agrupar(queryset, periodo, campos, total, minutos, ingresos):
+    """Agrega el queryset en la base de datos por periodo y dimensiones."""
+    if periodo:
+        queryset = queryset.annotate(periodo=Trunc('fecha', PERIODOS[periodo], output_field=DateField()))
+    claves = (['periodo'] if periodo else []) + list(campos)
+    return (
+        queryset
+        .order_by()
+        .values(*claves)
+        .annotate(r_citas=total, r_minutos=minutos, r_ingresos=ingresos)
+    )
+
+
+def generar_reporte(desde, hasta, periodo=None, dimensiones=(), hoy=None):
+    """
+    Reporte de citas, minutos reservados, ocupación e ingresos entre dos fechas (incluidas).
+    - periodo: 'dia', 'semana', 'mes' o None (todo el rango en un solo grupo)
+    - dimensiones: cualquier combinación de 'servicio', 'empleado' y 'estado'
+    La ocupación compara los minutos reservados con el horario laboral del rango.
+    """
+    hoy = hoy or timezone.localdate()
+
+    campos = [campo for dimension in dimensiones for campo in DIMENSIONES[dimension]]
+    claves = (['periodo'] if periodo else []) + campos
+
+    # Días que se leen del resumen: [desde, resumido) salvo los sucios
+    corte = CorteResumen.objects.filter(pk=1, hasta__isnull=False).first()
+    resumido = min(corte.hasta, hoy, hasta + timedelta(days=1)) if corte else desde
+    sucios = {dia for dia in _dias_sucios(corte) if desde <= dia < resumido} if corte else set()
+
+    partes = []
+    if desde < resumido:
+        partes.append(_agrupar(
+            ResumenDiario.objects.filter(fecha__gte=desde, fecha__lt=resumido).exclude(fecha__in=sucios),
+            periodo, campos,
+            Sum('citas'), Sum('minutos', filter=ACTIVAS), Sum('ingresos', filter=ACTIVAS),
+        ))
+    if hasta >= resumido or sucios:
+        partes.append(_agrupar(
+            Cita.objects.filter(Q(fecha__gte=max(desde, resumido), fecha__lte=hasta) | Q(fecha__in=sucios)),
+            periodo, campos,
+            Count('id'), Sum('servicio__duracion', filter=ACTIVAS), Sum('servicio__precio', filter=ACTIVAS),
+        ))
+
+    # Un mismo grupo puede venir de las dos partes (por ejemplo la semana actual)
+    grupos = {}
+    for parte in partes:
+        for fila in parte:
+            clave = tuple(fila[campo] for campo in claves)
+            grupo = grupos.setdefault(clave, {'citas': 0, 'minutos': 0, 'ingresos': Decimal(0)})
+            grupo['citas'] += fila['r_citas'] or 0
+            grupo['minutos'] += fila['r_minutos'] or 0
+            grupo['ingresos'] += fila['r_ingresos'] or 0
+
+    apertura, cierre = horario_laboral()
+    minutos_por_dia = max(cierre - apertura, 0)
+    if 'servicio' in dimensiones or 'empleado' in dimensiones:
+        agendas = 1
+    else:
+        # Sin agrupar por servicio ni empleado, la capacidad es la de todos los servicios activos
+        agendas = Servicio.objects.filter(activo=True).count() or 1
+
+    filas = []
+    totales = {'citas': 0, 'minutos': 0, 'ingresos': Decimal(0)}
+    for clave in sorted(grupos, key=lambda c: tuple((valor is None, valor if valor is not None else '') for valor in c)):
+        grupo = grupos[clave]
+        fila = {NOMBRES.get(campo, campo): valor for campo, valor in zip(claves, clave)}
+        if periodo:
+            dias = (min(_fin_periodo(fila['periodo'], periodo), hasta) - max(fila['periodo'], desde)).days + 1
+        else:
+            dias = (hasta - desde).days + 1
+        capacidad = dias * minutos_por_dia * agendas
+        fila.update(
+            citas=grupo['citas'],
+            minutos=grupo['minutos'],
+            ocupacion=round(grupo['minutos'] / capacidad, 4) if capacidad else None,
+            ingresos=str(Decimal(grupo['ingresos']).quantize(CENTAVOS)),
+        )
+        filas.append(fila)
+        for campo in totales:
+            totales[campo] += grupo[campo]
+
+    totales['ingresos'] = str(Decimal(totales['ingresos']).quantize(CENTAVOS))
+    return {'resultados': filas, 'totales': totales}
@@ -1,3 +1,6 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Cita, Servicio
 
@@ -49,3 +52,105 @@ class CitaSerializer(serializers.ModelSerializer):
             'cliente_nombre',
             'created_at'
         ]
+
+    def run_validators(self, value):
+        # En un PATCH DRF no completa 'estado' (solo lectura), que la condición de
+        # la restricción única necesita: se toma de la cita que se actualiza
+        if self.partial and self.instance is not None and isinstance(value, dict):
+            value = {'estado': self.instance.estado, **value}
+        super().run_validators(value)
+
+    def validate(self, attrs):
+        """Rechaza horarios que se cruzan con otra cita activa del mismo servicio."""
+        cita = self.instance
+        fecha = attrs.get('fecha', getattr(cita, 'fecha', None))
+        hora = attrs.get('hora', getattr(cita, 'hora', None))
+        servicio = attrs.get('servicio', getattr(cita, 'servicio', None))
+        estado = getattr(cita, 'estado', 'pendiente')
+
+        if fecha and hora and servicio and estado not in Cita.ESTADOS_INACTIVOS:
+            inicio, fin = Cita.rango_horario(fecha, hora, servicio.duracion)
+            if Cita.hay_solape(servicio.id, inicio, fin, excluir_id=getattr(cita, 'pk', None)):
+                raise serializers.ValidationError(
+                    {"hora": "El horario se cruza con otra cita del mismo servicio."}
+                )
+        return attrs
+
+
+class CitaLecturaRapida:
+    """
+    Representación de solo lectura para listados de citas.
+    Produce exactamente el mismo JSON que CitaSerializer, pero a partir de
+    queryset.values() (sin notas ni columnas de usuario que no se muestran)
+    y armando los dicts directamente, sin instanciar campos DRF por fila.
+    """
+    # Columnas que se leen de la base de datos
+    campos = (
+        'id', 'fecha', 'hora', 'estado', 'created_at',
+        'cliente_id', 'cliente__first_name', 'cliente__last_name',
+        'servicio_id', 'servicio__nombre', 'servicio__duracion', 'servicio__precio',
+    )
+
+    # Campos DRF reutilizados solo para formatear valores igual que CitaSerializer
+    _fecha = serializers.DateField()
+    _hora = serializers.TimeField()
+    _creada = serializers.DateTimeField()
+    _precio = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+    @classmethod
+    def valores(cls, queryset):
+        """Limita el queryset a las columnas necesarias."""
+        return queryset.values(*cls.campos)
+
+    @classmethod
+    def representar(cls, filas):
+        """Convierte filas de valores() en la lista de dicts de la respuesta."""
+        fecha, hora = cls._fecha.to_representation, cls._hora.to_representation
+        creada, precio = cls._creada.to_representation, cls._precio.to_representation
+        return [
+            {
+                'id': fila['id'],
+                'fecha': fecha(fila['fecha']),
+                'hora': hora(fila['hora']),
+                'estado': fila['estado'],
+                'cliente': fila['cliente_id'],
+                'cliente_nombre': f"{fila['cliente__first_name']} {fila['cliente__last_name']}".strip(),
+                'servicio': fila['servicio_id'],
+                'servicio_detalle': {
+                    'id': fila['servicio_id'],
+                    'nombre': fila['servicio__nombre'],
+                    'duracion': fila['servicio__duracion'],
+                    'precio': precio(fila['servicio__precio']),
+                },
+                'created_at': creada(fila['created_at']) if fila['created_at'] else None,
+            }
+            for fila in filas
+        ]
+
+
+class CitaLoteItemSerializer(serializers.Serializer):
+    """
+    Valida el formato de cada cita de una reserva por lote.
+    No consulta la base de datos: servicio y cliente se resuelven después
+    para todo el lote con consultas por conjunto.
+    """
+    fecha = serializers.DateField()
+    hora = serializers.TimeField()
+    servicio = serializers.IntegerField(min_value=1)
+    notas = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    # Solo los empleados pueden reservar a nombre de otro cliente
+    cliente = serializers.IntegerField(min_value=1, required=False)
+
+
+class AsignacionSerializer(serializers.Serializer):
+    """Parámetros de la asignación automática de empleados (por defecto, mañana)."""
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    reasignar = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        data.setdefault('desde', timezone.localdate() + timedelta(days=1))
+        data.setdefault('hasta', data['desde'])
+        if data['hasta'] < data['desde']:
+            raise serializers.ValidationError({"hasta": "'hasta' no puede ser anterior a 'desde'."})
+        return data
@@ -0,0 +1,86 @@
+"""
+Señales de la aplicación de Citas.
+"""
+import logging
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import busqueda, catalogo
+from .models import Cita, ResumenDiario, Servicio
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+def invalidar_catalogo(sender, **kwargs):
+    """Cualquier cambio en un Servicio invalida el catálogo en caché."""
+    catalogo.invalidar()
+
+
+# Datos del cliente que forman parte del documento de búsqueda de sus citas
+CAMPOS_CLIENTE_BUSQUEDA = {'username', 'first_name', 'last_name', 'email'}
+
+
+@receiver(pre_save, sender=Servicio)
+def recordar_nombre_servicio(sender, instance, update_fields=None, **kwargs):
+    """Guarda el nombre anterior del servicio para compararlo en post_save."""
+    instance._nombre_anterior = None
+    if instance.pk is not None and (update_fields is None or 'nombre' in update_fields):
+        instance._nombre_anterior = Servicio.objects.filter(pk=instance.pk).values_list('nombre', flat=True).first()
+
+
+@receiver(post_save, sender=Servicio)
+def sincronizar_busqueda_servicio(sender, instance, created, **kwargs):
+    """Si cambia el nombre del servicio, actualiza el documento de búsqueda de sus citas."""
+    anterior = getattr(instance, '_nombre_anterior', None)
+    if created or anterior is None or anterior == instance.nombre:
+        # Cambios de precio, duración o descripción no tocan las citas
+        return
+    busqueda.sincronizar(Cita.objects.filter(servicio=instance))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def sincronizar_busqueda_cliente(sender, instance, created, update_fields=None, **kwargs):
+    """Si cambia el usuario, el nombre o el correo del cliente, actualiza el documento de búsqueda de sus citas."""
+    if created or (update_fields is not None and not CAMPOS_CLIENTE_BUSQUEDA & set(update_fields)):
+        # Por ejemplo el login, que solo guarda last_login
+        return
+    busqueda.sincronizar(Cita.objects.filter(cliente=instance))
+
+
+@receiver(pre_save, sender=Cita)
+def marcar_resumen_fecha_anterior(sender, instance, **kwargs):
+    """
+    Si la cita ya existía, marca para recalcular el resumen del día en que estaba
+    (por si cambia de fecha). El día nuevo lo detecta su updated_at.
+    """
+    if instance.pk is not None:
+        ResumenDiario.objects.filter(
+            fecha__in=Cita.objects.filter(pk=instance.pk).values('fecha'), pendiente=False
+        ).update(pendiente=True)
+
+
+@receiver(post_delete, sender=Cita)
+def marcar_resumen_cita_borrada(sender, instance, **kwargs):
+    """Una cita borrada deja desactualizado el resumen de su día."""
+    ResumenDiario.objects.filter(fecha=instance.fecha, pendiente=False).update(pendiente=True)
+
+
+def instalar_indices_busqueda(sender, using, **kwargs):
+    """Crea (o repara) los índices de búsqueda después de cada migrate."""
+    busqueda.instalar_indices([Cita, Servicio], using=using)
+
+
+def precalentar_catalogo(sender, using, **kwargs):
+    """Guarda el catálogo por defecto en la caché después de cada migrate."""
+    if using != DEFAULT_DB_ALIAS:
+        return
+    try:
+        catalogo.precalentar()
+    except Exception as e:
+        # Un fallo al precalentar no debe hacer fallar migrate
+        logger.warning(f"No se pudo precalentar el catálogo de servicios: {e}")
@@ -7,8 +7,23 @@ from django.contrib.auth.models import User
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from datetime import date, time, timedelta
-from .models import Cita, Servicio
-from .serializers import CitaSerializer
+from .models import Cita, CorteResumen, ResumenDiario, Servicio
+from .reportes import actualizar_resumen
+from .asignacion import asignar_empleados
+from .intervalos import Intervalos
+from .transiciones import transicionar
+from .serializers import CitaSerializer, CitaLecturaRapida
+from .views import CitaViewSet
+from django.db import transaction
+from django.test import override_settings
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.tokens import RefreshToken
+from apps.core.testing import presupuesto_consultas
+from apps.users.authentication import cache_usuarios
+from apps.users.claims import agregar_claims
+from apps.users.models import Profile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 
 class ServicioModelTest(TestCase):
@@ -220,3 +235,1130 @@ class CitaAPITest(APITestCase):
         # Debería rechazar o no permitir cancelación
         if response.status_code != status.HTTP_404_NOT_FOUND:
             self.assertIn(response.status_code, [status.HTTP_400_BAD_REQUEST])
+
+
+class DisponibilidadAPITest(APITestCase):
+    """Pruebas para el endpoint de disponibilidad de servicios"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123"
+        )
+        self.servicio = Servicio.objects.create(
+            nombre="Consulta General",
+            duracion=60,
+            precio=50.00
+        )
+        self.manana = date.today() + timedelta(days=1)
+        self.url = f'/api/citas/servicios/{self.servicio.id}/disponibilidad/'
+        self.client.force_authenticate(user=self.user)
+
+    def test_horarios_ocupados_no_se_ofrecen(self):
+        """Prueba: una cita activa ocupa su horario y una cancelada lo libera"""
+        Cita.objects.create(cliente=self.user, servicio=self.servicio, fecha=self.manana, hora=time(9, 0))
+        Cita.objects.create(cliente=self.user, servicio=self.servicio, fecha=self.manana, hora=time(11, 0),
+                            estado='cancelada')
+
+        response = self.client.get(self.url, {'desde': self.manana.isoformat()})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        horarios = response.json()['dias'][0]['horarios']
+        self.assertNotIn('09:00', horarios)
+        self.assertIn('08:00', horarios)
+        self.assertIn('11:00', horarios)
+
+    def test_rango_invalido(self):
+        """Prueba: rechaza rangos invertidos o demasiado largos"""
+        response = self.client.get(self.url, {
+            'desde': self.manana.isoformat(),
+            'hasta': (self.manana - timedelta(days=1)).isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(self.url, {
+            'desde': self.manana.isoformat(),
+            'hasta': (self.manana + timedelta(days=365)).isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CitaSolapeTest(APITestCase):
+    """Pruebas para la detección de cruces de horario según la duración"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123"
+        )
+        self.servicio = Servicio.objects.create(
+            nombre="Terapia",
+            duracion=60,
+            precio=80.00
+        )
+        self.manana = date.today() + timedelta(days=1)
+        self.cita = Cita.objects.create(
+            cliente=self.user,
+            servicio=self.servicio,
+            fecha=self.manana,
+            hora=time(10, 0)
+        )
+
+    def test_rango_materializado(self):
+        """Prueba: inicio y fin se calculan con la duración del servicio"""
+        self.assertEqual(self.cita.fin - self.cita.inicio, timedelta(minutes=60))
+
+    def test_rechaza_cita_que_se_cruza(self):
+        """Prueba: una cita a las 10:30 choca con la de 10:00 de 60 minutos"""
+        from django.core.exceptions import ValidationError
+
+        with self.assertRaises(ValidationError):
+            Cita.objects.create(cliente=self.user, servicio=self.servicio, fecha=self.manana, hora=time(10, 30))
+
+        # Justo al terminar sí se permite
+        Cita.objects.create(cliente=self.user, servicio=self.servicio, fecha=self.manana, hora=time(11, 0))
+
+    def test_detecta_cruce_aunque_existan_citas_solapadas(self):
+        """Prueba: con reservas dobles heredadas (sin restricción en la BD) el cruce se detecta igual"""
+        # bulk_create se salta save(): una cita larga de 10:15 a 13:15 y otra de 11:00 a 11:30
+        larga, _ = Cita.rango_horario(self.manana, time(10, 15), 60)
+        corta, _ = Cita.rango_horario(self.manana, time(11, 0), 30)
+        Cita.objects.bulk_create([
+            Cita(cliente=self.user, servicio=self.servicio, fecha=self.manana, hora=time(10, 15),
+                 inicio=larga, fin=larga + timedelta(hours=3)),
+            Cita(cliente=self.user, servicio=self.servicio, fecha=self.manana, hora=time(11, 0),
+                 inicio=corta, fin=corta + timedelta(minutes=30)),
+        ])
+        # 12:00-13:00 solo choca con la cita larga, que no es la última que empieza antes
+        desde, hasta = Cita.rango_horario(self.manana, time(12, 0), 60)
+        self.assertTrue(Cita.hay_solape(self.servicio.id, desde, hasta))
+
+    def test_busqueda_de_cruces_acotada(self):
+        """Prueba: la consulta de cruces acota inicio por ambos lados (rango fijo del índice)"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        desde, hasta = Cita.rango_horario(self.manana, time(12, 0), 60)
+        with CaptureQueriesContext(connection) as consultas:
+            Cita.hay_solape(self.servicio.id, desde, hasta)
+        sql = consultas[0]['sql']
+        self.assertIn('"inicio" >', sql)
+        self.assertIn('"inicio" <', sql)
+
+    def test_duracion_maxima_del_servicio(self):
+        """Prueba: un servicio no puede durar más que Servicio.DURACION_MAXIMA"""
+        from .serializers import ServicioSerializer
+
+        datos = {'nombre': "Retiro", 'duracion': Servicio.DURACION_MAXIMA + 1, 'precio': '10.00'}
+        serializer = ServicioSerializer(data=datos)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('duracion', serializer.errors)
+
+    def test_api_rechaza_cruce_con_400(self):
+        """Prueba: la API responde 400 cuando el horario se cruza"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post('/api/citas/citas/', {
+            "servicio": self.servicio.id,
+            "fecha": self.manana.isoformat(),
+            "hora": "10:30:00"
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("hora", response.json())
+
+    def test_cita_cancelada_libera_el_horario(self):
+        """Prueba: una cita cancelada no bloquea el mismo horario"""
+        self.cita.estado = 'cancelada'
+        self.cita.save()
+        Cita.objects.create(cliente=self.user, servicio=self.servicio, fecha=self.manana, hora=time(10, 0))
+
+
+class CitaLoteAPITest(APITestCase):
+    """Pruebas para la reserva de citas por lote"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            password="testpass123"
+        )
+        self.servicio = Servicio.objects.create(
+            nombre="Consulta General",
+            duracion=30,
+            precio=50.00
+        )
+        self.manana = (date.today() + timedelta(days=1)).isoformat()
+        self.client.force_authenticate(user=self.user)
+
+    def test_lote_crea_todas(self):
+        """Prueba: un lote válido crea todas las citas en pocas consultas"""
+        lote = [
+            {"servicio": self.servicio.id, "fecha": self.manana, "hora": f"{h:02d}:00:00"}
+            for h in range(8, 16)
+        ]
+        with self.assertNumQueries(6):
+            response = self.client.post('/api/citas/citas/lote/', lote, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['creadas'], 8)
+        self.assertEqual(Cita.objects.count(), 8)
+
+    def test_lote_reporta_errores_por_cita(self):
+        """Prueba: los elementos inválidos o que se cruzan reportan su error"""
+        Cita.objects.create(cliente=self.user, servicio=self.servicio,
+                            fecha=date.today() + timedelta(days=1), hora=time(9, 0))
+        lote = [
+            {"servicio": self.servicio.id, "fecha": self.manana, "hora": "08:00:00"},
+            {"servicio": self.servicio.id, "fecha": self.manana, "hora": "09:15:00"},
+            {"servicio": self.servicio.id, "fecha": self.manana, "hora": "08:10:00"},
+            {"servicio": 9999, "fecha": self.manana, "hora": "12:00:00"},
+            {"servicio": self.servicio.id, "fecha": "no-es-fecha", "hora": "12:00:00"},
+        ]
+        response = self.client.post('/api/citas/citas/lote/', lote, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        estados = [r['estado'] for r in response.json()['resultados']]
+        self.assertEqual(estados, ['creada', 'error', 'error', 'error', 'error'])
+        self.assertEqual(Cita.objects.count(), 2)
+
+
+class CitaTransicionLoteAPITest(APITestCase):
+    """Pruebas para las transiciones de estado masivas"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.client = APIClient()
+        self.cliente = User.objects.create_user(username="cliente", password="testpass123")
+        self.empleado = User.objects.create_user(username="empleado", password="testpass123", is_staff=True)
+        self.servicio = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.00)
+        manana = date.today() + timedelta(days=1)
+        self.pendientes = [
+            Cita.objects.create(cliente=self.cliente, servicio=self.servicio, fecha=manana, hora=time(h, 0))
+            for h in (8, 9, 10)
+        ]
+        self.completada = Cita.objects.create(cliente=self.cliente, servicio=self.servicio,
+                                              fecha=manana, hora=time(11, 0), estado='completada')
+
+    def test_aprobar_lote_por_ids(self):
+        """Prueba: aprueba las pendientes y reporta las omitidas con su estado"""
+        self.client.force_authenticate(user=self.empleado)
+        ids = [c.id for c in self.pendientes] + [self.completada.id, 9999]
+
+        response = self.client.post('/api/citas/citas/aprobar_lote/', {"ids": ids}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['actualizadas'], sorted(c.id for c in self.pendientes))
+        self.assertEqual(data['omitidas'], [{"id": self.completada.id, "estado": "completada"}])
+        self.assertEqual(data['no_encontradas'], [9999])
+        self.assertEqual(Cita.objects.filter(estado='aprobada', empleado=self.empleado).count(), 3)
+
+    def test_rechazar_lote_por_filtro(self):
+        """Prueba: sin ids se usan los filtros del listado"""
+        self.client.force_authenticate(user=self.empleado)
+        response = self.client.post('/api/citas/citas/rechazar_lote/?estado=pendiente', {}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['actualizadas']), 3)
+        self.assertFalse(response.json()['quedan'])
+
+    @override_settings(CITAS_LOTE_MAX=2)
+    def test_lote_por_filtro_respeta_el_maximo(self):
+        """Prueba: por filtro se procesan como máximo CITAS_LOTE_MAX citas y se avisa si quedan"""
+        self.client.force_authenticate(user=self.empleado)
+        primera = self.client.post('/api/citas/citas/aprobar_lote/?fecha_desde=2000-01-01', {}, format='json')
+        self.assertEqual(len(primera.json()['actualizadas']), 2)
+        self.assertTrue(primera.json()['quedan'])
+
+        segunda = self.client.post('/api/citas/citas/aprobar_lote/?fecha_desde=2000-01-01', {}, format='json')
+        self.assertEqual(len(segunda.json()['actualizadas']), 1)
+        self.assertFalse(segunda.json()['quedan'])
+        self.assertEqual(Cita.objects.filter(estado='aprobada').count(), 3)
+
+    def test_lote_solo_empleados(self):
+        """Prueba: un cliente no puede usar las acciones masivas"""
+        self.client.force_authenticate(user=self.cliente)
+        response = self.client.post('/api/citas/citas/aprobar_lote/', {"ids": [self.pendientes[0].id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class CitaTransicionAPITest(APITestCase):
+    """Pruebas para las transiciones individuales (compare-and-swap)"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.client = APIClient()
+        self.cliente = User.objects.create_user(username="cliente", password="testpass123")
+        self.empleado = User.objects.create_user(username="empleado", password="testpass123", is_staff=True)
+        self.servicio = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.00)
+        self.cita = Cita.objects.create(cliente=self.cliente, servicio=self.servicio,
+                                        fecha=date.today() + timedelta(days=1), hora=time(10, 0))
+        self.client.force_authenticate(user=self.empleado)
+
+    def test_aprobar_en_dos_consultas(self):
+        """Prueba: aprobar hace una lectura y un UPDATE condicional, sin releer la cita"""
+        with self.assertNumQueries(2):
+            response = self.client.post(f'/api/citas/citas/{self.cita.id}/aprobar/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['estado'], 'aprobada')
+        self.cita.refresh_from_db()
+        self.assertEqual(self.cita.empleado, self.empleado)
+
+    def test_conflicto_si_el_estado_ya_cambio(self):
+        """Prueba: rechazar una cita ya aprobada devuelve el estado actual"""
+        self.client.post(f'/api/citas/citas/{self.cita.id}/aprobar/')
+        response = self.client.post(f'/api/citas/citas/{self.cita.id}/rechazar/')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['estado_actual'], 'aprobada')
+        self.cita.refresh_from_db()
+        self.assertEqual(self.cita.estado, 'aprobada')
+
+    def test_conflicto_en_una_consulta(self):
+        """Prueba: si la cita no está en el estado de origen no se intenta el UPDATE"""
+        Cita.objects.filter(pk=self.cita.pk).update(estado='rechazada')
+        with self.assertNumQueries(1):
+            response = self.client.post(f'/api/citas/citas/{self.cita.id}/completar/')
+        self.assertEqual(response.json()['estado_actual'], 'rechazada')
+
+    def test_cambio_concurrente_entre_lectura_y_update(self):
+        """Prueba: si otro cambia el estado después de la lectura, el UPDATE no aplica y se informa el estado actual"""
+        queryset = Cita.objects.all()
+        leer = queryset.get
+
+        def leer_y_cambiar(**kwargs):
+            cita = leer(**kwargs)
+            Cita.objects.filter(pk=cita.pk).update(estado='rechazada')
+            return cita
+
+        queryset.get = leer_y_cambiar
+        resultado = transicionar(queryset, self.cita.pk, 'aprobar', empleado=self.empleado)
+
+        self.assertFalse(resultado.aplicada)
+        self.assertEqual(resultado.cita.estado, 'rechazada')
+        self.cita.refresh_from_db()
+        self.assertIsNone(self.cita.empleado)
+
+    def test_cita_inexistente(self):
+        """Prueba: una cita que no existe devuelve 404"""
+        response = self.client.post('/api/citas/citas/9999/completar/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CitaPaginacionCursorTest(APITestCase):
+    """Pruebas para la paginación por cursor de los listados de citas"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass123")
+        self.servicio = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.00)
+        manana = date.today() + timedelta(days=1)
+        self.citas = [
+            Cita.objects.create(cliente=self.user, servicio=self.servicio, fecha=manana, hora=time(h, 0))
+            for h in range(8, 15)
+        ]
+        self.client.force_authenticate(user=self.user)
+
+    def _recorrer(self, url):
+        """Sigue los cursores 'next' y devuelve todos los ids en orden."""
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertNotIn('count', data)
+            ids.extend(c['id'] for c in data['results'])
+            url = data['next']
+        return ids
+
+    def test_listado_recorre_todas_sin_repetir(self):
+        """Prueba: siguiendo 'next' se ven todas las citas una sola vez, más recientes primero"""
+        ids = self._recorrer('/api/citas/citas/?page_size=3')
+        self.assertEqual(ids, [c.id for c in reversed(self.citas)])
+
+    def test_por_rango_fechas_ordena_por_fecha_y_hora(self):
+        """Prueba: por_rango_fechas pagina en orden de fecha y hora"""
+        manana = (date.today() + timedelta(days=1)).isoformat()
+        ids = self._recorrer(f'/api/citas/citas/por_rango_fechas/?fecha_desde={manana}&fecha_hasta={manana}&page_size=2')
+        self.assertEqual(ids, [c.id for c in self.citas])
+
+    def test_cursor_previous(self):
+        """Prueba: 'previous' vuelve a la página anterior"""
+        primera = self.client.get('/api/citas/citas/mis_citas/?page_size=3').json()
+        segunda = self.client.get(primera['next']).json()
+        anterior = self.client.get(segunda['previous']).json()
+        self.assertEqual([c['id'] for c in anterior['results']], [c['id'] for c in primera['results']])
+
+
+class CitaExportarAPITest(APITestCase):
+    """Pruebas para la exportación de citas en streaming"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass123",
+                                             first_name="Ana", last_name="Pérez")
+        self.otro = User.objects.create_user(username="otro", password="testpass123")
+        self.servicio = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.00)
+        manana = date.today() + timedelta(days=1)
+        Cita.objects.create(cliente=self.user, servicio=self.servicio, fecha=manana, hora=time(8, 0))
+        Cita.objects.create(cliente=self.user, servicio=self.servicio, fecha=manana, hora=time(9, 0),
+                            estado='aprobada')
+        Cita.objects.create(cliente=self.otro, servicio=self.servicio, fecha=manana, hora=time(10, 0))
+        self.client.force_authenticate(user=self.user)
+
+    def test_exportar_csv_solo_citas_propias(self):
+        """Prueba: el CSV se entrega en streaming con las citas del usuario"""
+        response = self.client.get('/api/citas/citas/exportar/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lineas = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lineas[0].startswith('id,fecha,hora,estado'))
+        self.assertEqual(len(lineas), 3)
+        self.assertIn('Ana Pérez', lineas[1])
+
+    def test_exportar_ndjson_con_filtros(self):
+        """Prueba: NDJSON respeta los filtros del listado"""
+        import json
+
+        response = self.client.get('/api/citas/citas/exportar/', {'formato': 'ndjson', 'estado': 'aprobada'})
+
+        filas = [json.loads(l) for l in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0]['estado'], 'aprobada')
+        self.assertEqual(filas[0]['hora'], '09:00:00')
+
+    def test_formato_invalido(self):
+        """Prueba: un formato no soportado devuelve 400"""
+        response = self.client.get('/api/citas/citas/exportar/', {'formato': 'xls'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CitaLecturaRapidaTest(TestCase):
+    """Pruebas para la representación rápida de listados"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.user = User.objects.create_user(username="testuser", password="testpass123",
+                                             first_name="Ana", last_name="Pérez")
+        self.servicio = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.5)
+        manana = date.today() + timedelta(days=1)
+        for h in range(8, 12):
+            Cita.objects.create(cliente=self.user, servicio=self.servicio, fecha=manana, hora=time(h, 0),
+                                notas="No se exporta")
+
+    def test_json_identico_a_cita_serializer(self):
+        """Prueba: la lectura rápida produce los mismos bytes JSON que CitaSerializer"""
+        from rest_framework.renderers import JSONRenderer
+
+        qs = Cita.objects.order_by('-created_at', 'id')
+        clasico = JSONRenderer().render(CitaSerializer(qs, many=True).data)
+        rapido = JSONRenderer().render(CitaLecturaRapida.representar(CitaLecturaRapida.valores(qs)))
+        self.assertEqual(clasico, rapido)
+
+    def test_lectura_en_una_consulta(self):
+        """Prueba: la lectura rápida hace una sola consulta con los joins"""
+        with self.assertNumQueries(1):
+            CitaLecturaRapida.representar(CitaLecturaRapida.valores(Cita.objects.all()))
+
+
+class ServicioCatalogoCacheTest(APITestCase):
+    """Pruebas para el catálogo de servicios en caché con ETag"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass123")
+        self.servicio = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.00)
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/citas/servicios/'
+
+    def test_segunda_peticion_sin_consultas(self):
+        """Prueba: el catálogo repetido se sirve desde caché"""
+        primera = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            segunda = self.client.get(self.url)
+        self.assertEqual(primera.json(), segunda.json())
+        self.assertIn('ETag', segunda)
+
+    def test_if_none_match_devuelve_304(self):
+        """Prueba: con el ETag vigente la respuesta es 304"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cambio_en_servicio_invalida(self):
+        """Prueba: guardar un servicio cambia el ETag y el contenido"""
+        etag = self.client.get(self.url)['ETag']
+        self.servicio.nombre = "Consulta Especializada"
+        self.servicio.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['nombre'], "Consulta Especializada")
+
+    def test_post_migrate_precalienta(self):
+        """Prueba: después de migrate la primera petición al catálogo no consulta servicios"""
+        from django.apps import apps
+        from django.db.models.signals import post_migrate
+
+        post_migrate.send(sender=apps.get_app_config('citas'), app_config=apps.get_app_config('citas'),
+                          verbosity=0, interactive=False, using='default', plan=[], apps=apps)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()['results'][0]['nombre'], "Consulta General")
+
+
+class CitaCondicionalAPITest(APITestCase):
+    """Pruebas para updated_at y las peticiones condicionales (ETag / Last-Modified)"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass123")
+        self.empleado = User.objects.create_user(username="empleado", password="testpass123", is_staff=True)
+        self.servicio = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.00)
+        self.cita = Cita.objects.create(cliente=self.user, servicio=self.servicio,
+                                        fecha=date.today() + timedelta(days=1), hora=time(10, 0))
+        self.client.force_authenticate(user=self.user)
+
+    def test_created_y_updated_at_se_llenan(self):
+        """Prueba: las escrituras llenan created_at y updated_at, también en update()"""
+        self.assertIsNotNone(self.cita.created_at)
+        anterior = self.cita.updated_at
+
+        self.client.force_authenticate(user=self.empleado)
+        self.client.post(f'/api/citas/citas/{self.cita.id}/aprobar/')
+        self.cita.refresh_from_db()
+        self.assertGreater(self.cita.updated_at, anterior)
+
+    def test_detalle_304_con_etag(self):
+        """Prueba: el detalle responde 304 con el ETag vigente"""
+        url = f'/api/citas/citas/{self.cita.id}/'
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            no_modificada = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(no_modificada.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_mis_citas_304_hasta_que_cambia(self):
+        """Prueba: el listado da 304 hasta que una cita cambia"""
+        url = '/api/citas/citas/mis_citas/'
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.cita.notas = "Cambio"
+        self.cita.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class BusquedaIndexadaTest(APITestCase):
+    """Pruebas para la búsqueda indexada de citas y servicios"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.client = APIClient()
+        self.empleado = User.objects.create_user(username="empleado", password="testpass123", is_staff=True)
+        self.ana = User.objects.create_user(username="ana", first_name="Ana", last_name="Pérez",
+                                            email="ana@example.com")
+        self.luis = User.objects.create_user(username="luis", first_name="Luis", last_name="Gómez",
+                                             email="luis@example.com")
+        self.consulta = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.00)
+        self.masaje = Servicio.objects.create(nombre="Masaje Relajante", descripcion="Aromaterapia",
+                                              duracion=60, precio=80.00)
+        manana = date.today() + timedelta(days=1)
+        self.cita_ana = Cita.objects.create(cliente=self.ana, servicio=self.consulta, fecha=manana, hora=time(10, 0))
+        self.cita_luis = Cita.objects.create(cliente=self.luis, servicio=self.masaje, fecha=manana, hora=time(11, 0))
+        self.client.force_authenticate(user=self.empleado)
+
+    def _ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {cita['id'] for cita in response.data['results']}
+
+    def test_documento_normalizado(self):
+        """Prueba: el documento junta cliente y servicio en minúsculas y sin acentos"""
+        self.assertEqual(self.cita_ana.busqueda, "ana ana perez ana@example.com consulta general")
+
+    def test_busqueda_sin_acentos_y_varios_terminos(self):
+        """Prueba: ?search= ignora acentos y exige todos los términos"""
+        self.assertEqual(self._ids('/api/citas/citas/?search=perez'), {self.cita_ana.id})
+        self.assertEqual(self._ids('/api/citas/citas/?search=GÓMEZ masaje'), {self.cita_luis.id})
+        self.assertEqual(self._ids('/api/citas/citas/?search=ana masaje'), set())
+        # Términos cortos (sin índice de trigramas) también funcionan
+        self.assertEqual(self._ids('/api/citas/citas/?search=lu'), {self.cita_luis.id})
+
+    def test_documento_se_sincroniza_al_cambiar_cliente_y_servicio(self):
+        """Prueba: renombrar al cliente o al servicio actualiza la búsqueda de sus citas"""
+        self.ana.last_name = "Ramírez"
+        self.ana.save()
+        self.masaje.nombre = "Fisioterapia"
+        self.masaje.save()
+
+        self.assertEqual(self._ids('/api/citas/citas/?search=ramirez'), {self.cita_ana.id})
+        self.assertEqual(self._ids('/api/citas/citas/?search=perez'), set())
+        self.assertEqual(self._ids('/api/citas/citas/?search=fisio'), {self.cita_luis.id})
+
+    def test_cambio_de_precio_no_recorre_las_citas(self):
+        """Prueba: guardar un servicio sin cambiar el nombre no sincroniza sus citas"""
+        self.masaje.precio = 90
+        with self.assertNumQueries(2):  # nombre anterior + UPDATE del servicio
+            self.masaje.save()
+        with self.assertNumQueries(1):
+            self.masaje.save(update_fields=['precio'])
+
+    def test_busqueda_por_usuario_del_cliente(self):
+        """Prueba: el usuario del cliente forma parte del documento y se sincroniza al cambiarlo"""
+        self.luis.username = "lgomez"
+        self.luis.save(update_fields=['username'])
+
+        self.assertEqual(self._ids('/api/citas/citas/?search=lgomez'), {self.cita_luis.id})
+        self.client.force_login(User.objects.create_superuser(username="admin", password="testpass123"))
+        response = self.client.get('/admin/citas/cita/?q=lgomez')
+        self.assertEqual([cita.pk for cita in response.context['cl'].result_list], [self.cita_luis.pk])
+
+    def test_cliente_nombre_usa_el_indice(self):
+        """Prueba: el filtro cliente_nombre mantiene su criterio (solo el nombre)"""
+        self.assertEqual(self._ids('/api/citas/citas/?cliente_nombre=Ana'), {self.cita_ana.id})
+        self.assertEqual(self._ids('/api/citas/citas/?cliente_nombre=example'), set())
+
+    def test_busqueda_de_servicios(self):
+        """Prueba: la búsqueda de servicios incluye la descripción"""
+        response = self.client.get('/api/citas/servicios/?search=aromaterapia')
+        self.assertEqual([s['nombre'] for s in response.data['results']], ["Masaje Relajante"])
+
+
+class ReporteAPITest(APITestCase):
+    """Pruebas para el reporte de ocupación e ingresos"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass123")
+        self.empleado = User.objects.create_user(username="empleado", password="testpass123", is_staff=True)
+        self.consulta = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.00)
+        self.masaje = Servicio.objects.create(nombre="Masaje", duracion=60, precio=80.00)
+        self.ayer = date.today() - timedelta(days=1)
+        self.manana = date.today() + timedelta(days=1)
+
+        # Citas pasadas: se crean en el futuro y se mueven con update() (save() no acepta fechas pasadas)
+        pasadas = [
+            Cita.objects.create(cliente=self.user, servicio=self.consulta, fecha=self.manana, hora=time(9, 0)),
+            Cita.objects.create(cliente=self.user, servicio=self.masaje, fecha=self.manana, hora=time(10, 0)),
+            Cita.objects.create(cliente=self.user, servicio=self.consulta, fecha=self.manana, hora=time(11, 0),
+                                estado='cancelada'),
+        ]
+        Cita.objects.filter(pk__in=[c.pk for c in pasadas]).update(fecha=self.ayer)
+        self.futura = Cita.objects.create(cliente=self.user, servicio=self.consulta,
+                                          fecha=self.manana, hora=time(14, 0))
+        self.client.force_authenticate(user=self.empleado)
+        self.url = f'/api/citas/citas/reporte/?desde={self.ayer}&hasta={self.manana}'
+
+    def test_totales_y_ocupacion_por_servicio(self):
+        """Prueba: agrupa por servicio; canceladas cuentan pero no suman minutos ni ingresos"""
+        response = self.client.get(self.url + '&agrupar=servicio')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['totales'], {'citas': 4, 'minutos': 120, 'ingresos': '180.00'})
+        consulta = next(f for f in response.data['resultados'] if f['servicio'] == self.consulta.id)
+        self.assertEqual((consulta['citas'], consulta['minutos'], consulta['ingresos']), (3, 60, '100.00'))
+        # 3 días de 10 horas de horario laboral
+        self.assertEqual(consulta['ocupacion'], round(60 / (3 * 600), 4))
+
+    def test_dias_cerrados_salen_del_resumen(self):
+        """Prueba: los días pasados se resumen una vez y se recalculan al cambiar una cita"""
+        # El reporte solo lee: el resumen lo escribe actualizar_resumen
+        self.client.get(self.url + '&agrupar=dia')
+        self.assertFalse(ResumenDiario.objects.exists())
+        actualizar_resumen()
+        self.assertEqual(ResumenDiario.objects.filter(fecha=self.ayer).count(), 3)
+
+        # Sin cambios (ni dentro del margen), la siguiente actualización no vuelve a escribir el resumen
+        with override_settings(CITAS_RESUMEN_MARGEN=0):
+            self.assertEqual(actualizar_resumen(), 0)
+
+        cita = Cita.objects.filter(fecha=self.ayer, estado='pendiente', servicio=self.masaje).get()
+        self.client.post(f'/api/citas/citas/{cita.id}/aprobar/')
+        response = self.client.get(self.url + '&agrupar=dia,estado')
+
+        ayer = {f['estado']: f['citas'] for f in response.data['resultados'] if f['periodo'] == self.ayer}
+        self.assertEqual(ayer, {'aprobada': 1, 'pendiente': 1, 'cancelada': 1})
+
+    def test_cita_borrada_recalcula_el_dia(self):
+        """Prueba: borrar una cita de un día resumido lo vuelve a calcular"""
+        actualizar_resumen()
+        Cita.objects.filter(fecha=self.ayer, servicio=self.masaje).delete()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['totales']['citas'], 3)
+
+    def test_cambio_confirmado_tarde_no_se_pierde(self):
+        """Prueba: una cita con updated_at anterior a la marca (transacción lenta) se vuelve a resumir"""
+        actualizar_resumen()
+        marca = CorteResumen.objects.get().actualizado
+        Cita.objects.filter(fecha=self.ayer, servicio=self.masaje).update(
+            estado='aprobada', updated_at=marca - timedelta(seconds=1),
+        )
+
+        response = self.client.get(self.url + '&agrupar=estado')
+        estados = {f['estado']: f['citas'] for f in response.data['resultados']}
+        self.assertEqual(estados['aprobada'], 1)
+        actualizar_resumen()
+        self.assertTrue(ResumenDiario.objects.filter(fecha=self.ayer, estado='aprobada').exists())
+
+    def test_solo_empleados_y_agrupacion_valida(self):
+        """Prueba: clientes reciben 403 y agrupaciones inválidas 400"""
+        self.assertEqual(self.client.get(self.url + '&agrupar=dia,mes').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url + '&agrupar=sala').status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AgendaEmpleadoAPITest(APITestCase):
+    """Pruebas para la agenda de empleados"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", first_name="Ana", last_name="Pérez")
+        self.empleado = User.objects.create_user(username="empleado", password="testpass123", is_staff=True)
+        self.servicio = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.00)
+        self.manana = date.today() + timedelta(days=1)
+        for hora in (time(9, 0), time(9, 30), time(12, 0)):
+            Cita.objects.create(cliente=self.user, servicio=self.servicio, fecha=self.manana,
+                                hora=hora, empleado=self.empleado)
+        self.client.force_authenticate(user=self.empleado)
+        # Una petición antes de contar consultas, para que el trabajo de la primera
+        # petición del proceso no dependa de qué prueba corre antes
+        self.client.get('/api/health/live/')
+
+    def test_agenda_del_dia_con_huecos_en_una_consulta(self):
+        """Prueba: citas ordenadas, huecos libres del horario laboral y una sola consulta"""
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/citas/citas/agenda/?fecha={self.manana}')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        bloques = response.data['dias'][0]['bloques']
+        self.assertEqual(
+            [(b['tipo'], b['inicio'], b['fin']) for b in bloques],
+            [('libre', '08:00', '09:00'), ('cita', '09:00', '09:30'), ('cita', '09:30', '10:00'),
+             ('libre', '10:00', '12:00'), ('cita', '12:00', '12:30'), ('libre', '12:30', '18:00')],
+        )
+        self.assertEqual(bloques[1]['cliente_nombre'], "Ana Pérez")
+        self.assertEqual(bloques[1]['servicio_nombre'], "Consulta General")
+
+    def test_agenda_semanal(self):
+        """Prueba: la vista semanal cubre de lunes a domingo"""
+        response = self.client.get(f'/api/citas/citas/agenda/?fecha={self.manana}&vista=semana')
+        self.assertEqual(len(response.data['dias']), 7)
+        self.assertEqual(response.data['desde'].weekday(), 0)
+
+    def test_agenda_solo_empleados(self):
+        """Prueba: un cliente no puede ver agendas"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/citas/citas/agenda/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AsignacionEmpleadosTest(APITestCase):
+    """Pruebas para la asignación automática de empleados"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass123")
+        self.ana = User.objects.create_user(username="ana", is_staff=True)
+        self.luis = User.objects.create_user(username="luis", is_staff=True)
+        self.consulta = Servicio.objects.create(nombre="Consulta General", duracion=60, precio=50.00)
+        self.masaje = Servicio.objects.create(nombre="Masaje", duracion=60, precio=80.00)
+        self.terapia = Servicio.objects.create(nombre="Terapia", duracion=60, precio=70.00)
+        self.manana = date.today() + timedelta(days=1)
+        self.client.force_authenticate(user=self.ana)
+
+    def _cita(self, servicio, hora, **extra):
+        return Cita.objects.create(cliente=self.user, servicio=servicio, fecha=self.manana, hora=hora, **extra)
+
+    def test_intervalos_fusionados(self):
+        """Prueba: el índice fusiona intervalos y detecta cruces con cualquiera de ellos"""
+        agenda = Intervalos()
+        agenda.agregar(9, 12)
+        agenda.agregar(10, 11)
+        agenda.agregar(13, 14)
+        self.assertEqual((agenda.inicios, agenda.fines), ([9, 13], [12, 14]))
+        self.assertTrue(agenda.se_cruza(11, 12))
+        self.assertFalse(agenda.se_cruza(12, 13))
+
+    def test_reparte_sin_cruces_y_balanceado(self):
+        """Prueba: citas simultáneas van a empleados distintos y la carga se equilibra"""
+        citas = [self._cita(self.consulta, time(9, 0)), self._cita(self.masaje, time(9, 0)),
+                 self._cita(self.consulta, time(10, 0)), self._cita(self.masaje, time(10, 0))]
+
+        response = self.client.post('/api/citas/citas/asignar/', {'desde': str(self.manana)}, format='json')
+
+        self.assertEqual(response.data['asignadas'], 4)
+        self.assertEqual(response.data['por_empleado'], {self.ana.id: 2, self.luis.id: 2})
+        asignadas = {c.id: c.empleado_id for c in Cita.objects.filter(pk__in=[c.pk for c in citas])}
+        self.assertNotEqual(asignadas[citas[0].id], asignadas[citas[1].id])
+        self.assertNotEqual(asignadas[citas[2].id], asignadas[citas[3].id])
+
+    def test_respeta_asignadas_e_informa_sin_empleado(self):
+        """Prueba: las citas ya asignadas ocupan la agenda; si nadie está libre se informa"""
+        self._cita(self.consulta, time(9, 0), empleado=self.ana)
+        libre = self._cita(self.masaje, time(9, 0))
+        sin_hueco = self._cita(self.terapia, time(9, 0))
+
+        # Empleados, citas del rango y un UPDATE (más el savepoint de bulk_update)
+        with self.assertNumQueries(5):
+            resultado = asignar_empleados(self.manana, self.manana)
+
+        libre.refresh_from_db()
+        self.assertEqual(libre.empleado, self.luis)
+        self.assertEqual(resultado['sin_empleado'], [sin_hueco.id])
+
+    def test_reasignar_sin_hueco_deja_la_cita_sin_empleado(self):
+        """Prueba: al reasignar, una cita que no entra en ninguna agenda pierde su empleado anterior"""
+        citas = [self._cita(servicio, time(9, 0), empleado=self.ana)
+                 for servicio in (self.consulta, self.masaje, self.terapia)]
+
+        resultado = asignar_empleados(self.manana, self.manana, reasignar=True)
+
+        self.assertEqual(len(resultado['sin_empleado']), 1)
+        sin_empleado = Cita.objects.get(pk=resultado['sin_empleado'][0])
+        self.assertIsNone(sin_empleado.empleado)
+        empleados = [c.empleado_id for c in Cita.objects.filter(pk__in=[c.pk for c in citas], empleado__isnull=False)]
+        self.assertEqual(sorted(empleados), sorted([self.ana.id, self.luis.id]))
+
+    def test_cuerpo_invalido_devuelve_400(self):
+        """Prueba: un cuerpo que no es un objeto o fechas mal formadas son 400"""
+        for cuerpo in ([], "2026-01-01", {'desde': 'mañana'}, {'desde': '2026-01-02', 'hasta': '2026-01-01'}):
+            response = self.client.post('/api/citas/citas/asignar/', cuerpo, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, cuerpo)
+
+    def test_solo_empleados(self):
+        """Prueba: un cliente no puede asignar"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post('/api/citas/citas/asignar/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class PermisoStaffClaimTest(APITestCase):
+    """Pruebas para las acciones de personal autorizadas con el claim is_staff del token"""
+
+    def setUp(self):
+        """Crear datos de prueba y tokens con claims"""
+        self.user = User.objects.create_user(username="testuser")
+        self.empleado = User.objects.create_user(username="empleado", is_staff=True)
+        self.servicio = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.00)
+        self.manana = date.today() + timedelta(days=1)
+        self.cita = Cita.objects.create(cliente=self.user, servicio=self.servicio, fecha=self.manana, hora=time(9, 0))
+        cache_usuarios.limpiar()
+        self.addCleanup(cache_usuarios.limpiar)
+
+    def _cabeceras(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {agregar_claims(RefreshToken.for_user(user).access_token, user)}'}
+
+    def test_acciones_de_personal_sin_consultar_usuarios(self):
+        """Prueba: con la caché de usuarios caliente, ni el permiso ni la vista leen usuarios o perfiles"""
+        base = '/api/citas/citas/'
+        peticiones = [
+            ('get', f'{base}agenda/?fecha={self.manana}', None),
+            ('get', f'{base}reporte/', None),
+            ('post', f'{base}aprobar_lote/', {'ids': [self.cita.pk]}),
+            ('post', f'{base}{self.cita.pk}/completar/', None),
+        ]
+        cabeceras = self._cabeceras(self.empleado)
+        self.client.get(f'{base}agenda/', **cabeceras)  # llena la caché de usuarios del proceso
+        tablas = (User._meta.db_table, Profile._meta.db_table)
+        for metodo, url, datos in peticiones:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as consultas:
+                response = getattr(self.client, metodo)(url, datos, format='json', **cabeceras)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            leidas = [c['sql'] for c in consultas if any(f'FROM "{tabla}"' in c['sql'] for tabla in tablas)]
+            self.assertEqual(leidas, [])
+
+    def test_cliente_recibe_403(self):
+        """Prueba: un token sin is_staff no puede usar las acciones de personal"""
+        response = self.client.post(f'/api/citas/citas/{self.cita.pk}/aprobar/', **self._cabeceras(self.user))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.cita.refresh_from_db()
+        self.assertEqual(self.cita.estado, 'pendiente')
+
+
+class CitaPresupuestoConsultasTest(APITestCase):
+    """
+    Presupuesto de consultas SQL de cada acción de CitaViewSet.
+    Si una acción pasa a hacer más consultas, o repite una misma consulta por
+    fila (N+1), la prueba falla. Una acción nueva debe agregar su presupuesto.
+    """
+
+    # Consultas por acción, contando SAVEPOINT/RELEASE de las transacciones anidadas
+    PRESUPUESTOS = {
+        'list': 2,
+        'retrieve': 2,
+        'create': 17,
+        'update': 20,
+        'partial_update': 19,
+        'destroy': 3,
+        'lote': 6,
+        'aprobar': 2,
+        'rechazar': 2,
+        'completar': 2,
+        'aprobar_lote': 4,
+        'rechazar_lote': 4,
+        'completar_lote': 4,
+        'pendientes': 2,
+        'mis_citas': 2,
+        'por_rango_fechas': 2,
+        'agenda': 1,
+        'asignar': 4,
+        'exportar': 1,
+        'reporte': 12,
+    }
+
+    def setUp(self):
+        """Crear datos de prueba: varias citas de clientes distintos"""
+        self.client = APIClient()
+        self.empleado = User.objects.create_user(username="empleado", is_staff=True)
+        self.servicio = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.00)
+        self.manana = date.today() + timedelta(days=1)
+        self.citas = []
+        for indice in range(6):
+            cliente = User.objects.create_user(username=f"cliente{indice}", first_name=f"Cliente {indice}")
+            self.citas.append(Cita.objects.create(
+                cliente=cliente, servicio=self.servicio, fecha=self.manana,
+                hora=time(9 + indice, 0), empleado=self.empleado,
+            ))
+        Cita.objects.filter(pk=self.citas[1].pk).update(estado='aprobada')
+        self.client.force_authenticate(user=self.empleado)
+        # Una petición antes de contar consultas, para que el trabajo de la primera
+        # petición del proceso no dependa de qué prueba corre antes
+        self.client.get('/api/health/live/')
+
+    def _peticion(self, accion):
+        base = '/api/citas/citas/'
+        cita = self.citas[0]
+        nueva = {'servicio': self.servicio.pk, 'fecha': self.manana.isoformat(), 'hora': '16:00'}
+        ids = {'ids': [c.pk for c in self.citas]}
+        peticiones = {
+            'list': ('get', base, None),
+            'retrieve': ('get', f'{base}{cita.pk}/', None),
+            'create': ('post', base, nueva),
+            'update': ('put', f'{base}{cita.pk}/', dict(nueva, hora='17:00')),
+            'partial_update': ('patch', f'{base}{cita.pk}/', {'hora': '17:00'}),
+            'destroy': ('delete', f'{base}{cita.pk}/', None),
+            'lote': ('post', f'{base}lote/', [dict(nueva, hora=f'{hora}:00') for hora in (15, 16, 17)]),
+            'aprobar': ('post', f'{base}{cita.pk}/aprobar/', None),
+            'rechazar': ('post', f'{base}{cita.pk}/rechazar/', None),
+            'completar': ('post', f'{base}{self.citas[1].pk}/completar/', None),
+            'aprobar_lote': ('post', f'{base}aprobar_lote/', ids),
+            'rechazar_lote': ('post', f'{base}rechazar_lote/', ids),
+            'completar_lote': ('post', f'{base}completar_lote/', ids),
+            'pendientes': ('get', f'{base}pendientes/', None),
+            'mis_citas': ('get', f'{base}mis_citas/', None),
+            'por_rango_fechas': ('get', f'{base}por_rango_fechas/?fecha_desde={self.manana}&fecha_hasta={self.manana}', None),
+            'agenda': ('get', f'{base}agenda/?fecha={self.manana}', None),
+            'asignar': ('post', f'{base}asignar/', {'desde': self.manana.isoformat(), 'reasignar': True}),
+            'exportar': ('get', f'{base}exportar/', None),
+            'reporte': ('get', f'{base}reporte/', None),
+        }
+        metodo, url, datos = peticiones[accion]
+        return getattr(self.client, metodo)(url, datos, format='json')
+
+    def test_todas_las_acciones_tienen_presupuesto(self):
+        """Prueba: cada acción de CitaViewSet declara su presupuesto de consultas"""
+        acciones = {'list', 'retrieve', 'create', 'update', 'partial_update', 'destroy'}
+        acciones.update(accion.__name__ for accion in CitaViewSet.get_extra_actions())
+        self.assertEqual(acciones, set(self.PRESUPUESTOS))
+
+    def test_presupuesto_por_accion(self):
+        """Prueba: ninguna acción supera su presupuesto ni repite consultas por fila"""
+        for accion, maximo in self.PRESUPUESTOS.items():
+            with self.subTest(accion=accion), transaction.atomic():
+                with presupuesto_consultas(maximo):
+                    response = self._peticion(accion)
+                    b''.join(getattr(response, 'streaming_content', []))
+                self.assertLess(response.status_code, 300, accion)
+                # Cada acción parte de los mismos datos
+                transaction.set_rollback(True)
+
+    def test_presupuesto_detecta_n_mas_uno(self):
+        """Prueba: la ayuda de pruebas falla si una misma consulta se repite por fila"""
+        with self.assertRaisesMessage(AssertionError, 'posible N+1'):
+            with presupuesto_consultas(100):
+                [str(cita) for cita in Cita.objects.all()]
+
+
+class CitaAdminTest(TestCase):
+    """Pruebas para el admin de citas con tablas grandes"""
+
+    def setUp(self):
+        """Crear datos de prueba"""
+        self.admin = User.objects.create_superuser(username="admin", password="testpass123")
+        self.client.force_login(self.admin)
+        self.servicio = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.00)
+        self.manana = date.today() + timedelta(days=1)
+
+    def _crear_citas(self, cantidad, desde=0):
+        return [
+            Cita.objects.create(
+                cliente=User.objects.create_user(username=f"cliente{indice}"),
+                servicio=self.servicio, fecha=self.manana, hora=time(8 + indice // 2, 30 * (indice % 2)),
+            )
+            for indice in range(desde, desde + cantidad)
+        ]
+
+    def _consultas_listado(self):
+        with presupuesto_consultas(100) as registro:
+            response = self.client.get('/admin/citas/cita/')
+        self.assertEqual(response.status_code, 200)
+        return registro.consultas
+
+    def test_listado_sin_consultas_por_fila(self):
+        """Prueba: el listado hace las mismas consultas con 2 o con 12 citas"""
+        self._crear_citas(2)
+        self._consultas_listado()  # La primera vez se precalienta el catálogo del filtro de servicios
+        con_pocas = self._consultas_listado()
+        self._crear_citas(10, desde=2)
+        self.assertEqual(self._consultas_listado(), con_pocas)
+
+    def test_conteo_acotado(self):
+        """Prueba: el paginador cuenta como máximo ADMIN_CONTEO_MAX filas"""
+        self._crear_citas(6)
+        with self.settings(ADMIN_CONTEO_MAX=4):
+            response = self.client.get('/admin/citas/cita/')
+        self.assertEqual(response.context['cl'].result_count, 4)
+
+    def test_formulario_sin_select_de_usuarios(self):
+        """Prueba: el formulario no carga la lista de usuarios ni de servicios"""
+        cita, = self._crear_citas(1)
+        response = self.client.get(f'/admin/citas/cita/{cita.pk}/change/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, '<option value="%s">' % self.admin.pk)
+        self.assertContains(response, 'vForeignKeyRawIdAdminField')
+
+    def test_accion_aprobar_en_un_update(self):
+        """Prueba: la acción masiva cambia solo las citas pendientes con un único UPDATE"""
+        pendiente, rechazada = self._crear_citas(2)
+        Cita.objects.filter(pk=rechazada.pk).update(estado='rechazada')
+
+        with presupuesto_consultas(100) as registro:
+            self.client.post('/admin/citas/cita/', {
+                'action': 'aprobar', '_selected_action': [pendiente.pk, rechazada.pk],
+            })
+
+        self.assertEqual(
+            [sql for sql in registro.huellas if sql.startswith('UPDATE "citas_cita"')],
+            ['UPDATE "citas_cita" SET "estado" = ?, "updated_at" = ?, "empleado_id" = ? '
+             'WHERE ("citas_cita"."id" IN (...) AND "citas_cita"."estado" = ?)'],
+        )
+        pendiente.refresh_from_db()
+        rechazada.refresh_from_db()
+        self.assertEqual((pendiente.estado, pendiente.empleado), ('aprobada', self.admin))
+        self.assertEqual(rechazada.estado, 'rechazada')
+
+
+@override_settings(ROOT_URLCONF='config.urls_asgi')
+class VistasAsincronasTest(TestCase):
+    """Pruebas para las vistas asíncronas del modo ASGI (config/urls_asgi.py)"""
+
+    def setUp(self):
+        """Crear datos de prueba y un token JWT"""
+        self.user = User.objects.create_user(username="testuser", first_name="Ana", last_name="Pérez")
+        self.empleado = User.objects.create_user(username="empleado", is_staff=True)
+        self.servicio = Servicio.objects.create(nombre="Consulta General", duracion=30, precio=50.00)
+        manana = date.today() + timedelta(days=1)
+        self.citas = [
+            Cita.objects.create(cliente=self.user, servicio=self.servicio, fecha=manana, hora=time(h, 0))
+            for h in range(8, 13)
+        ]
+        Cita.objects.create(cliente=self.empleado, servicio=self.servicio, fecha=manana, hora=time(14, 0))
+        Cita.objects.filter(pk=self.citas[0].pk).update(estado='aprobada')
+        self.cabeceras = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    def _sincrona(self, url, user):
+        """Respuesta de la misma URL con las vistas síncronas de config.urls."""
+        cliente = APIClient()
+        cliente.force_authenticate(user=user)
+        with override_settings(ROOT_URLCONF='config.urls'):
+            return cliente.get(url)
+
+    async def test_listados_iguales_a_la_version_sincrona(self):
+        """Prueba: list, mis_citas, pendientes y servicios devuelven el mismo JSON que las vistas síncronas"""
+        for url in ('/api/citas/citas/?page_size=2', '/api/citas/citas/mis_citas/',
+                    '/api/citas/citas/pendientes/', '/api/citas/citas/?estado=pendiente&ordering=hora',
+                    '/api/citas/servicios/'):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url, headers=self.cabeceras)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                esperada = await sync_to_async(self._sincrona)(url, self.user)
+                self.assertEqual(response.json(), esperada.json())
+                self.assertEqual(response['ETag'], esperada['ETag'])
+
+    async def test_cursor_y_etag(self):
+        """Prueba: los cursores recorren todas las citas y el ETag vigente da 304"""
+        ids, url = [], '/api/citas/citas/?page_size=2'
+        while url:
+            response = await self.async_client.get(url, headers=self.cabeceras)
+            ids.extend(c['id'] for c in response.json()['results'])
+            url = response.json()['next']
+        self.assertEqual(ids, [c.id for c in reversed(self.citas)])
+
+        response = await self.async_client.get('/api/citas/citas/', headers=self.cabeceras)
+        no_modificada = await self.async_client.get(
+            '/api/citas/citas/', headers=dict(self.cabeceras, **{'If-None-Match': response['ETag']})
+        )
+        self.assertEqual(no_modificada.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_errores_como_drf(self):
+        """Prueba: sin token 401 con WWW-Authenticate; cursor inválido 404"""
+        response = await self.async_client.get('/api/citas/citas/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+        response = await self.async_client.get('/api/citas/citas/', headers={'Authorization': 'Bearer x'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = await self.async_client.get('/api/citas/citas/?cursor=x', headers=self.cabeceras)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json(), {'detail': 'Cursor inválido.'})
+
+    async def test_autenticacion_con_token_y_con_sesion(self):
+        """Prueba: con la caché de usuarios fría el token se valida en el hilo de initial(); la sesión también sirve"""
+        cache_usuarios.limpiar()
+        response = await self.async_client.get('/api/citas/citas/mis_citas/', headers=self.cabeceras)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), len(self.citas))
+
+        await self.async_client.aforce_login(self.empleado)
+        response = await self.async_client.get('/api/citas/citas/mis_citas/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 1)
+
+    async def test_otros_metodos_usan_la_vista_sincrona(self):
+        """Prueba: POST y la API navegable siguen en las vistas síncronas"""
+        response = await self.async_client.post(
+            '/api/citas/citas/',
+            {'servicio': self.servicio.pk, 'fecha': (date.today() + timedelta(days=2)).isoformat(), 'hora': '10:00'},
+            content_type='application/json', headers=self.cabeceras,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = await self.async_client.get('/api/citas/citas/', headers=dict(self.cabeceras, Accept='text/html'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('text/html', response['Content-Type'])
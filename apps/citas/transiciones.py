@@ -0,0 +1,108 @@
+"""
+Cambios de estado de las Citas.
+
+Define las transiciones permitidas (estado de origen -> estado destino) y las
+aplica como UPDATE condicionales (compare-and-swap): la base de datos solo
+cambia la fila si sigue en el estado esperado, así dos empleados no pueden
+aprobar y rechazar la misma cita a la vez y no hacen falta bloqueos.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cita
+
+
+# accion: (estado de origen requerido, estado destino)
+TRANSICIONES = {
+    'aprobar': ('pendiente', 'aprobada'),
+    'rechazar': ('pendiente', 'rechazada'),
+    'completar': ('aprobada', 'completada'),
+}
+
+
+# Resultado de una transición individual:
+# - aplicada: True si la cita cambió de estado
+# - cita: la cita tal como quedó (con su estado actual si hubo conflicto)
+# - estado_esperado: estado de origen que requería la transición
+ResultadoTransicion = namedtuple('ResultadoTransicion', ['aplicada', 'cita', 'estado_esperado'])
+
+
+def _campos(accion, empleado):
+    """Campos que escribe cada transición (update() no aplica auto_now, se fija updated_at)."""
+    campos = {'estado': TRANSICIONES[accion][1], 'updated_at': timezone.now()}
+    if accion == 'aprobar':
+        campos['empleado'] = empleado
+    return campos
+
+
+def transicionar(queryset, pk, accion, empleado=None):
+    """
+    Aplica `accion` a una cita: la lee de `queryset` (con sus select_related)
+    y la cambia con un UPDATE ... WHERE estado = origen. No se vuelve a leer
+    después: si el UPDATE cambió la fila, los campos escritos se copian en la
+    instancia, que queda igual a lo que escribió esta transición.
+    Lanza Cita.DoesNotExist si la cita no está en el queryset.
+    Retorna un ResultadoTransicion; si la cita ya estaba en otro estado,
+    `aplicada` es False, no se escribe nada y la cita trae su estado actual.
+    """
+    origen = TRANSICIONES[accion][0]
+    cita = queryset.get(pk=pk)
+    if cita.estado != origen:
+        return ResultadoTransicion(False, cita, origen)
+
+    campos = _campos(accion, empleado)
+    if queryset.filter(pk=cita.pk, estado=origen).update(**campos) == 1:
+        for campo, valor in campos.items():
+            setattr(cita, campo, valor)
+        return ResultadoTransicion(True, cita, origen)
+
+    # Otra petición cambió el estado entre la lectura y el UPDATE
+    cita.refresh_from_db(fields=['estado'])
+    return ResultadoTransicion(False, cita, origen)
+
+
+def transicion_queryset(queryset, accion, empleado=None):
+    """
+    Aplica `accion` a todas las citas del queryset que están en el estado de
+    origen, con un único UPDATE (sin leer las citas). Retorna cuántas cambiaron.
+    """
+    origen = TRANSICIONES[accion][0]
+    return queryset.order_by().filter(estado=origen).update(**_campos(accion, empleado))
+
+
+def transicion_masiva(ids, accion, empleado=None):
+    """
+    Aplica `accion` a las citas con los `ids` dados.
+    Solo cambian las que están en el estado de origen; el resto se reportan
+    como omitidas con su estado actual. Al aprobar se asigna `empleado`.
+
+    Retorna un dict con:
+    - actualizadas: ids que cambiaron de estado
+    - omitidas: [{'id', 'estado'}] de las que estaban en otro estado
+    - no_encontradas: ids que no existen
+    """
+    origen = TRANSICIONES[accion][0]
+
+    with transaction.atomic():
+        # Leer y bloquear el estado actual de las citas en una sola consulta
+        actuales = dict(
+            Cita.objects.select_for_update()
+            .filter(pk__in=ids)
+            .order_by()
+            .values_list('pk', 'estado')
+        )
+        actualizadas = sorted(pk for pk, estado in actuales.items() if estado == origen)
+        if actualizadas:
+            # Un único UPDATE ... WHERE estado = origen para todo el conjunto
+            Cita.objects.filter(pk__in=actualizadas, estado=origen).update(**_campos(accion, empleado))
+
+    return {
+        'actualizadas': actualizadas,
+        'omitidas': [
+            {'id': pk, 'estado': estado}
+            for pk, estado in sorted(actuales.items()) if estado != origen
+        ],
+        'no_encontradas': sorted(set(ids) - set(actuales)),
+    }
@@ -5,22 +5,38 @@ y acciones personalizadas (aprobar, rechazar, completar).
 """
 
 # DRF: viewsets, respuestas HTTP, decoradores y permisos
-from rest_framework import viewsets, status, generics
+from rest_framework import viewsets, status, generics, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
 # Transacciones atómicas para evitar inconsistencias en cambios críticos
 from django.db import transaction
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404
+from django.conf import settings
+from django.utils import timezone
+from datetime import date, timedelta
 
 # Filtrado avanzado
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from django_filters import rest_framework as filters
 
 # Modelos y serializers de la app
 from .models import Cita, Servicio
-from .serializers import CitaSerializer, ServicioSerializer
+from .serializers import AsignacionSerializer, CitaSerializer, ServicioSerializer, CitaLecturaRapida
+from .disponibilidad import agenda_empleado, horarios_libres
+from .lote import reservar_lote
+from .transiciones import TRANSICIONES, transicion_masiva, transicionar
+from .pagination import KeysetPagination
+from .exportar import FORMATOS, respuesta_exportacion
+from .busqueda import BusquedaIndexada
+from .reportes import DIMENSIONES, PERIODOS, generar_reporte
+from .asignacion import asignar_empleados
+from . import busqueda, catalogo, condicional
+from apps.core.asincronas import filtrar
+from apps.users.permissions import IsStaffClaim
 
 
 # -------------------------
@@ -49,9 +65,10 @@ class ServicioViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     # Filtrado, búsqueda y ordenamiento
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    # La búsqueda (?search=) usa el documento indexado con los campos de search_fields
+    filter_backends = [DjangoFilterBackend, BusquedaIndexada, OrderingFilter]
     filterset_class = ServicioFilter
-    search_fields = ['nombre', 'descripcion']
+    search_fields = list(Servicio.CAMPOS_BUSQUEDA)
     ordering_fields = ['nombre', 'precio']
     
     def get_permissions(self):
@@ -64,6 +81,98 @@ class ServicioViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated()]
         return [IsAuthenticated()]
 
+    def list(self, request, *args, **kwargs):
+        """
+        Catálogo de servicios servido desde caché.
+        - Con If-None-Match igual al ETag vigente responde 304 sin tocar la base de datos.
+        - Si no, pagina en memoria el catálogo ya serializado para esos filtros.
+        """
+        clave, cabeceras = self._catalogo_pedido(request, catalogo.version())
+        if clave is None:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+        datos = catalogo.obtener(clave)
+        if datos is None:
+            datos = self.get_serializer(self.filter_queryset(self.get_queryset()), many=True).data
+            catalogo.guardar(clave, datos)
+        return self._respuesta_catalogo(datos, cabeceras)
+
+    async def alist(self, request, *args, **kwargs):
+        """list() para el modo ASGI: caché con la API asíncrona y, si falta el catálogo, ORM asíncrono."""
+        clave, cabeceras = self._catalogo_pedido(request, await catalogo.aversion())
+        if clave is None:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+        datos = await catalogo.aobtener(clave)
+        if datos is None:
+            servicios = [servicio async for servicio in await filtrar(self, self.get_queryset())]
+            datos = self.get_serializer(servicios, many=True).data
+            await catalogo.aguardar(clave, datos)
+        return self._respuesta_catalogo(datos, cabeceras)
+
+    def _catalogo_pedido(self, request, version):
+        """
+        (clave de caché, cabeceras) del catálogo pedido en la versión dada.
+        La clave es None si el cliente ya tiene el ETag vigente (304).
+        """
+        etag = catalogo.etag(version, request)
+        cabeceras = {
+            'ETag': etag,
+            'Cache-Control': f"private, max-age={settings.CITAS_CATALOGO_MAX_AGE}",
+        }
+
+        if etag in request.headers.get('If-None-Match', ''):
+            return None, cabeceras
+
+        return catalogo.clave(version, request.query_params), cabeceras
+
+    def _respuesta_catalogo(self, datos, cabeceras):
+        """Pagina en memoria el catálogo ya serializado."""
+        page = self.paginate_queryset(datos)
+        response = self.get_paginated_response(page) if page is not None else Response(datos)
+        for cabecera, valor in cabeceras.items():
+            response[cabecera] = valor
+        return response
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def disponibilidad(self, request, pk=None):
+        """
+        Horarios libres del servicio dentro de un rango de fechas:
+        - desde=YYYY-MM-DD (por defecto hoy)
+        - hasta=YYYY-MM-DD (por defecto igual a desde)
+        """
+        servicio = self.get_object()
+
+        if not servicio.activo:
+            return Response({"detail": "El servicio no está activo."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            desde = date.fromisoformat(request.query_params.get('desde') or timezone.localdate().isoformat())
+            hasta = date.fromisoformat(request.query_params.get('hasta') or desde.isoformat())
+        except ValueError:
+            return Response({"detail": "Formato de fecha inválido, use YYYY-MM-DD."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if hasta < desde:
+            return Response({"detail": "La fecha 'hasta' no puede ser anterior a 'desde'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        max_dias = settings.CITAS_DISPONIBILIDAD_MAX_DIAS
+        if hasta - desde >= timedelta(days=max_dias):
+            return Response({"detail": f"El rango máximo es de {max_dias} días."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        dias = horarios_libres(servicio, desde, hasta)
+        return Response({
+            "servicio": servicio.id,
+            "duracion": servicio.duracion,
+            "desde": desde,
+            "hasta": hasta,
+            "dias": [
+                {"fecha": dia['fecha'], "horarios": [h.strftime('%H:%M') for h in dia['horarios']]}
+                for dia in dias
+            ],
+        })
+
 
 # -------------------------
 #        FILTROS CITAS
@@ -73,9 +182,16 @@ class CitaFilter(filters.FilterSet):
     fecha_desde = filters.DateFilter(field_name='fecha', lookup_expr='gte')
     fecha_hasta = filters.DateFilter(field_name='fecha', lookup_expr='lte')
     estado = filters.ChoiceFilter(field_name='estado', choices=Cita.ESTADOS)
-    cliente_nombre = filters.CharFilter(field_name='cliente__first_name', lookup_expr='icontains')
+    cliente_nombre = filters.CharFilter(method='filtrar_cliente_nombre')
     servicio = filters.NumberFilter(field_name='servicio__id')
 
+    def filtrar_cliente_nombre(self, queryset, name, value):
+        """
+        El índice de búsqueda reduce las candidatas; el icontains final
+        conserva el criterio original (solo el nombre del cliente).
+        """
+        return busqueda.filtrar(queryset, value).filter(cliente__first_name__icontains=value)
+
     class Meta:
         model = Cita
         fields = ['estado', 'servicio', 'cliente', 'fecha_desde', 'fecha_hasta']
@@ -99,123 +215,260 @@ class CitaViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     # Configuración de filtros de la API
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    # La búsqueda (?search=) usa el documento indexado con los campos de search_fields
+    filter_backends = [DjangoFilterBackend, BusquedaIndexada, OrderingFilter]
     filterset_class = CitaFilter
-    search_fields = ['cliente__first_name', 'cliente__last_name', 'cliente__email', 'servicio__nombre']
+    search_fields = list(Cita.CAMPOS_BUSQUEDA)
     ordering_fields = ['fecha', 'hora', 'created_at', 'estado']
     ordering = ['-created_at']
 
+    # Paginación por cursor: sin COUNT(*) ni OFFSET, con índices sobre el orden
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', 'id')
+
     def get_queryset(self):
         """
         Los empleados ven todas las citas.
         Los clientes solo ven sus propias citas.
         """
+        if getattr(self, 'swagger_fake_view', False):
+            # generar_openapi introspecciona la vista con un usuario anónimo
+            return Cita.objects.none()
         user = self.request.user
         if user.is_staff:
             return Cita.objects.all().select_related('cliente', 'servicio', 'empleado')
         return Cita.objects.filter(cliente=user).select_related('cliente', 'servicio', 'empleado')
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Detalle de una cita con ETag y Last-Modified.
+        Primero se lee solo updated_at; si el cliente tiene la versión vigente
+        se responde 304 sin cargar ni serializar la cita.
+        """
+        try:
+            updated_at = self.get_queryset().filter(pk=kwargs['pk']).values_list('updated_at', flat=True).first()
+        except (ValueError, TypeError):
+            raise Http404
+        if updated_at is None:
+            raise Http404
+
+        etag, ultimo = condicional.validadores_cita(request, kwargs['pk'], updated_at)
+        no_modificada = condicional.respuesta_no_modificada(request, etag, ultimo)
+        if no_modificada is not None:
+            return condicional.marcar(no_modificada, etag, ultimo)
+
+        return condicional.marcar(super().retrieve(request, *args, **kwargs), etag, ultimo)
+
     def perform_create(self, serializer):
         """Asignar automáticamente el cliente autenticado al crear una cita."""
-        with transaction.atomic():
-            serializer.save(cliente=self.request.user)
+        try:
+            with transaction.atomic():
+                serializer.save(cliente=self.request.user)
+        except DjangoValidationError as e:
+            # Validaciones del modelo (p. ej. un cruce detectado dentro de la transacción)
+            raise serializers.ValidationError(e.messages)
 
     def perform_update(self, serializer):
         """Actualizar una cita dentro de una transacción segura."""
-        with transaction.atomic():
-            serializer.save()
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
 
 
     # -------------------------
     #     ACCIONES PERSONALIZADAS
     # -------------------------
 
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def lote(self, request):
+        """
+        Crear varias citas en una sola petición.
+        Recibe una lista de citas y devuelve el resultado o error de cada una:
+        201 si se crearon todas, 207 si solo algunas, 400 si ninguna.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "Se espera una lista de citas."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        max_items = settings.CITAS_LOTE_MAX
+        if len(items) > max_items:
+            return Response({"detail": f"El lote admite como máximo {max_items} citas."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        resultados, creadas = reservar_lote(items, request.user)
+        for indice, cita in creadas:
+            resultados[indice] = {"indice": indice, "estado": "creada", "cita": self.get_serializer(cita).data}
+
+        if len(creadas) == len(items):
+            codigo = status.HTTP_201_CREATED
+        elif creadas:
+            codigo = status.HTTP_207_MULTI_STATUS
+        else:
+            codigo = status.HTTP_400_BAD_REQUEST
+
+        return Response({
+            "creadas": len(creadas),
+            "con_error": len(items) - len(creadas),
+            "resultados": resultados,
+        }, status=codigo)
+
+    def _transicion(self, request, pk, accion, mensaje_estado):
+        """
+        Aplica una transición con un UPDATE condicional (compare-and-swap):
+        una lectura y, si la cita está en el estado de origen, una escritura,
+        sin bloquear la fila.
+        """
+        try:
+            resultado = transicionar(self.get_queryset(), pk, accion, empleado=request.user)
+        except (Cita.DoesNotExist, ValueError):
+            raise Http404
+
+        # Conflicto: la cita ya no estaba en el estado esperado
+        if not resultado.aplicada:
+            return Response({"detail": f"{mensaje_estado} Estado actual: {resultado.cita.estado}",
+                             "estado_actual": resultado.cita.estado},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(self.get_serializer(resultado.cita).data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsStaffClaim])
     def aprobar(self, request, pk=None):
         """Aprobar una cita (solo empleados)."""
-        cita = self.get_object()
-        
-        # Validación de permisos
-        if not request.user.is_staff:
-            return Response({"detail": "Solo empleados pueden aprobar citas."},
-                            status=status.HTTP_403_FORBIDDEN)
-        
-        # Validación de estado
-        if cita.estado != 'pendiente':
-            return Response({"detail": f"Solo citas pendientes pueden aprobarse. Estado actual: {cita.estado}"},
-                            status=status.HTTP_400_BAD_REQUEST)
-        
-        # Operación atómica
-        with transaction.atomic():
-            cita.estado = 'aprobada'
-            cita.empleado = request.user
-            cita.save()
-        
-        return Response(self.get_serializer(cita).data, status=status.HTTP_200_OK)
+        return self._transicion(request, pk, 'aprobar',
+                                "Solo citas pendientes pueden aprobarse.")
 
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    @action(detail=True, methods=['post'], permission_classes=[IsStaffClaim])
     def rechazar(self, request, pk=None):
         """Rechazar una cita (solo empleados)."""
-        cita = self.get_object()
-        
-        if not request.user.is_staff:
-            return Response({"detail": "Solo empleados pueden rechazar citas."},
-                            status=status.HTTP_403_FORBIDDEN)
-        
-        if cita.estado != 'pendiente':
-            return Response({"detail": f"Solo citas pendientes pueden rechazarse. Estado actual: {cita.estado}"},
-                            status=status.HTTP_400_BAD_REQUEST)
-        
-        with transaction.atomic():
-            cita.estado = 'rechazada'
-            cita.save()
-        
-        return Response(self.get_serializer(cita).data, status=status.HTTP_200_OK)
+        return self._transicion(request, pk, 'rechazar',
+                                "Solo citas pendientes pueden rechazarse.")
 
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    @action(detail=True, methods=['post'], permission_classes=[IsStaffClaim])
     def completar(self, request, pk=None):
         """Marcar una cita como completada (solo empleados)."""
-        cita = self.get_object()
-        
-        if not request.user.is_staff:
-            return Response({"detail": "Solo empleados pueden completar citas."},
-                            status=status.HTTP_403_FORBIDDEN)
-        
-        if cita.estado != 'aprobada':
-            return Response({"detail": f"Solo citas aprobadas pueden completarse. Estado actual: {cita.estado}"},
+        return self._transicion(request, pk, 'completar',
+                                "Solo citas aprobadas pueden completarse.")
+
+
+    # -------------------------
+    #     ACCIONES MASIVAS
+    # -------------------------
+
+    def _transicion_lote(self, request, accion):
+        """
+        Aplica una transición a varias citas con un solo UPDATE condicional.
+        Las citas se indican con {"ids": [...]} en el cuerpo o, si no se envían
+        ids, con los mismos parámetros de filtro del listado (?estado=, ?fecha_desde=...).
+        Por filtro se toman como máximo CITAS_LOTE_MAX citas en el estado de
+        origen; si quedan más, la respuesta trae "quedan": true y basta repetir
+        la petición.
+        """
+        ids = request.data.get('ids') if hasattr(request.data, 'get') else None
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                return Response({"detail": "'ids' debe ser una lista de enteros."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if len(ids) > settings.CITAS_LOTE_MAX:
+                return Response({"detail": f"Se admiten como máximo {settings.CITAS_LOTE_MAX} ids."},
+                                status=status.HTTP_400_BAD_REQUEST)
+        elif request.query_params:
+            maximo = settings.CITAS_LOTE_MAX
+            candidatas = self.filter_queryset(self.get_queryset()).filter(estado=TRANSICIONES[accion][0])
+            ids = list(candidatas.order_by('pk').values_list('pk', flat=True)[:maximo + 1])
+            quedan = len(ids) > maximo
+            resultado = transicion_masiva(ids[:maximo], accion, empleado=request.user)
+            return Response(dict(resultado, quedan=quedan), status=status.HTTP_200_OK)
+        else:
+            return Response({"detail": "Envíe 'ids' o parámetros de filtro."},
                             status=status.HTTP_400_BAD_REQUEST)
-        
-        with transaction.atomic():
-            cita.estado = 'completada'
-            cita.save()
-        
-        return Response(self.get_serializer(cita).data, status=status.HTTP_200_OK)
+
+        return Response(transicion_masiva(ids, accion, empleado=request.user), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsStaffClaim])
+    def aprobar_lote(self, request):
+        """Aprobar varias citas pendientes (solo empleados)."""
+        return self._transicion_lote(request, 'aprobar')
+
+    @action(detail=False, methods=['post'], permission_classes=[IsStaffClaim])
+    def rechazar_lote(self, request):
+        """Rechazar varias citas pendientes (solo empleados)."""
+        return self._transicion_lote(request, 'rechazar')
+
+    @action(detail=False, methods=['post'], permission_classes=[IsStaffClaim])
+    def completar_lote(self, request):
+        """Completar varias citas aprobadas (solo empleados)."""
+        return self._transicion_lote(request, 'completar')
 
 
     # -------------------------
     #     LISTADOS PERSONALIZADOS
     # -------------------------
 
+    def _listado_paginado(self, qs):
+        """
+        Serializa un listado con la paginación por cursor de la vista.
+        Usa la representación rápida (values() + dicts), que produce el mismo
+        JSON que CitaSerializer sin su costo por fila.
+        Responde 304 si el cliente envía el ETag vigente del listado.
+        """
+        etag, ultimo = condicional.validadores_lista(self.request, qs)
+        no_modificada = condicional.respuesta_no_modificada(self.request, etag)
+        if no_modificada is not None:
+            return condicional.marcar(no_modificada, etag, ultimo)
+
+        page = self.paginate_queryset(CitaLecturaRapida.valores(qs))
+        response = self.get_paginated_response(CitaLecturaRapida.representar(page))
+        return condicional.marcar(response, etag, ultimo)
+
+    async def _alistado_paginado(self, qs):
+        """_listado_paginado() con el ORM asíncrono (modo ASGI)."""
+        etag, ultimo = await condicional.avalidadores_lista(self.request, qs)
+        no_modificada = condicional.respuesta_no_modificada(self.request, etag)
+        if no_modificada is not None:
+            return condicional.marcar(no_modificada, etag, ultimo)
+
+        page = await self.paginator.apaginate_queryset(CitaLecturaRapida.valores(qs), self.request, view=self)
+        response = self.get_paginated_response(CitaLecturaRapida.representar(page))
+        return condicional.marcar(response, etag, ultimo)
+
+    def list(self, request, *args, **kwargs):
+        """Listado general de citas con la representación rápida."""
+        return self._listado_paginado(self.filter_queryset(self.get_queryset()))
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def pendientes(self, request):
         """Lista todas las citas pendientes del usuario (o de todos si es staff)."""
         qs = self.get_queryset().filter(estado='pendiente')
-        serializer = self.get_serializer(qs, many=True)
-        return Response(serializer.data)
+        return self._listado_paginado(qs)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def mis_citas(self, request):
         """Lista todas las citas del usuario autenticado como cliente."""
         qs = Cita.objects.filter(cliente=request.user).select_related('cliente', 'servicio', 'empleado')
-        serializer = self.get_serializer(qs, many=True)
-        return Response(serializer.data)
+        return self._listado_paginado(qs)
 
-    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    # Versiones asíncronas de los listados más pedidos (modo ASGI, ver apps.core.asincronas)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._alistado_paginado(await filtrar(self, self.get_queryset()))
+
+    async def apendientes(self, request):
+        return await self._alistado_paginado(self.get_queryset().filter(estado='pendiente'))
+
+    async def amis_citas(self, request):
+        return await self._alistado_paginado(Cita.objects.filter(cliente=request.user))
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated],
+            keyset_ordering=('fecha', 'hora', 'id'))
     def por_rango_fechas(self, request):
         """
         Filtra citas dentro de un rango de fechas dado por parámetros:
         - fecha_desde=YYYY-MM-DD
         - fecha_hasta=YYYY-MM-DD
+        Ordenadas por fecha y hora, paginadas por cursor.
         """
         fecha_desde = request.query_params.get('fecha_desde')
         fecha_hasta = request.query_params.get('fecha_hasta')
@@ -227,9 +480,108 @@ class CitaViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            qs = self.get_queryset().filter(fecha__gte=fecha_desde, fecha__lte=fecha_hasta).order_by('fecha', 'hora')
-            serializer = self.get_serializer(qs, many=True)
-            return Response({"count": qs.count(), "results": serializer.data})
-        except Exception as e:
+            fecha_desde = date.fromisoformat(fecha_desde)
+            fecha_hasta = date.fromisoformat(fecha_hasta)
+        except ValueError as e:
             return Response({"detail": f"Error en el filtrado: {str(e)}"},
                             status=status.HTTP_400_BAD_REQUEST)
+
+        qs = self.get_queryset().filter(fecha__gte=fecha_desde, fecha__lte=fecha_hasta)
+        return self._listado_paginado(qs)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsStaffClaim])
+    def agenda(self, request):
+        """
+        Agenda de un empleado con sus huecos libres (solo empleados):
+        - empleado=<id> (por defecto el usuario autenticado)
+        - fecha=YYYY-MM-DD (por defecto hoy)
+        - vista=dia (por defecto) o semana (de lunes a domingo de esa fecha)
+        Respuesta compacta: ids y nombres ya resueltos, sin serializers anidados.
+        """
+        try:
+            empleado_id = int(request.query_params.get('empleado') or request.user.pk)
+            fecha = date.fromisoformat(request.query_params.get('fecha') or timezone.localdate().isoformat())
+        except ValueError:
+            return Response({"detail": "Parámetros inválidos: empleado=<id>, fecha=YYYY-MM-DD."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        vista = request.query_params.get('vista', 'dia')
+        if vista == 'dia':
+            desde = hasta = fecha
+        elif vista == 'semana':
+            desde = fecha - timedelta(days=fecha.weekday())
+            hasta = desde + timedelta(days=6)
+        else:
+            return Response({"detail": "vista debe ser 'dia' o 'semana'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "empleado": empleado_id,
+            "desde": desde,
+            "hasta": hasta,
+            "dias": agenda_empleado(empleado_id, desde, hasta),
+        })
+
+    @action(detail=False, methods=['post'], permission_classes=[IsStaffClaim])
+    def asignar(self, request):
+        """
+        Reparte entre los empleados las citas pendientes y aprobadas de un rango (solo empleados):
+        {"desde": "YYYY-MM-DD", "hasta": "YYYY-MM-DD", "reasignar": false}
+        Por defecto planifica el día de mañana y respeta las citas que ya tienen empleado.
+        """
+        parametros = AsignacionSerializer(data=request.data)
+        parametros.is_valid(raise_exception=True)
+        resultado = asignar_empleados(**parametros.validated_data)
+        return Response(resultado)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def exportar(self, request):
+        """
+        Exporta las citas visibles para el usuario en streaming:
+        - formato=csv (por defecto) o formato=ndjson
+        - acepta los mismos filtros, búsqueda y orden del listado
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS:
+            return Response({"detail": f"Formato no soportado. Opciones: {', '.join(FORMATOS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        qs = self.filter_queryset(self.get_queryset())
+        return respuesta_exportacion(qs, formato)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsStaffClaim])
+    def reporte(self, request):
+        """
+        Reporte de ocupación e ingresos (solo empleados):
+        - desde=YYYY-MM-DD (por defecto el primer día del mes) y hasta=YYYY-MM-DD (por defecto hoy)
+        - agrupar=lista separada por comas con un periodo (dia, semana o mes)
+          y/o dimensiones (servicio, empleado, estado). Ej: agrupar=mes,servicio
+        """
+        hoy = timezone.localdate()
+        try:
+            desde = date.fromisoformat(request.query_params.get('desde') or hoy.replace(day=1).isoformat())
+            hasta = date.fromisoformat(request.query_params.get('hasta') or hoy.isoformat())
+        except ValueError:
+            return Response({"detail": "Las fechas deben tener formato YYYY-MM-DD."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if hasta < desde:
+            return Response({"detail": "'hasta' no puede ser anterior a 'desde'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if (hasta - desde).days >= settings.CITAS_REPORTE_MAX_DIAS:
+            return Response({"detail": f"El rango máximo es de {settings.CITAS_REPORTE_MAX_DIAS} días."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        agrupar = [valor.strip() for valor in request.query_params.get('agrupar', '').split(',') if valor.strip()]
+        periodos = [valor for valor in agrupar if valor in PERIODOS]
+        dimensiones = [valor for valor in agrupar if valor in DIMENSIONES]
+        invalidos = [valor for valor in agrupar if valor not in PERIODOS and valor not in DIMENSIONES]
+        if invalidos or len(periodos) > 1 or len(set(dimensiones)) != len(dimensiones):
+            return Response(
+                {"detail": f"Agrupación inválida. Un periodo ({', '.join(PERIODOS)}) "
+                           f"y/o dimensiones ({', '.join(DIMENSIONES)})."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        datos = generar_reporte(desde, hasta, periodos[0] if periodos else None, dimensiones, hoy=hoy)
+        return Response({"desde": desde, "hasta": hasta, **datos})
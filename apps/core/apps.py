@@ -7,3 +7,10 @@ class CoreConfig(AppConfig):
 
     # Nombre de la aplicación registrada dentro del proyecto
     name = 'apps.core'
+
+    def ready(self):
+        """Instala el contador de consultas SQL en cada conexión (ver consultas.py)."""
+        from django.db.backends.signals import connection_created
+        from .consultas import instalar_contador
+
+        connection_created.connect(instalar_contador, dispatch_uid='core_contador_consultas')
@@ -0,0 +1,97 @@
+"""
+Vistas asíncronas para el modo ASGI (uvicorn, ver config/urls_asgi.py).
+
+DRF no tiene vistas asíncronas. vista_asincrona() toma una vista de ViewSet
+creada por el router (as_view) y atiende su GET con el método asíncrono
+a<acción> del ViewSet (p. ej. alist, amis_citas) dentro del event loop. El
+resto del ciclo es el de DRF: initial() (negociación, versión, autenticación,
+permisos y throttling, que pueden consultar la base de datos o la caché) corre
+en un hilo con sync_to_async, y las excepciones y la respuesta pasan por
+handle_exception() y finalize_response(). Los demás métodos HTTP siguen en la
+vista síncrona, en un hilo, y los GET que no piden JSON (la API navegable)
+usan la acción síncrona, también en un hilo.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.renderers import JSONRenderer
+
+# Parámetros del listado que no pasan por los filtros de la vista
+PARAMETROS_SIN_FILTRO = {'cursor', 'page', 'page_size', 'format', 'ordering'}
+
+
+async def filtrar(vista, queryset):
+    """
+    filter_queryset() de la vista. Sin parámetros de filtro o búsqueda los
+    backends solo arman el queryset; con ellos algunos validan contra la base
+    de datos (p. ej. ?cliente= o el índice FTS), así que corren en un hilo.
+    """
+    if set(vista.request.query_params) - PARAMETROS_SIN_FILTRO:
+        return await sync_to_async(vista.filter_queryset)(queryset)
+    return vista.filter_queryset(queryset)
+
+
+def tiene_version_asincrona(sincrona):
+    """True si la vista es de un ViewSet cuyo GET tiene método a<acción>."""
+    acciones = getattr(sincrona, 'actions', None) or {}
+    return 'get' in acciones and hasattr(getattr(sincrona, 'cls', None), f"a{acciones['get']}")
+
+
+class DespachoAsincrono:
+    """dispatch() de APIView con el handler a<acción> esperado en el event loop."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args, self.kwargs = args, kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if isinstance(request.accepted_renderer, JSONRenderer):
+                response = await getattr(self, f"a{self.action}")(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(getattr(self, self.action))(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def vista_asincrona(sincrona):
+    """Versión asíncrona de una vista de ViewSet (ver el docstring del módulo)."""
+    viewset, acciones, initkwargs = sincrona.cls, sincrona.actions, sincrona.initkwargs
+    delegar = sync_to_async(sincrona)
+    # as_view() de DRF sobre una subclase con dispatch() asíncrono: devuelve la corrutina
+    despachar = type(viewset.__name__, (DespachoAsincrono, viewset), {}).as_view(acciones, **initkwargs)
+
+    async def vista(request, *args, **kwargs):
+        if request.method != 'GET':
+            return await delegar(request, *args, **kwargs)
+
+        response = await despachar(request, *args, **kwargs)
+        if not hasattr(response, 'render'):
+            return response
+        # Se renderiza aquí: a una respuesta con render() Django la renderiza en un hilo.
+        # La API navegable sí consulta la base de datos al renderizar.
+        if isinstance(response.accepted_renderer, JSONRenderer):
+            response.render()
+        else:
+            await sync_to_async(response.render)()
+        return HttpResponse(response.content, status=response.status_code, headers=response.headers)
+
+    # MetricasMiddleware etiqueta la petición con la vista y la acción del ViewSet
+    vista.cls, vista.actions, vista.initkwargs = viewset, acciones, initkwargs
+    return csrf_exempt(vista)
+
+
+def rutas_asincronas(patrones):
+    """Copia de `patrones` con las rutas de ViewSets que tienen versión asíncrona reemplazadas."""
+    rutas = []
+    for patron in patrones:
+        callback = getattr(patron, 'callback', None)
+        if callback is not None and tiene_version_asincrona(callback):
+            patron = type(patron)(patron.pattern, vista_asincrona(callback), patron.default_args, patron.name)
+        rutas.append(patron)
+    return rutas
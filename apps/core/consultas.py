@@ -0,0 +1,141 @@
+"""
+Conteo e inspección de las consultas SQL de una petición.
+
+Cada conexión lleva un execute_wrapper fijo (se instala al conectarse, ver
+CoreConfig.ready) que no hace nada salvo que haya registros activos en el
+contexto. registrar_consultas() activa un registro que cuenta las consultas y
+su duración. Como el registro vive en una ContextVar, también cuenta las
+consultas del ORM asíncrono, que sync_to_async ejecuta en otro hilo con una
+copia del contexto. Con huellas=True además agrupa las consultas por
+huella: el SQL con los valores reemplazados por `?`, de modo que la misma
+consulta con otro id da la misma huella. Una huella que se repite varias veces
+en una petición suele ser un N+1 (una consulta perezosa por fila).
+
+InspectorConsultasMiddleware (solo con QUERY_INSPECTOR, por defecto igual a
+DEBUG) agrega a cada respuesta los encabezados X-Query-Count,
+X-Query-Time-Ms y X-Query-NPlusOne, y escribe una línea de log por petición
+(warning si hay repeticiones o se supera QUERY_PRESUPUESTO).
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_NUMEROS = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_PARAMETROS = re.compile(r"%s|\?")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def huella(sql):
+    """SQL normalizado: literales y parámetros como `?`, listas IN como `(...)`."""
+    sql = _CADENAS.sub('?', sql)
+    sql = _NUMEROS.sub('?', sql)
+    sql = _PARAMETROS.sub('?', sql)
+    sql = _LISTAS.sub('(...)', sql)
+    return _ESPACIOS.sub(' ', sql).strip()
+
+
+class RegistroConsultas:
+    """Cantidad, duración y (opcional) huellas de las consultas de un bloque."""
+
+    def __init__(self, huellas=False):
+        self.consultas = 0
+        self.segundos = 0.0
+        self.huellas = Counter() if huellas else None
+
+    def anotar(self, sql, segundos):
+        self.segundos += segundos
+        self.consultas += 1
+        if self.huellas is not None:
+            self.huellas[huella(sql)] += 1
+
+    def repetidas(self, minimo=None):
+        """Huellas que se ejecutaron al menos `minimo` veces (QUERY_NPLUSONE_MIN), de más a menos."""
+        if self.huellas is None:
+            return []
+        minimo = minimo or getattr(settings, 'QUERY_NPLUSONE_MIN', 3)
+        return [(sql, veces) for sql, veces in self.huellas.most_common() if veces >= minimo]
+
+
+_registros = ContextVar('registros_consultas', default=())
+
+
+def _contar(execute, sql, params, many, context):
+    registros = _registros.get()
+    if not registros:
+        return execute(sql, params, many, context)
+    t0 = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        segundos = time.perf_counter() - t0
+        for registro in registros:
+            registro.anotar(sql, segundos)
+
+
+def instalar_contador(sender, connection, **kwargs):
+    """Receptor de connection_created: agrega el execute_wrapper a la conexión."""
+    if _contar not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_contar)
+
+
+@contextmanager
+def registrar_consultas(huellas=False):
+    """Cuenta las consultas de todas las conexiones dentro del bloque (en este contexto)."""
+    registro = RegistroConsultas(huellas)
+    token = _registros.set(_registros.get() + (registro,))
+    try:
+        yield registro
+    finally:
+        _registros.reset(token)
+
+
+class InspectorConsultasMiddleware:
+    """Informa en encabezados y en el log las consultas SQL de cada petición."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        activo = getattr(settings, 'QUERY_INSPECTOR', None)
+        if not (settings.DEBUG if activo is None else activo):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with registrar_consultas(huellas=True) as registro:
+            response = self.get_response(request)
+        return self._informar(request, response, registro)
+
+    async def __acall__(self, request):
+        with registrar_consultas(huellas=True) as registro:
+            response = await self.get_response(request)
+        return self._informar(request, response, registro)
+
+    def _informar(self, request, response, registro):
+        repetidas = registro.repetidas()
+        response['X-Query-Count'] = str(registro.consultas)
+        response['X-Query-Time-Ms'] = f"{registro.segundos * 1000:.1f}"
+        response['X-Query-NPlusOne'] = str(len(repetidas))
+
+        linea = f"{request.method} {request.path}: {registro.consultas} consultas en {registro.segundos * 1000:.1f} ms"
+        presupuesto = getattr(settings, 'QUERY_PRESUPUESTO', 50)
+        if repetidas or registro.consultas > presupuesto:
+            detalle = '; '.join(f"{veces}x {sql[:200]}" for sql, veces in repetidas[:3])
+            logger.warning(f"{linea} (presupuesto {presupuesto}); posibles N+1: {detalle or 'ninguno'}")
+        else:
+            logger.debug(linea)
+        return response
@@ -0,0 +1,151 @@
+"""
+Documentación de la API: esquema OpenAPI, Swagger UI y ReDoc.
+
+Para armar el esquema drf_yasg recorre todos los ViewSets y serializers. Eso
+se hace una sola vez, en el build (python manage.py generar_openapi, desde
+build.sh), y el archivo OPENAPI_ESQUEMA se sirve tal cual con ETag y un
+max-age largo. Swagger UI y ReDoc son páginas estáticas que descargan ese
+archivo. Si no existe (desarrollo, tests) el esquema se genera en la primera
+petición y queda en memoria del proceso.
+
+drf_yasg se importa dentro de las funciones: config/urls.py solo agrega estas
+rutas con API_DOCS, y los workers no lo cargan hasta que alguien abre la
+documentación.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = {
+    '.json': 'application/json',
+    '.yaml': 'application/yaml',
+}
+
+# Formato -> (contenido, etag); se llena en la primera petición de cada formato
+_esquemas = {}
+_lock = threading.Lock()
+
+
+def info():
+    """Datos generales de la API que encabezan el esquema."""
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="API de Reservas de Citas",
+        default_version='v1',
+        description="API REST para gestión de citas y servicios",
+        terms_of_service="https://www.google.com/policies/terms/",
+        contact=openapi.Contact(email="contact@reservas.local"),
+        license=openapi.License(name="MIT License"),
+    )
+
+
+def generar():
+    """
+    Esquema OpenAPI en JSON, tal como lo ve un usuario anónimo (la
+    documentación es pública). Sin host: Swagger UI usa el del sitio que lo sirve.
+    """
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.views import APIView
+
+    request = APIView().initialize_request(APIRequestFactory().get('/openapi.json'))
+    esquema = OpenAPISchemaGenerator(info(), url='').get_schema(request=request, public=True)
+    return OpenAPICodecJson(validators=[]).encode(esquema)
+
+
+def ruta_esquema():
+    return Path(getattr(settings, 'OPENAPI_ESQUEMA', settings.BASE_DIR / 'openapi.json'))
+
+
+def _leer_json():
+    ruta = ruta_esquema()
+    try:
+        return ruta.read_bytes()
+    except FileNotFoundError:
+        logger.warning("No existe %s; se genera el esquema OpenAPI en este proceso.", ruta)
+        return generar()
+
+
+def _convertir(contenido, formato):
+    if formato == '.json':
+        return contenido
+    from drf_yasg.codecs import yaml_sane_dump
+
+    return yaml_sane_dump(json.loads(contenido, object_pairs_hook=OrderedDict), binary=True)
+
+
+def esquema_en_memoria(formato='.json'):
+    """(contenido, etag) del esquema en `formato`; se lee o genera una vez por proceso."""
+    if formato not in _esquemas:
+        with _lock:
+            if '.json' not in _esquemas:
+                contenido = _leer_json()
+                _esquemas['.json'] = (contenido, _etag(contenido))
+            if formato not in _esquemas:
+                contenido = _convertir(_esquemas['.json'][0], formato)
+                _esquemas[formato] = (contenido, _etag(contenido))
+    return _esquemas[formato]
+
+
+def limpiar():
+    """Olvida los esquemas en memoria (tests, o tras regenerar el archivo)."""
+    _esquemas.clear()
+
+
+def _etag(contenido):
+    return '"%s"' % hashlib.md5(contenido).hexdigest()
+
+
+def _cachear(response, etag):
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'OPENAPI_MAX_AGE', 86400))
+    return response
+
+
+@require_safe
+def esquema(request, format='.json'):
+    """El esquema precalculado, con ETag y Cache-Control de larga duración."""
+    if format not in FORMATOS:
+        raise Http404
+    contenido, etag = esquema_en_memoria(format)
+    no_modificada = get_conditional_response(request, etag=etag)
+    if no_modificada is not None:
+        return _cachear(no_modificada, etag)
+    return _cachear(HttpResponse(contenido, content_type=FORMATOS[format]), etag)
+
+
+def _pagina(request, nombre):
+    """
+    Página de Swagger UI o ReDoc. Los renderers de drf_yasg reciben un esquema
+    vacío (solo usan el título); la página descarga el precalculado de
+    SPEC_URL (ver SWAGGER_SETTINGS y REDOC_SETTINGS).
+    """
+    from drf_yasg import openapi
+    from drf_yasg.renderers import ReDocRenderer, SwaggerUIRenderer
+
+    renderer = {'swagger': SwaggerUIRenderer, 'redoc': ReDocRenderer}[nombre]()
+    vacio = openapi.Swagger(info=info(), _prefix='/', paths=openapi.Paths({}))
+    contenido = renderer.render(vacio, renderer.media_type, {'request': request})
+    return HttpResponse(contenido, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+
+
+@require_safe
+def swagger_ui(request):
+    return _pagina(request, 'swagger')
+
+
+@require_safe
+def redoc(request):
+    return _pagina(request, 'redoc')
@@ -0,0 +1,35 @@
+"""
+Archivos estáticos con WhiteNoise en los dos modos del servidor.
+
+WhiteNoiseMiddleware solo es síncrono: en una cadena asíncrona (ASGI) Django
+lo envuelve con sync_to_async y cada petición, sea o no de un estático, pasa
+por un hilo antes de llegar a la vista. WhiteNoiseAsyncMiddleware hace la
+misma búsqueda (un dict en memoria cuando no hay autorefresh) en el event loop
+y solo usa un hilo para abrir el archivo que sirve.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class WhiteNoiseAsyncMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,150 @@
+"""
+Comprobación del estado de la base de datos para las sondas de salud.
+
+El balanceador consulta las sondas muy seguido; si cada una abriera un cursor,
+con la base de datos bajo presión las propias sondas sumarían carga. Por eso:
+- el resultado se guarda durante HEALTH_DB_CACHE segundos y en ese tiempo las
+  sondas responden sin consultar la base de datos;
+- la comprobación corre en un hilo aparte y la sonda espera como máximo
+  HEALTH_DB_TIMEOUT segundos: si la base de datos no responde a tiempo, la
+  sonda informa el timeout en lugar de quedarse colgada;
+- hay como máximo una comprobación en curso por proceso.
+
+Cada comprobación mide la latencia del ping (se guardan las últimas
+HEALTH_DB_MUESTRAS para los percentiles) y cuenta las migraciones pendientes.
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por rango más cercano de una lista ordenada."""
+    if not valores:
+        return None
+    return valores[max(math.ceil(p / 100 * len(valores)), 1) - 1]
+
+
+class EstadoBaseDatos:
+    """Último estado conocido de la base de datos, renovado como máximo una vez por ventana."""
+
+    def __init__(self, alias=DEFAULT_DB_ALIAS):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._terminado = threading.Event()
+        self._terminado.set()
+        self._latencias = deque(maxlen=getattr(settings, 'HEALTH_DB_MUESTRAS', 120))
+        self._resultado = None
+        self._vence = 0.0
+        # Una vez aplicadas todas, las migraciones no vuelven a quedar pendientes sin reiniciar el proceso
+        self._migraciones_al_dia = False
+
+    def _pendientes(self, conexion):
+        if self._migraciones_al_dia:
+            return 0
+        ejecutor = MigrationExecutor(conexion)
+        pendientes = len(ejecutor.migration_plan(ejecutor.loader.graph.leaf_nodes()))
+        self._migraciones_al_dia = pendientes == 0
+        return pendientes
+
+    def _medir(self):
+        conexion = connections[self.alias]
+        resultado = {'conectada': False, 'latencia_ms': None, 'migraciones_pendientes': None, 'error': None}
+        try:
+            t0 = time.perf_counter()
+            with conexion.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            resultado['latencia_ms'] = round((time.perf_counter() - t0) * 1000, 2)
+            resultado['conectada'] = True
+            resultado['migraciones_pendientes'] = self._pendientes(conexion)
+        except Exception as e:
+            logger.error(f"Database health check failed: {e}")
+            resultado['error'] = str(e)
+        finally:
+            conexion.close()
+        resultado['comprobado'] = timezone.now().isoformat()
+        return resultado
+
+    def _comprobar(self):
+        """Corre en un hilo aparte, con su propia conexión."""
+        try:
+            resultado = self._medir()
+            with self._lock:
+                if resultado['latencia_ms'] is not None:
+                    self._latencias.append(resultado['latencia_ms'])
+                self._resultado = resultado
+                self._vence = time.monotonic() + getattr(settings, 'HEALTH_DB_CACHE', 5)
+        finally:
+            self._terminado.set()
+
+    def _latencia(self):
+        valores = sorted(self._latencias)
+        return {
+            'ultima_ms': self._resultado['latencia_ms'] if self._resultado else None,
+            'p50_ms': percentil(valores, 50),
+            'p95_ms': percentil(valores, 95),
+            'p99_ms': percentil(valores, 99),
+            'muestras': len(valores),
+        }
+
+    def estado(self):
+        """
+        Estado de la base de datos: el guardado si sigue vigente; si no, lanza
+        (o espera) una comprobación, como máximo HEALTH_DB_TIMEOUT segundos.
+        """
+        timeout = False
+        if not self._lanzar():
+            timeout = not self._terminado.wait(getattr(settings, 'HEALTH_DB_TIMEOUT', 2))
+        return self._resumen(timeout)
+
+    async def aestado(self):
+        """estado() sin bloquear el event loop: la espera de la comprobación corre en un hilo."""
+        timeout = False
+        if not self._lanzar():
+            esperar = sync_to_async(self._terminado.wait, thread_sensitive=False)
+            timeout = not await esperar(getattr(settings, 'HEALTH_DB_TIMEOUT', 2))
+        return self._resumen(timeout)
+
+    def _lanzar(self):
+        """True si el estado guardado sigue vigente; si no, lanza una comprobación (si no hay otra en curso)."""
+        with self._lock:
+            vigente = self._resultado is not None and time.monotonic() < self._vence
+            if not vigente and self._terminado.is_set():
+                self._terminado.clear()
+                threading.Thread(target=self._comprobar, name='health-db', daemon=True).start()
+        return vigente
+
+    def _resumen(self, timeout):
+        with self._lock:
+            resultado = dict(self._resultado or {'conectada': False, 'migraciones_pendientes': None})
+            resultado['latencia'] = self._latencia()
+        resultado.pop('latencia_ms', None)
+        if timeout:
+            # La base de datos no respondió a tiempo: no se puede asegurar que esté disponible
+            resultado['conectada'] = False
+            resultado['error'] = "La comprobación superó el tiempo máximo de espera."
+        resultado['timeout'] = timeout
+        resultado['lista'] = resultado['conectada'] and resultado['migraciones_pendientes'] == 0
+        return resultado
+
+    def reiniciar(self):
+        """Olvida el estado guardado (la próxima sonda vuelve a comprobar)."""
+        with self._lock:
+            self._resultado = None
+            self._vence = 0.0
+            self._latencias.clear()
+            self._migraciones_al_dia = False
+
+
+estado_base_datos = EstadoBaseDatos()
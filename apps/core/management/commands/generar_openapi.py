@@ -0,0 +1,42 @@
+"""
+Genera el esquema OpenAPI de la API en un archivo (lo sirve /openapi.json/).
+
+Uso:
+    python manage.py generar_openapi
+    python manage.py generar_openapi --salida /tmp/openapi.json
+
+Se corre en build.sh, después de instalar dependencias: así ningún worker
+introspecciona los ViewSets para atender la documentación.
+"""
+import os
+import tempfile
+import time as reloj
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from apps.core import documentacion
+
+
+class Command(BaseCommand):
+    help = "Genera el esquema OpenAPI en OPENAPI_ESQUEMA (o en --salida)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salida', help="Ruta del archivo (por defecto OPENAPI_ESQUEMA)")
+
+    def handle(self, *args, **options):
+        salida = Path(options['salida']) if options['salida'] else documentacion.ruta_esquema()
+        t0 = reloj.perf_counter()
+        contenido = documentacion.generar()
+        transcurrido = reloj.perf_counter() - t0
+
+        # Escritura atómica: un worker que lo lea a la vez nunca ve un archivo a medias
+        salida.parent.mkdir(parents=True, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=salida.parent, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(contenido)
+        os.replace(temporal, salida)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Esquema OpenAPI en {salida} ({len(contenido) / 1024:.1f} KiB, generado en {transcurrido:.2f} s)"
+        ))
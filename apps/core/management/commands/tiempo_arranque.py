@@ -0,0 +1,168 @@
+"""
+Mide cuánto tarda en arrancar un proceso de la aplicación (cold start).
+
+Uso:
+    python manage.py tiempo_arranque
+    python manage.py tiempo_arranque --repeticiones 5 --top 20
+
+Cada repetición es un intérprete nuevo (python -X importtime) que carga los
+settings, corre django.setup(), arma la aplicación WSGI (middleware) y carga
+el URLconf, como un worker de gunicorn antes de su primera petición. Informa
+la mediana de cada fase, el costo de django.setup() por app (importar la app,
+sus modelos y ready()) y el tiempo de importación agrupado por app o paquete.
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time as reloj
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Se ejecuta en el proceso hijo; la última línea de stdout es el resultado en JSON
+SCRIPT = """
+import json, sys, time
+medir = time.perf_counter
+t0 = medir()
+import django
+from django.apps.config import AppConfig
+from django.conf import settings
+settings.INSTALLED_APPS
+fases = {'settings': medir() - t0}
+apps = {}
+
+def cronometrar(nombre, fase, funcion):
+    def envoltura(*args, **kwargs):
+        t = medir()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            apps.setdefault(nombre, {})[fase] = medir() - t
+    return envoltura
+
+crear = AppConfig.create.__func__
+
+def create(cls, entry):
+    t = medir()
+    config = crear(cls, entry)
+    apps.setdefault(config.name, {})['importar'] = medir() - t
+    config.import_models = cronometrar(config.name, 'modelos', config.import_models)
+    config.ready = cronometrar(config.name, 'ready', config.ready)
+    return config
+
+AppConfig.create = classmethod(create)
+t = medir()
+django.setup()
+fases['django.setup()'] = medir() - t
+
+t = medir()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+fases['aplicacion WSGI'] = medir() - t
+
+t = medir()
+from django.urls import get_resolver
+get_resolver().url_patterns
+fases['URLconf'] = medir() - t
+fases['total'] = medir() - t0
+
+yasg = any(modulo.startswith('drf_yasg.') for modulo in sys.modules)
+print(json.dumps({'fases': fases, 'apps': apps, 'drf_yasg': yasg}))
+"""
+
+# import time:       self [us] |       cumulative | imported package
+LINEA_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(\S.*)$')
+
+
+class Command(BaseCommand):
+    help = "Mide el arranque en frío: fases, django.setup() por app e importaciones por paquete."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=3)
+        parser.add_argument('--top', type=int, default=15, help="Paquetes a mostrar en las importaciones")
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1:
+            raise CommandError("--repeticiones debe ser al menos 1.")
+
+        corridas = [self._corrida() for _ in range(options['repeticiones'])]
+        self.stdout.write(f"Mediana de {len(corridas)} procesos nuevos ({settings.SETTINGS_MODULE})\n")
+
+        self.stdout.write("Fases")
+        self._tabla({fase: _mediana(corridas, 'fases', fase) for fase in corridas[0]['fases']}, 'proceso')
+        self.stdout.write(f"{'intérprete + total':<34} {_mediana(corridas, 'pared') * 1000:8.1f} ms")
+
+        self.stdout.write("\ndjango.setup() por app (importar + modelos + ready)")
+        por_app = {
+            app: sum(_mediana(corridas, 'apps', app, fase) for fase in ('importar', 'modelos', 'ready'))
+            for app in corridas[0]['apps']
+        }
+        self._tabla(por_app, None)
+
+        self.stdout.write(f"\nImportaciones por app o paquete (tiempo propio, top {options['top']})")
+        grupos = {grupo: _mediana(corridas, 'importaciones', grupo) for grupo in corridas[0]['importaciones']}
+        self._tabla(dict(sorted(grupos.items(), key=lambda par: -par[1])[:options['top']]), None)
+
+        cargado = sum(corrida['drf_yasg'] for corrida in corridas) == len(corridas)
+        self.stdout.write(
+            f"\nLas vistas y generadores de drf_yasg {'se importan' if cargado else 'no se importan'} "
+            f"al arrancar (API_DOCS={settings.API_DOCS})."
+        )
+
+    def _corrida(self):
+        entorno = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        t0 = reloj.perf_counter()
+        proceso = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT],
+            cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True,
+        )
+        pared = reloj.perf_counter() - t0
+        if proceso.returncode != 0:
+            raise CommandError(f"El proceso de prueba falló:\n{proceso.stderr[-2000:]}")
+
+        resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+        resultado['pared'] = pared
+        resultado['importaciones'] = agrupar_importaciones(proceso.stderr, resultado['apps'])
+        return resultado
+
+    def _tabla(self, tiempos, total):
+        for nombre, segundos in tiempos.items():
+            if nombre != 'total':
+                self.stdout.write(f"{nombre:<34} {segundos * 1000:8.1f} ms")
+        if total and 'total' in tiempos:
+            self.stdout.write(self.style.SUCCESS(f"{'total (' + total + ')':<34} {tiempos['total'] * 1000:8.1f} ms"))
+
+
+def agrupar_importaciones(salida, apps):
+    """
+    Suma el tiempo propio (sin sus dependencias) de cada módulo de la salida de
+    -X importtime bajo la app instalada que lo contiene, o bajo su paquete de
+    primer nivel si no pertenece a ninguna. Devuelve {grupo: segundos}.
+    """
+    nombres = sorted(apps, key=len, reverse=True)
+    grupos = defaultdict(float)
+    for linea in salida.splitlines():
+        coincidencia = LINEA_IMPORTTIME.match(linea)
+        if not coincidencia:
+            continue
+        modulo = coincidencia.group(3).strip()
+        grupo = next(
+            (app for app in nombres if modulo == app or modulo.startswith(app + '.')),
+            modulo.split('.')[0],
+        )
+        grupos[grupo] += int(coincidencia.group(1)) / 1e6
+    return dict(grupos)
+
+
+def _mediana(corridas, *claves):
+    valores = []
+    for corrida in corridas:
+        valor = corrida
+        for clave in claves:
+            valor = valor.get(clave, 0.0) if isinstance(valor, dict) else 0.0
+        valores.append(valor)
+    return statistics.median(valores)
@@ -0,0 +1,274 @@
+"""
+Métricas de las peticiones en formato de texto de Prometheus.
+
+MetricasMiddleware registra por cada petición la vista y la acción (por
+ejemplo CitaViewSet / agenda), el código de estado, la duración, la cantidad
+de consultas SQL y el tiempo en SQL (ver apps.core.consultas). También
+lleva las peticiones en curso de cada worker. Funciona igual con gunicorn
+(WSGI) y con los workers de uvicorn (ASGI).
+
+Cada proceso acumula en memoria y, como máximo cada METRICS_VOLCADO segundos,
+escribe su estado en un archivo propio (metricas-<pid>.json) dentro de
+METRICS_DIR. El endpoint /metrics suma los archivos de todos los workers de
+gunicorn, así la respuesta no depende de qué worker atiende el scrape. Los
+archivos de procesos que ya no existen se descartan (para Prometheus es un
+reinicio del contador). Sin METRICS_DIR cada proceso informa solo lo suyo.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .consultas import registrar_consultas
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+CONTADORES = {
+    'http_requests_total': "Peticiones atendidas por vista, acción, método y código de estado.",
+}
+
+HISTOGRAMAS = {
+    'http_request_duration_seconds': ("Duración de la petición por vista y acción.", BUCKETS_SEGUNDOS),
+    'http_request_db_queries': ("Consultas SQL por petición, por vista y acción.", BUCKETS_CONSULTAS),
+    'http_request_db_duration_seconds': ("Tiempo en SQL por petición, por vista y acción.", BUCKETS_SEGUNDOS),
+}
+
+GAUGES = {
+    'http_requests_in_flight': "Peticiones en curso en cada worker.",
+}
+
+PREFIJO_ARCHIVO = 'metricas-'
+
+
+class RegistroMetricas:
+    """Métricas de este proceso y su volcado al directorio compartido."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = {}   # (nombre, etiquetas) -> valor
+        self._histogramas = {}  # (nombre, etiquetas) -> [cuentas por bucket..., +Inf, suma]
+        self._en_curso = 0
+        self._volcado = 0.0
+
+    def inc(self, nombre, etiquetas, valor=1):
+        with self._lock:
+            clave = (nombre, etiquetas)
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def observar(self, nombre, etiquetas, valor):
+        limites = HISTOGRAMAS[nombre][1]
+        with self._lock:
+            clave = (nombre, etiquetas)
+            serie = self._histogramas.get(clave)
+            if serie is None:
+                serie = self._histogramas[clave] = [0] * (len(limites) + 1) + [0.0]
+            for indice, limite in enumerate(limites):
+                if valor <= limite:
+                    break
+            else:
+                indice = len(limites)
+            serie[indice] += 1
+            serie[-1] += valor
+
+    def entrar(self):
+        with self._lock:
+            self._en_curso += 1
+
+    def salir(self):
+        with self._lock:
+            self._en_curso -= 1
+
+    def _estado(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'contadores': [[n, list(e), v] for (n, e), v in self._contadores.items()],
+                'histogramas': [[n, list(e), list(s)] for (n, e), s in self._histogramas.items()],
+                'en_curso': self._en_curso,
+            }
+
+    def volcar(self, forzar=False):
+        """Escribe el estado del proceso en METRICS_DIR (como máximo cada METRICS_VOLCADO segundos)."""
+        directorio = getattr(settings, 'METRICS_DIR', '')
+        ahora = time.monotonic()
+        if not directorio or (not forzar and ahora - self._volcado < getattr(settings, 'METRICS_VOLCADO', 1)):
+            return
+        self._volcado = ahora
+        destino = os.path.join(directorio, f"{PREFIJO_ARCHIVO}{os.getpid()}.json")
+        try:
+            os.makedirs(directorio, exist_ok=True)
+            temporal = f"{destino}.tmp"
+            with open(temporal, 'w') as archivo:
+                json.dump(self._estado(), archivo)
+            os.replace(temporal, destino)
+        except OSError as e:
+            logger.warning(f"No se pudieron volcar las métricas en {directorio}: {e}")
+
+    def estados(self):
+        """Estados de todos los workers vivos (o solo el de este proceso sin METRICS_DIR)."""
+        directorio = getattr(settings, 'METRICS_DIR', '')
+        if not directorio:
+            return [self._estado()]
+        self.volcar(forzar=True)
+        estados = []
+        for nombre in os.listdir(directorio):
+            if not (nombre.startswith(PREFIJO_ARCHIVO) and nombre.endswith('.json')):
+                continue
+            ruta = os.path.join(directorio, nombre)
+            try:
+                with open(ruta) as archivo:
+                    estado = json.load(archivo)
+            except (OSError, ValueError):
+                continue
+            if not _proceso_vivo(estado['pid']):
+                _borrar(ruta)
+                continue
+            estados.append(estado)
+        return estados
+
+    def limpiar(self):
+        with self._lock:
+            self._contadores.clear()
+            self._histogramas.clear()
+            self._en_curso = 0
+            self._volcado = 0.0
+
+
+def _proceso_vivo(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+
+registro_metricas = RegistroMetricas()
+
+
+def _etiquetas(pares, extra=()):
+    pares = list(pares) + list(extra)
+    if not pares:
+        return ''
+    texto = ','.join(
+        '{}="{}"'.format(clave, str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for clave, valor in pares
+    )
+    return '{' + texto + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exposicion(estados):
+    """Texto de exposición de Prometheus con los estados de los workers sumados."""
+    contadores = {}
+    histogramas = {}
+    for estado in estados:
+        for nombre, etiquetas, valor in estado['contadores']:
+            clave = (nombre, tuple(map(tuple, etiquetas)))
+            contadores[clave] = contadores.get(clave, 0) + valor
+        for nombre, etiquetas, serie in estado['histogramas']:
+            clave = (nombre, tuple(map(tuple, etiquetas)))
+            acumulada = histogramas.get(clave)
+            histogramas[clave] = serie if acumulada is None else [a + b for a, b in zip(acumulada, serie)]
+
+    lineas = []
+    for nombre, ayuda in CONTADORES.items():
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} counter"]
+        for (serie, etiquetas), valor in sorted(contadores.items()):
+            if serie == nombre:
+                lineas.append(f"{nombre}{_etiquetas(etiquetas)} {_numero(valor)}")
+
+    for nombre, (ayuda, limites) in HISTOGRAMAS.items():
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} histogram"]
+        for (serie, etiquetas), valores in sorted(histogramas.items()):
+            if serie != nombre:
+                continue
+            acumulado = 0
+            for limite, cuenta in zip(list(limites) + ['+Inf'], valores[:-1]):
+                acumulado += cuenta
+                lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas, [('le', limite)])} {acumulado}")
+            lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {_numero(valores[-1])}")
+            lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {acumulado}")
+
+    for nombre, ayuda in GAUGES.items():
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} gauge"]
+        for estado in sorted(estados, key=lambda e: e['pid']):
+            lineas.append(f"{nombre}{_etiquetas([('worker', estado['pid'])])} {estado['en_curso']}")
+
+    return '\n'.join(lineas) + '\n'
+
+
+def _nombre_vista(funcion, metodo):
+    """(vista, acción) de la función resuelta; para los ViewSets, la acción del método."""
+    clase = getattr(funcion, 'cls', None)
+    if clase is not None:
+        acciones = getattr(funcion, 'actions', None) or {}
+        return clase.__name__, acciones.get(metodo.lower(), metodo.lower())
+    return getattr(funcion, '__name__', type(funcion).__name__), metodo.lower()
+
+
+class MetricasMiddleware:
+    """Registra duración, código de estado y consultas SQL de cada petición."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        registro_metricas.entrar()
+        t0 = time.perf_counter()
+        try:
+            with registrar_consultas() as contador:
+                response = self.get_response(request)
+        finally:
+            registro_metricas.salir()
+        return self._registrar(request, response, time.perf_counter() - t0, contador)
+
+    async def __acall__(self, request):
+        registro_metricas.entrar()
+        t0 = time.perf_counter()
+        try:
+            with registrar_consultas() as contador:
+                response = await self.get_response(request)
+        finally:
+            registro_metricas.salir()
+        return self._registrar(request, response, time.perf_counter() - t0, contador)
+
+    def _registrar(self, request, response, duracion, contador):
+        # La vista resuelta (sin process_view, que en modo ASGI costaría un salto a un hilo por petición)
+        coincidencia = getattr(request, 'resolver_match', None)
+        vista, accion = _nombre_vista(coincidencia.func, request.method) if coincidencia else ('sin_ruta', '')
+        etiquetas = (('vista', vista), ('accion', accion))
+        registro_metricas.inc(
+            'http_requests_total', etiquetas + (('metodo', request.method), ('estado', response.status_code)),
+        )
+        registro_metricas.observar('http_request_duration_seconds', etiquetas, duracion)
+        registro_metricas.observar('http_request_db_queries', etiquetas, contador.consultas)
+        registro_metricas.observar('http_request_db_duration_seconds', etiquetas, contador.segundos)
+        registro_metricas.volcar()
+        return response
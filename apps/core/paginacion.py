@@ -0,0 +1,47 @@
+"""
+Paginador para el admin de tablas grandes.
+
+El Paginator de Django hace un COUNT(*) completo del listado en cada página.
+PaginadorConteoEstimado evita recorrer la tabla:
+- listado sin filtros en PostgreSQL: usa la estimación del planificador
+  (pg_class.reltuples), que no cuesta nada;
+- en los demás casos cuenta como máximo ADMIN_CONTEO_MAX filas
+  (COUNT sobre una subconsulta con LIMIT). Si hay más, el listado informa ese
+  máximo y las páginas siguientes se alcanzan filtrando (por ejemplo con la
+  jerarquía de fechas).
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models.query import QuerySet
+from django.utils.functional import cached_property
+
+
+def conteo_estimado(modelo, using='default'):
+    """Filas estimadas de la tabla del modelo (solo PostgreSQL; None si no hay estimación)."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [modelo._meta.db_table])
+            fila = cursor.fetchone()
+    except DatabaseError:
+        return None
+    # -1: la tabla nunca fue analizada
+    return fila[0] if fila and fila[0] >= 0 else None
+
+
+class PaginadorConteoEstimado(Paginator):
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        queryset = self.object_list
+        maximo = getattr(settings, 'ADMIN_CONTEO_MAX', 10000)
+        if not queryset.query.where:
+            estimado = conteo_estimado(queryset.model, queryset.db)
+            if estimado is not None and estimado > maximo:
+                return estimado
+        return queryset.order_by()[:maximo].count()
@@ -0,0 +1,29 @@
+"""
+Ayudas para las pruebas.
+"""
+from contextlib import contextmanager
+
+from .consultas import registrar_consultas
+
+
+@contextmanager
+def presupuesto_consultas(maximo, minimo_repetidas=None):
+    """
+    Falla si el bloque ejecuta más de `maximo` consultas SQL o si repite una
+    misma huella de consulta `minimo_repetidas` veces o más (QUERY_NPLUSONE_MIN
+    por defecto), lo que suele indicar un N+1.
+
+        with presupuesto_consultas(3):
+            self.client.get('/api/citas/citas/')
+    """
+    with registrar_consultas(huellas=True) as registro:
+        yield registro
+
+    problemas = []
+    if registro.consultas > maximo:
+        problemas.append(f"{registro.consultas} consultas (presupuesto: {maximo})")
+    for sql, veces in registro.repetidas(minimo_repetidas):
+        problemas.append(f"posible N+1, {veces} veces: {sql}")
+    if problemas:
+        consultas = '\n'.join(f"  {veces}x {sql}" for sql, veces in registro.huellas.most_common())
+        raise AssertionError('\n'.join(problemas) + f"\nConsultas ejecutadas:\n{consultas}")
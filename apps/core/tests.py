@@ -1,8 +1,23 @@
 import pytest
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+from apps.core.health import estado_base_datos, percentil
+from apps.core.metricas import exposicion, registro_metricas
+from apps.core.consultas import huella
+from apps.core import documentacion
+from apps.core.management.commands.tiempo_arranque import agrupar_importaciones
+from apps.users.authentication import cache_usuarios
 
 # ---- TESTS PARA HEALTH CHECK ----
 @pytest.mark.unit
@@ -49,6 +64,213 @@ class HealthCheckTests(TestCase):
         assert 'database' in data
 
 
+# ---- TESTS PARA LAS SONDAS DE LIVENESS Y READINESS ----
+@pytest.mark.unit
+class HealthProbeTests(TestCase):
+    """Pruebas para las sondas de liveness y readiness con estado de BD cacheado."""
+
+    def setUp(self):
+        self.client = APIClient()
+        estado_base_datos.reiniciar()
+
+    def tearDown(self):
+        estado_base_datos.reiniciar()
+
+    def test_liveness_does_not_touch_database(self):
+        """La sonda de liveness responde sin consultar la base de datos."""
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/health/live/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['status'] == 'ok'
+
+    def test_readiness_reports_database_and_migrations(self):
+        """La readiness informa conexión, migraciones pendientes y latencia."""
+        response = self.client.get('/api/health/ready/')
+        assert response.status_code == status.HTTP_200_OK
+        db = response.json()['components']['database']
+        assert db['status'] == 'healthy'
+        assert db['migraciones_pendientes'] == 0
+        assert db['latencia']['muestras'] == 1
+        assert db['latencia']['p95_ms'] is not None
+
+    def test_readiness_caches_database_check(self):
+        """Dentro de la ventana de caché las sondas no vuelven a comprobar la BD."""
+        with self.settings(HEALTH_DB_CACHE=60):
+            primera = self.client.get('/api/health/ready/').json()
+            with mock.patch.object(estado_base_datos, '_medir') as medir:
+                segunda = self.client.get('/api/health/ready/').json()
+        medir.assert_not_called()
+        assert segunda['components']['database']['comprobado'] == primera['components']['database']['comprobado']
+
+    def test_readiness_never_blocks_longer_than_timeout(self):
+        """Si la BD no responde a tiempo la sonda devuelve 503 sin quedarse colgada."""
+        liberar = threading.Event()
+
+        def medir_lento():
+            liberar.wait(5)
+            return {'conectada': True, 'latencia_ms': 1.0, 'migraciones_pendientes': 0, 'error': None}
+
+        with self.settings(HEALTH_DB_TIMEOUT=0.05), \
+                mock.patch.object(estado_base_datos, '_medir', side_effect=medir_lento):
+            t0 = time.perf_counter()
+            response = self.client.get('/api/health/ready/')
+            duracion = time.perf_counter() - t0
+            liberar.set()
+            estado_base_datos._terminado.wait(1)
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.json()['components']['database']['timeout'] is True
+        assert duracion < 1
+
+    def test_percentile_nearest_rank(self):
+        """Percentil por rango más cercano."""
+        valores = list(range(1, 101))
+        assert percentil(valores, 50) == 50
+        assert percentil(valores, 95) == 95
+        assert percentil([7.0], 99) == 7.0
+        assert percentil([], 50) is None
+
+
+# ---- TESTS PARA LAS MÉTRICAS ----
+@pytest.mark.unit
+class MetricsTests(TestCase):
+    """Pruebas para el middleware de métricas y el endpoint /metrics."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ajustes = self.settings(METRICS_DIR=self.directorio.name, METRICS_TOKEN='', METRICS_IPS=[],
+                                     METRICS_PUBLICO=True)
+        self.ajustes.enable()
+        registro_metricas.limpiar()
+
+    def tearDown(self):
+        registro_metricas.limpiar()
+        self.ajustes.disable()
+        self.directorio.cleanup()
+
+    def test_records_view_action_status_and_queries(self):
+        """Cada petición queda registrada con su vista, acción, estado y consultas SQL."""
+        user = User.objects.create_user(username='medido', password='pass123')
+        self.client.force_authenticate(user=user)
+        self.client.get('/api/citas/citas/')
+
+        texto = self.client.get('/metrics').content.decode()
+        assert 'http_requests_total{vista="CitaViewSet",accion="list",metodo="GET",estado="200"} 1' in texto
+        assert 'http_request_duration_seconds_count{vista="CitaViewSet",accion="list"} 1' in texto
+        assert 'http_request_db_queries_count{vista="CitaViewSet",accion="list"} 1' in texto
+        assert 'http_request_db_queries_bucket{vista="CitaViewSet",accion="list",le="0"} 0' in texto
+        assert f'http_requests_in_flight{{worker="{os.getpid()}"}} 1' in texto
+
+    def test_aggregates_workers_and_drops_dead_ones(self):
+        """/metrics suma los archivos de los workers vivos y descarta los de procesos terminados."""
+        self.client.get('/api/health/live/')
+        muerto = subprocess.Popen([sys.executable, '-c', 'pass'])
+        muerto.wait()
+        for pid in (os.getppid(), muerto.pid):
+            with open(os.path.join(self.directorio.name, f'metricas-{pid}.json'), 'w') as archivo:
+                json.dump({
+                    'pid': pid,
+                    'contadores': [['http_requests_total',
+                                    [['vista', 'liveness'], ['accion', 'get'], ['metodo', 'GET'], ['estado', 200]], 4]],
+                    'histogramas': [],
+                    'en_curso': 2,
+                }, archivo)
+
+        texto = self.client.get('/metrics').content.decode()
+        assert 'http_requests_total{vista="liveness",accion="get",metodo="GET",estado="200"} 5' in texto
+        assert f'http_requests_in_flight{{worker="{os.getppid()}"}} 2' in texto
+        assert not os.path.exists(os.path.join(self.directorio.name, f'metricas-{muerto.pid}.json'))
+
+    def test_metrics_token(self):
+        """Con METRICS_TOKEN configurado, /metrics exige el token."""
+        with self.settings(METRICS_TOKEN='secreto', METRICS_PUBLICO=False):
+            assert self.client.get('/metrics').status_code == status.HTTP_401_UNAUTHORIZED
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto')
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+
+    def test_metrics_closed_by_default(self):
+        """Sin token, IPs ni METRICS_PUBLICO, /metrics responde 403."""
+        with self.settings(METRICS_PUBLICO=False):
+            assert self.client.get('/metrics').status_code == status.HTTP_403_FORBIDDEN
+
+    def test_metrics_ip_allowlist(self):
+        """Las IPs y redes de METRICS_IPS pueden leer /metrics sin token."""
+        with self.settings(METRICS_PUBLICO=False, METRICS_IPS=['10.0.0.0/8', 'no-es-ip']):
+            assert self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code == status.HTTP_200_OK
+            assert self.client.get('/metrics', REMOTE_ADDR='192.168.0.1').status_code == status.HTTP_403_FORBIDDEN
+
+
+# ---- TESTS PARA LA INSPECCIÓN DE CONSULTAS ----
+@pytest.mark.unit
+class QueryInspectorTests(TestCase):
+    """Pruebas para las huellas de consultas y los encabezados X-Query-*."""
+
+    def test_fingerprint_ignores_values(self):
+        """La misma consulta con otros valores tiene la misma huella."""
+        a = huella('SELECT * FROM "auth_user" WHERE "id" = 15 AND "username" = \'ana\'')
+        b = huella('SELECT  *  FROM "auth_user" WHERE "id" = %s AND "username" = %s')
+        assert a == b == 'SELECT * FROM "auth_user" WHERE "id" = ? AND "username" = ?'
+        assert huella('SELECT 1 FROM "t" WHERE "id" IN (%s, %s, %s)') == 'SELECT ? FROM "t" WHERE "id" IN (...)'
+
+    def test_debug_headers(self):
+        """Con QUERY_INSPECTOR la respuesta informa las consultas de la petición."""
+        user = User.objects.create_user(username='inspector', password='pass123')
+        with self.settings(QUERY_INSPECTOR=True):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            response = client.get('/api/citas/citas/')
+        assert int(response['X-Query-Count']) >= 1
+        assert response['X-Query-NPlusOne'] == '0'
+        assert 'X-Query-Time-Ms' in response
+
+    def test_disabled_without_flag(self):
+        """Sin QUERY_INSPECTOR (ni DEBUG) no se agregan encabezados."""
+        with self.settings(QUERY_INSPECTOR=False):
+            response = APIClient().get('/api/health/live/')
+        assert 'X-Query-Count' not in response
+
+
+# ---- TESTS PARA EL MODO ASGI ----
+@pytest.mark.unit
+@override_settings(ROOT_URLCONF='config.urls_asgi', QUERY_INSPECTOR=True, METRICS_DIR='')
+class AsgiModeTests(TestCase):
+    """Pruebas para las sondas y middlewares con vistas asíncronas (config/urls_asgi.py)."""
+
+    def setUp(self):
+        estado_base_datos.reiniciar()
+        registro_metricas.limpiar()
+        cache_usuarios.limpiar()
+
+    def tearDown(self):
+        estado_base_datos.reiniciar()
+        registro_metricas.limpiar()
+
+    async def test_async_probes(self):
+        """Liveness y readiness asíncronas responden lo mismo que las síncronas."""
+        response = await self.async_client.get('/api/health/live/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['status'] == 'ok'
+
+        response = await self.async_client.get('/api/health/ready/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['components']['database']['migraciones_pendientes'] == 0
+
+    async def test_middlewares_count_async_queries(self):
+        """Métricas e inspector cuentan las consultas del ORM asíncrono y etiquetan la acción del ViewSet."""
+        user = await User.objects.acreate(username='asincrono')
+        token = RefreshToken.for_user(user).access_token
+        response = await self.async_client.get('/api/citas/citas/', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == status.HTTP_200_OK
+        # Usuario del token + resumen para el ETag + página
+        assert response['X-Query-Count'] == '3'
+
+        texto = exposicion(registro_metricas.estados())
+        assert 'http_requests_total{vista="CitaViewSet",accion="list",metodo="GET",estado="200"} 1' in texto
+        assert 'http_request_db_queries_bucket{vista="CitaViewSet",accion="list",le="2"} 0' in texto
+
+
 # ---- TESTS PARA DOCUMENTACIÓN SWAGGER ----
 @pytest.mark.unit
 class SwaggerDocsTests(TestCase):
@@ -73,3 +295,118 @@ class SwaggerDocsTests(TestCase):
         response = self.client.get('/openapi.json/')
         assert response.status_code == status.HTTP_200_OK
         assert response['Content-Type'] == 'application/json'
+
+
+@pytest.mark.unit
+class PrecomputedSchemaTests(TestCase):
+    """El esquema OpenAPI se genera una vez y se sirve con ETag y caché larga."""
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.directorio.name, 'openapi.json')
+        documentacion.limpiar()
+        self.addCleanup(documentacion.limpiar)
+        self.addCleanup(self.directorio.cleanup)
+
+    def test_generar_openapi_writes_schema_file(self):
+        from django.core.management import call_command
+
+        # Sin tracebacks: las vistas no consultan con el usuario anónimo de la introspección
+        with self.assertNoLogs('drf_yasg', level='WARNING'):
+            call_command('generar_openapi', salida=self.ruta, stdout=open(os.devnull, 'w'))
+        with open(self.ruta) as archivo:
+            esquema = json.load(archivo)
+        assert esquema['info']['title'] == 'API de Reservas de Citas'
+        assert 'host' not in esquema
+        assert any(ruta.startswith('/citas/') for ruta in esquema['paths'])
+
+    def test_serves_file_with_long_cache_and_etag(self):
+        with open(self.ruta, 'w') as archivo:
+            archivo.write('{"swagger": "2.0", "info": {"title": "precalculado"}}')
+
+        with override_settings(OPENAPI_ESQUEMA=self.ruta, OPENAPI_MAX_AGE=3600), \
+                mock.patch.object(documentacion, 'generar') as generar:
+            response = self.client.get('/openapi.json/')
+            assert response.status_code == status.HTTP_200_OK
+            assert json.loads(response.content)['info']['title'] == 'precalculado'
+            assert 'max-age=3600' in response['Cache-Control']
+            assert 'public' in response['Cache-Control']
+
+            no_modificada = self.client.get('/swagger.json/', HTTP_IF_NONE_MATCH=response['ETag'])
+            assert no_modificada.status_code == status.HTTP_304_NOT_MODIFIED
+            assert no_modificada['ETag'] == response['ETag']
+        generar.assert_not_called()
+
+    def test_missing_file_is_generated_once_per_process(self):
+        with override_settings(OPENAPI_ESQUEMA=self.ruta), \
+                mock.patch.object(documentacion, 'generar', wraps=documentacion.generar) as generar:
+            assert self.client.get('/openapi.json/').status_code == status.HTTP_200_OK
+            yaml = self.client.get('/swagger.yaml/')
+            assert yaml.status_code == status.HTTP_200_OK
+            assert yaml['Content-Type'] == 'application/yaml'
+            assert b'title: API de Reservas de Citas' in yaml.content
+        assert generar.call_count == 1
+
+    def test_unknown_format_is_404(self):
+        assert self.client.get('/openapi.xml/').status_code == status.HTTP_404_NOT_FOUND
+
+    def test_ui_pages_load_precomputed_schema(self):
+        with mock.patch.object(documentacion, 'generar') as generar:
+            for ruta in ('/docs/', '/swagger/', '/redoc/'):
+                response = self.client.get(ruta)
+                assert response.status_code == status.HTTP_200_OK
+                assert b'/openapi.json/' in response.content
+        generar.assert_not_called()
+
+
+@pytest.mark.unit
+class StartupReportTests(TestCase):
+    """Agrupación de la salida de python -X importtime en tiempo_arranque."""
+
+    def test_groups_self_time_by_installed_app_or_package(self):
+        salida = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:      1000 |       1000 |   django.db",
+            "import time:       500 |       2000 | django.contrib.auth.models",
+            "import time:       250 |        250 |     apps.citas.views",
+            "import time:       250 |        250 |   yaml",
+        ])
+        grupos = agrupar_importaciones(salida, ['django.contrib.auth', 'apps.citas'])
+        assert grupos == {'django': 0.001, 'django.contrib.auth': 0.0005, 'apps.citas': 0.00025, 'yaml': 0.00025}
+
+
+@pytest.mark.unit
+class ConnectionSettingsTests(TestCase):
+    """configurar_conexiones() arma la reutilización de conexiones desde las variables DB_*."""
+
+    POSTGRES = {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'citas', 'OPTIONS': {'sslmode': 'require'}}
+
+    def test_persistent_connections_with_health_checks(self):
+        from config.settings import base
+
+        with mock.patch.multiple(base, DB_CONN_MAX_AGE=120, DB_CONN_HEALTH_CHECKS=True, DB_POOL=False):
+            resultado = base.configurar_conexiones(self.POSTGRES)
+        assert resultado['CONN_MAX_AGE'] == 120
+        assert resultado['CONN_HEALTH_CHECKS'] is True
+        assert 'pool' not in resultado['OPTIONS']
+
+    def test_pool_replaces_persistent_connections_on_postgresql(self):
+        from config.settings import base
+
+        with mock.patch.multiple(base, DB_CONN_MAX_AGE=120, DB_POOL=True, DB_POOL_MIN=2, DB_POOL_MAX=8):
+            resultado = base.configurar_conexiones(self.POSTGRES)
+        assert resultado['CONN_MAX_AGE'] == 0
+        assert resultado['OPTIONS']['sslmode'] == 'require'
+        assert resultado['OPTIONS']['pool']['min_size'] == 2
+        assert resultado['OPTIONS']['pool']['max_size'] == 8
+        # La entrada original no se modifica
+        assert 'pool' not in self.POSTGRES['OPTIONS']
+
+    def test_pool_is_ignored_outside_postgresql(self):
+        from config.settings import base
+
+        sqlite = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db.sqlite3'}
+        with mock.patch.multiple(base, DB_CONN_MAX_AGE=60, DB_POOL=True):
+            resultado = base.configurar_conexiones(sqlite)
+        assert resultado['CONN_MAX_AGE'] == 60
+        assert 'OPTIONS' not in resultado
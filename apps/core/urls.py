@@ -1,6 +1,12 @@
 from django.urls import path
-from .views import health_check
+from .views import HealthAPIView, liveness, readiness
 
 urlpatterns = [
-    path('health/', health_check, name='health'),   # accesible en /api/health/ si incluyes 'api/' en root
+    # Accesibles en /api/health/... (incluido desde config/urls.py)
+    path('', readiness, name='health'),
+    path('live/', liveness, name='health-live'),
+    path('ready/', readiness, name='health-ready'),
+    path('status/', HealthAPIView.as_view(), name='health-status'),
+    # Ruta anterior, se mantiene por compatibilidad
+    path('health/', readiness, name='health-legacy'),
 ]
@@ -1,72 +1,150 @@
-from django.http import JsonResponse
-from django.db import connection
-from django.db.utils import OperationalError
+import hmac
+import ipaddress
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 import logging
 
+from .health import estado_base_datos
+from .metricas import exposicion, registro_metricas
+
 logger = logging.getLogger(__name__)
 
+SERVICIO = "API Reservas Citas"
+VERSION = "1.0.0"
 
-def health_check(request):
+
+def _datos_liveness():
+    return {
+        "status": "ok",
+        "timestamp": timezone.now().isoformat(),
+        "service": SERVICIO,
+        "version": VERSION,
+    }
+
+
+def _datos_readiness(db=None):
     """
-    Health Check Endpoint
-    Valida: servidor, base de datos, configuración
-    Retorna 200 OK si todo funciona
+    Estado para la sonda de readiness y código HTTP.
+    La base de datos no se consulta en cada sonda: el estado se renueva como
+    máximo una vez cada HEALTH_DB_CACHE segundos (ver apps.core.health).
     """
-    try:
-        # Verificar conexión a base de datos
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-        
-        db_status = "healthy"
-        db_connected = True
-    except OperationalError as e:
-        logger.error(f"Database connection error: {e}")
-        db_status = "unhealthy"
-        db_connected = False
-
-    response_data = {
-        "status": "healthy" if db_connected else "degraded",
-        "service": "API Reservas Citas",
-        "version": "1.0.0",
-        "database": db_status,
-        "components": {
+    if db is None:
+        db = estado_base_datos.estado()
+    if db['lista']:
+        estado = "ok"
+    elif db['conectada']:
+        estado = "degraded"  # la base responde pero faltan migraciones
+    else:
+        estado = "error"
+
+    datos = dict(
+        _datos_liveness(),
+        status=estado,
+        database="connected" if db['conectada'] else "disconnected",
+        components={
             "server": "healthy",
-            "database": db_status,
-        }
-    }
+            "database": {
+                "status": "healthy" if db['conectada'] else "unhealthy",
+                "latencia": db['latencia'],
+                "migraciones_pendientes": db['migraciones_pendientes'],
+                "timeout": db['timeout'],
+                "comprobado": db.get('comprobado'),
+                "error": db.get('error'),
+            },
+        },
+    )
+    codigo = status.HTTP_200_OK if db['lista'] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return datos, codigo
+
+
+def liveness(request):
+    """
+    Liveness Probe
+    GET /api/health/live/
+    Solo confirma que el proceso responde: no toca la base de datos.
+    """
+    return JsonResponse(_datos_liveness())
+
+
+def readiness(request):
+    """
+    Readiness Probe
+    GET /api/health/ready/ (también /api/health/)
+    200 si la base de datos responde y no hay migraciones pendientes, 503 si no.
+    Incluye percentiles de latencia del ping a la base de datos.
+    """
+    datos, codigo = _datos_readiness()
+    return JsonResponse(datos, status=codigo)
+
+
+async def liveness_async(request):
+    """liveness para el modo ASGI (config/urls_asgi.py)."""
+    return JsonResponse(_datos_liveness())
+
+
+async def readiness_async(request):
+    """readiness para el modo ASGI: espera la comprobación de la base de datos sin bloquear el event loop."""
+    datos, codigo = _datos_readiness(await estado_base_datos.aestado())
+    return JsonResponse(datos, status=codigo)
 
-    http_status = status.HTTP_200_OK if db_connected else status.HTTP_503_SERVICE_UNAVAILABLE
-    return JsonResponse(response_data, status=http_status)
+
+# Nombre anterior del endpoint de health check
+health_check = readiness
 
 
 class HealthAPIView(APIView):
     """
     Health Check API View
     GET /api/health/status/
-    Retorna estado detallado del sistema
+    Retorna estado detallado del sistema (el mismo de la sonda de readiness)
     """
+    authentication_classes = []
     permission_classes = []
 
     def get(self, request):
         """Obtener estado del sistema"""
+        datos, codigo = _datos_readiness()
+        return Response(datos, status=codigo)
+
+
+def _ip_permitida(direccion, permitidas):
+    """True si la IP está en alguna de las IPs o redes (CIDR) permitidas."""
+    try:
+        ip = ipaddress.ip_address(direccion)
+    except ValueError:
+        return False
+    for red in permitidas:
         try:
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT 1")
-            db_healthy = True
-        except OperationalError:
-            db_healthy = False
-
-        data = {
-            "status": "ok" if db_healthy else "error",
-            "timestamp": timezone.now().isoformat(),
-            "service": "API Reservas Citas",
-            "version": "1.0.0",
-            "database": "connected" if db_healthy else "disconnected",
-        }
-
-        return Response(data, status=status.HTTP_200_OK if db_healthy else status.HTTP_503_SERVICE_UNAVAILABLE)
+            if ip in ipaddress.ip_network(red, strict=False):
+                return True
+        except ValueError:
+            logger.warning(f"METRICS_IPS: '{red}' no es una IP ni una red válida")
+    return False
 
+
+def metrics(request):
+    """
+    Métricas en formato de texto de Prometheus
+    GET /metrics
+    Suma las métricas de todos los workers (ver apps.core.metricas).
+    Acceso: `Authorization: Bearer <METRICS_TOKEN>`, una IP de METRICS_IPS o
+    METRICS_PUBLICO. Sin token ni IPs configurados responde 403.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    permitidas = getattr(settings, 'METRICS_IPS', [])
+    permitido = (
+        getattr(settings, 'METRICS_PUBLICO', False)
+        or (token and hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"))
+        or (permitidas and _ip_permitida(request.META.get('REMOTE_ADDR', ''), permitidas))
+    )
+    if not permitido:
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED if token else status.HTTP_403_FORBIDDEN)
+    return HttpResponse(
+        exposicion(registro_metricas.estados()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -1,25 +1,11 @@
-from django.http import JsonResponse
-from django.db import connections
-from django.db.utils import OperationalError
+from apps.core.views import readiness
+
 
 def health(request):
     """
     Endpoint simple de Health Check.
-    Verifica si la base de datos está disponible.
-    Retorna:
-    - 200 OK si la DB responde
-    - 503 SERVICE UNAVAILABLE si hay error de conexión
+    Usa la misma comprobación cacheada que la sonda de readiness de apps.core:
+    - 200 OK si la DB responde y no hay migraciones pendientes
+    - 503 SERVICE UNAVAILABLE si no
     """
-    # Obtener la conexión por defecto de la base de datos
-    db_conn = connections['default']
-    try:
-        # Intentar ejecutar un SELECT simple para comprobar la DB
-        c = db_conn.cursor()
-        c.execute("SELECT 1;")
-        c.fetchone()  # Recuperar un resultado (aunque no lo usamos)
-    except OperationalError:
-        # Si falla la conexión, retornar error 503
-        return JsonResponse({"status": "error", "db": "unavailable"}, status=503)
-
-    # Si la DB está bien, retornar estado OK
-    return JsonResponse({"status": "ok"}, status=200)
+    return readiness(request)
@@ -7,3 +7,7 @@ class UsersConfig(AppConfig):
 
     # Nombre de la aplicación dentro del proyecto Django
     name = "apps.users"
+
+    def ready(self):
+        """Conecta las señales que invalidan la caché de autenticación."""
+        from . import signals
@@ -0,0 +1,171 @@
+"""
+Autenticación JWT con caché de usuarios.
+
+JWTAuthentication de SimpleJWT hace un SELECT de la tabla de usuarios en cada
+petición. CachedJWTAuthentication guarda las filas de usuario (sin el hash de
+la contraseña) en una caché en memoria del proceso, con tiempo de vida y
+tamaño máximo (LRU), y arma con ellas un User nuevo por petición. Con la
+caché caliente la autenticación no consulta la base de datos.
+
+Invalidación:
+- Guardar o borrar un usuario o su perfil lo saca de la caché del proceso
+  (señales en apps.users.signals).
+- Además se cambia una "generación" en la caché compartida de Django; cada
+  proceso la revisa cada USERS_AUTH_CACHE_SYNC segundos y, si cambió, vacía su
+  caché. Así una desactivación llega a todos los workers de gunicorn.
+  Para eso la caché de Django tiene que ser compartida (CACHE_URL con redis,
+  filecache o base de datos). Con la caché en memoria del proceso (locmem,
+  el valor por defecto) la generación no sale del worker, así que las filas
+  viven como mucho USERS_AUTH_CACHE_TTL_LOCAL segundos.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+CLAVE_GENERACION = 'users:auth:generacion'
+
+
+def _cache_compartida():
+    """True si la caché de Django llega a los demás workers (no es locmem ni dummy)."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+class CacheUsuarios:
+    """Caché LRU con tiempo de vida de filas de usuario, segura entre hilos."""
+
+    def __init__(self, maximo=None, ttl=None, sincronizar_cada=None):
+        self._filas = OrderedDict()
+        self._lock = threading.Lock()
+        self._maximo = maximo
+        self._ttl = ttl
+        self._sincronizar_cada = sincronizar_cada
+        self._generacion = None
+        self._revisado = 0.0
+
+    def _config(self, valor, nombre, defecto):
+        return valor if valor is not None else getattr(settings, nombre, defecto)
+
+    def _sincronizar(self, ahora):
+        """Vacía la caché si otro proceso invalidó un usuario (como máximo una consulta cada N segundos)."""
+        with self._lock:
+            if ahora - self._revisado < self._config(self._sincronizar_cada, 'USERS_AUTH_CACHE_SYNC', 5):
+                return
+            # Solo un hilo por intervalo consulta la caché compartida
+            self._revisado = ahora
+        # La lectura (posiblemente de red) se hace sin tener el lock
+        try:
+            generacion = cache.get(CLAVE_GENERACION)
+        except Exception as e:
+            logger.warning(f"No se pudo leer la generación de la caché de usuarios: {e}")
+            return
+        with self._lock:
+            if generacion != self._generacion:
+                self._generacion = generacion
+                self._filas.clear()
+
+    def _vida(self):
+        """Segundos de vida de una fila; cortos si la invalidación no llega a otros workers."""
+        ttl = self._config(self._ttl, 'USERS_AUTH_CACHE_TTL', 60)
+        if self._ttl is None and not _cache_compartida():
+            ttl = min(ttl, getattr(settings, 'USERS_AUTH_CACHE_TTL_LOCAL', 5))
+        return ttl
+
+    def obtener(self, pk):
+        ahora = time.monotonic()
+        self._sincronizar(ahora)
+        with self._lock:
+            entrada = self._filas.get(str(pk))
+            if entrada is None:
+                return None
+            vence, fila = entrada
+            if vence <= ahora:
+                del self._filas[str(pk)]
+                return None
+            self._filas.move_to_end(str(pk))
+            return fila
+
+    def guardar(self, pk, fila):
+        vence = time.monotonic() + self._vida()
+        with self._lock:
+            self._filas[str(pk)] = (vence, fila)
+            self._filas.move_to_end(str(pk))
+            while len(self._filas) > self._config(self._maximo, 'USERS_AUTH_CACHE_MAX', 1024):
+                self._filas.popitem(last=False)
+
+    def invalidar(self, pk):
+        with self._lock:
+            self._filas.pop(str(pk), None)
+
+    def limpiar(self):
+        with self._lock:
+            self._filas.clear()
+
+
+cache_usuarios = CacheUsuarios()
+
+
+def invalidar_usuario(pk):
+    """Saca al usuario de la caché de este proceso y avisa a los demás."""
+    cache_usuarios.invalidar(pk)
+    try:
+        cache.set(CLAVE_GENERACION, time.time_ns(), timeout=None)
+    except Exception as e:
+        logger.warning(f"No se pudo publicar la invalidación del usuario {pk}: {e}")
+
+
+def _campos_usuario(modelo):
+    """Columnas que se guardan en caché: todas menos la contraseña."""
+    return [campo.attname for campo in modelo._meta.concrete_fields if campo.attname != 'password']
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que resuelve el usuario del token desde la caché de usuarios.
+    Cada petición recibe su propia instancia de User (no se comparten entre hilos);
+    la contraseña queda diferida y solo se consulta si alguien la lee.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Esa comprobación necesita el hash de la contraseña, que no se guarda en caché
+            return super().get_user(validated_token)
+
+        user_id = self._id_usuario(validated_token)
+        fila = cache_usuarios.obtener(user_id)
+        if fila is None:
+            fila = self._consulta(user_id).first()
+            if fila is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            cache_usuarios.guardar(user_id, fila)
+        return self._usuario(fila)
+
+    def _id_usuario(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def _consulta(self, user_id):
+        return self.user_model.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).values_list(*_campos_usuario(self.user_model))
+
+    def _usuario(self, fila):
+        modelo = self.user_model
+        user = modelo.from_db(router.db_for_read(modelo), _campos_usuario(modelo), fila)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -0,0 +1,45 @@
+"""
+Claims de autorización dentro de los tokens JWT.
+
+El token de acceso lleva el rol del perfil y el flag is_staff del usuario,
+así los permisos se resuelven sin consultar la base de datos. Los claims se
+escriben al hacer login y se vuelven a leer de la base de datos en cada
+refresh, de modo que un cambio de rol se aplica con el siguiente token.
+"""
+from django.core.exceptions import ObjectDoesNotExist
+
+
+ROL_POR_DEFECTO = 'cliente'
+
+
+def rol_de(user):
+    """Rol del perfil del usuario ('cliente' si no tiene perfil)."""
+    try:
+        return user.profile.rol
+    except (AttributeError, ObjectDoesNotExist):
+        return ROL_POR_DEFECTO
+
+
+def agregar_claims(token, user):
+    """Escribe los claims de autorización del usuario en el token."""
+    token['rol'] = rol_de(user)
+    token['is_staff'] = user.is_staff
+    return token
+
+
+def claims_de(request):
+    """
+    (rol, is_staff) del usuario de la petición.
+    Se leen del token si trae los claims; si no (sesión o token antiguo) se
+    calculan una sola vez por petición y se guardan en el request.
+    """
+    token = request.auth
+    if token is not None and hasattr(token, 'get') and 'rol' in token:
+        return token.get('rol'), bool(token.get('is_staff'))
+
+    memo = getattr(request, '_claims_rol', None)
+    if memo is None:
+        user = request.user
+        memo = (rol_de(user), bool(user.is_staff)) if user.is_authenticated else (None, False)
+        request._claims_rol = memo
+    return memo
@@ -0,0 +1,205 @@
+"""
+Importación masiva de usuarios y perfiles desde CSV o JSONL.
+
+El archivo se lee como stream, fila por fila, y se procesa por bloques:
+- cada fila se valida con UsuarioImportacionSerializer (sin consultas);
+- los usernames ya existentes se buscan con una consulta por bloque;
+- las contraseñas se hashean en un pool de procesos (el hash es CPU puro y
+  es lo más lento de la importación);
+- User y Profile se insertan con bulk_create dentro de una transacción por bloque.
+
+Cada fila con problemas se informa con su número de línea; las demás se importan.
+"""
+import csv
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from .models import Profile
+from .serializers import UsuarioImportacionSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def leer_csv(texto):
+    """Filas de un CSV con encabezado: (línea, datos, error). Las celdas vacías se omiten."""
+    lector = csv.DictReader(texto)
+    for fila in lector:
+        datos = {clave.strip(): valor.strip() for clave, valor in fila.items() if clave and valor and valor.strip()}
+        yield lector.line_num, datos, None
+
+
+def leer_jsonl(texto):
+    """Filas de un archivo JSONL (un objeto por línea): (línea, datos, error)."""
+    for linea, contenido in enumerate(texto, start=1):
+        if not contenido.strip():
+            continue
+        try:
+            datos = json.loads(contenido)
+        except ValueError as e:
+            yield linea, None, f"JSON inválido: {e}"
+            continue
+        if not isinstance(datos, dict):
+            yield linea, None, "Cada línea debe ser un objeto JSON."
+            continue
+        yield linea, datos, None
+
+
+FORMATOS = {
+    'csv': leer_csv,
+    'jsonl': leer_jsonl,
+}
+
+
+def _hashear(password):
+    # Sin contraseña el usuario queda con una contraseña inutilizable (deberá restablecerla)
+    return make_password(password or None)
+
+
+def _iniciar_proceso():
+    """Los procesos del pool necesitan Django configurado para leer PASSWORD_HASHERS."""
+    import django
+    django.setup()
+
+
+def _bloques(filas, tamano):
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+class _Importacion:
+
+    def __init__(self, pool, procesos):
+        self.pool = pool
+        self.procesos = procesos
+        self.vistos = set()
+        self.creados = 0
+        self.errores = []
+
+    def error(self, linea, username, errores):
+        self.errores.append({"linea": linea, "username": username, "errores": errores})
+
+    def _validar(self, bloque):
+        validas = []
+        for linea, datos, error in bloque:
+            if error:
+                self.error(linea, None, {"detail": [error]})
+                continue
+            serializer = UsuarioImportacionSerializer(data=datos)
+            if not serializer.is_valid():
+                self.error(linea, datos.get('username'), serializer.errors)
+                continue
+            username = serializer.validated_data['username']
+            if username in self.vistos:
+                self.error(linea, username, {"username": ["Username repetido en el archivo."]})
+                continue
+            self.vistos.add(username)
+            validas.append((linea, serializer.validated_data))
+        return validas
+
+    def _descartar_existentes(self, validas):
+        User = get_user_model()
+        existentes = set(
+            User.objects.filter(username__in=[datos['username'] for _, datos in validas])
+            .values_list('username', flat=True)
+        )
+        restantes = []
+        for linea, datos in validas:
+            if datos['username'] in existentes:
+                self.error(linea, datos['username'], {"username": ["Ya existe un usuario con ese username."]})
+            else:
+                restantes.append((linea, datos))
+        return restantes
+
+    def _hashes(self, validas):
+        passwords = [datos.get('password') for _, datos in validas if not datos.get('password_hash')]
+        if self.pool is not None and passwords:
+            calculados = iter(self.pool.map(_hashear, passwords, chunksize=max(1, len(passwords) // (self.procesos * 4))))
+        else:
+            calculados = map(_hashear, passwords)
+        return [datos.get('password_hash') or next(calculados) for _, datos in validas]
+
+    def _insertar(self, validas, hashes):
+        User = get_user_model()
+        usuarios = [
+            User(
+                username=datos['username'],
+                email=datos['email'],
+                first_name=datos.get('first_name', ''),
+                last_name=datos.get('last_name', ''),
+                password=password,
+            )
+            for (_, datos), password in zip(validas, hashes)
+        ]
+        with transaction.atomic():
+            User.objects.bulk_create(usuarios)
+            if any(usuario.pk is None for usuario in usuarios):
+                # Motores sin RETURNING (MySQL): se buscan los ids por username
+                ids = User.objects.filter(username__in=[u.username for u in usuarios]).in_bulk(field_name='username')
+                for usuario in usuarios:
+                    usuario.pk = ids[usuario.username].pk
+            Profile.objects.bulk_create([
+                Profile(
+                    user_id=usuario.pk,
+                    nombre=datos.get('nombre', ''),
+                    telefono=datos.get('telefono', ''),
+                    rol=datos['rol'],
+                )
+                for (_, datos), usuario in zip(validas, usuarios)
+            ])
+
+    def importar_bloque(self, bloque):
+        validas = self._descartar_existentes(self._validar(bloque))
+        if not validas:
+            return
+        hashes = self._hashes(validas)
+        try:
+            self._insertar(validas, hashes)
+        except IntegrityError:
+            # Otro proceso creó alguno de estos usernames mientras tanto: se reintenta sin ellos
+            pares = dict(zip((linea for linea, _ in validas), hashes))
+            validas = self._descartar_existentes(validas)
+            hashes = [pares[linea] for linea, _ in validas]
+            try:
+                self._insertar(validas, hashes)
+            except IntegrityError as e:
+                for linea, datos in validas:
+                    self.error(linea, datos['username'], {"detail": [f"No se pudo guardar: {e}"]})
+                return
+        self.creados += len(validas)
+
+
+def importar_usuarios(filas, procesos=None, lote=None):
+    """
+    Importa las filas (de leer_csv o leer_jsonl).
+    - procesos: tamaño del pool de hashing (0 = uno por CPU, 1 = sin pool)
+    - lote: filas por bloque (una transacción por bloque)
+    Retorna {'creados': n, 'errores': [{'linea', 'username', 'errores'}, ...]}.
+    """
+    procesos = getattr(settings, 'USERS_IMPORTAR_PROCESOS', 0) if procesos is None else procesos
+    procesos = procesos or os.cpu_count() or 1
+    lote = lote or getattr(settings, 'USERS_IMPORTAR_LOTE', 1000)
+
+    pool = ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso) if procesos > 1 else None
+    importacion = _Importacion(pool, procesos)
+    try:
+        for bloque in _bloques(filas, lote):
+            importacion.importar_bloque(bloque)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    logger.info(f"Importación de usuarios: {importacion.creados} creados, {len(importacion.errores)} con errores")
+    return {"creados": importacion.creados, "errores": importacion.errores}
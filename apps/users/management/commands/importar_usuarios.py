@@ -0,0 +1,53 @@
+"""
+Importa usuarios y perfiles desde un archivo CSV (con encabezado) o JSONL.
+
+Columnas: username, email, password o password_hash, first_name, last_name,
+nombre, telefono, rol.
+
+Uso:
+    python manage.py importar_usuarios usuarios.csv
+    python manage.py importar_usuarios usuarios.jsonl --procesos 8 --lote 2000
+"""
+import os
+import time as reloj
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.importacion import FORMATOS, importar_usuarios
+
+
+class Command(BaseCommand):
+    help = "Importa usuarios y perfiles en bloque desde un archivo CSV o JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo a importar")
+        parser.add_argument('--formato', choices=sorted(FORMATOS),
+                            help="Formato del archivo (por defecto según la extensión)")
+        parser.add_argument('--procesos', type=int,
+                            help="Procesos para hashear contraseñas (0 = uno por CPU, 1 = sin pool)")
+        parser.add_argument('--lote', type=int, help="Filas por transacción")
+
+    def handle(self, *args, **options):
+        archivo = options['archivo']
+        formato = options['formato'] or os.path.splitext(archivo)[1].lstrip('.').lower()
+        if formato not in FORMATOS:
+            raise CommandError("No se reconoce el formato: use --formato csv o --formato jsonl.")
+
+        t0 = reloj.perf_counter()
+        try:
+            with open(archivo, encoding='utf-8-sig', newline='') as texto:
+                resultado = importar_usuarios(
+                    FORMATOS[formato](texto), procesos=options['procesos'], lote=options['lote'],
+                )
+        except OSError as e:
+            raise CommandError(f"No se pudo leer el archivo: {e}")
+        duracion = reloj.perf_counter() - t0
+
+        for error in resultado['errores']:
+            self.stdout.write(self.style.WARNING(
+                f"Línea {error['linea']} ({error['username'] or '-'}): {error['errores']}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['creados']} usuarios creados, {len(resultado['errores'])} filas con errores "
+            f"en {duracion:.1f} s."
+        ))
@@ -37,3 +37,13 @@ class Profile(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.rol}"
+
+
+class TokenRevocado(models.Model):
+    """JTI de un refresh token que ya no se puede usar (rotado o revocado)."""
+    jti = models.CharField(max_length=255, unique=True)
+    # Vencimiento del token: después de esta fecha la fila se puede borrar
+    expira = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
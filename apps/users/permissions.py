@@ -1,18 +1,23 @@
 from rest_framework.permissions import BasePermission
 
+from .claims import claims_de
+
+# Los permisos leen rol e is_staff de los claims del token JWT (sin consultas a
+# la base de datos); sin claims (sesión o token antiguo) claims_de() los toma
+# del perfil una sola vez por petición.
+
+
 # Permiso que permite acceso solo a empleados o admin
 class IsEmployee(BasePermission):
     """Permite acceso solo a usuarios con rol empleado o staff/admin."""
 
     def has_permission(self, request, view):
-        user = request.user
+        if not (request.user and request.user.is_authenticated):
+            return False
 
-        # Los usuarios staff (administradores) pueden acceder siempre
-        if user.is_staff:
-            return True
-
-        # Usuarios con perfil tipo 'empleado' pueden acceder
-        return hasattr(user, "profile") and user.profile.rol == "empleado"
+        # Los usuarios staff (administradores) y los empleados pueden acceder
+        rol, is_staff = claims_de(request)
+        return is_staff or rol == "empleado"
 
 
 # Permiso que permite acceso solo al dueño del objeto
@@ -20,8 +25,8 @@ class IsOwner(BasePermission):
     """Solo el dueño del objeto (cliente) puede acceder."""
 
     def has_object_permission(self, request, view, obj):
-        # Compara si el usuario actual es el cliente asociado al objeto
-        return obj.cliente == request.user
+        # Compara por id: no carga el cliente del objeto
+        return obj.cliente_id == request.user.pk
 
 
 # Permiso combinado: empleado/admin ve todo, cliente solo lo suyo
@@ -33,15 +38,26 @@ class IsOwnerOrEmployee(BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        user = request.user
-
-        # Admin ve todo
-        if user.is_staff:
+        # Admin y empleado ven todo
+        rol, is_staff = claims_de(request)
+        if is_staff or rol == "empleado":
             return True
 
-        # Empleado ve todo
-        if hasattr(user, "profile") and user.profile.rol == "empleado":
-            return True
+        # Cliente solo ve sus propios objetos (por id, sin cargar el cliente)
+        return obj.cliente_id == request.user.pk
+
+
+class IsStaffClaim(BasePermission):
+    """
+    Solo personal (is_staff), leído del claim del token JWT. Sin claims
+    (sesión o token antiguo) usa el flag del usuario ya autenticado.
+    """
+    message = "Solo empleados pueden realizar esta acción."
 
-        # Cliente solo ve sus propios objetos
-        return obj.cliente == user
+    def has_permission(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return False
+        token = request.auth
+        if token is not None and hasattr(token, 'get') and 'is_staff' in token:
+            return bool(token.get('is_staff'))
+        return bool(request.user.is_staff)
@@ -0,0 +1,100 @@
+"""
+Registro de refresh tokens revocados.
+
+Cada refresh token rotado guarda su JTI en TokenRevocado (JTI único). El
+registro mantiene además en memoria del proceso un conjunto con los JTI
+revocados, así un token ya usado se rechaza sin consultar la base de datos.
+
+- El conjunto se pone al día de forma incremental (filas con id mayor al
+  último visto) cada USERS_REVOCADOS_SYNC segundos, lo que trae las
+  revocaciones hechas por los demás workers.
+- La garantía no depende de esa sincronización: revocar es un INSERT sobre un
+  JTI único, así que si dos workers intentan rotar el mismo token a la vez
+  solo uno lo consigue.
+- Las filas vencidas se borran solas cada USERS_REVOCADOS_PURGA segundos.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import TokenRevocado
+
+logger = logging.getLogger(__name__)
+
+
+class RegistroRevocados:
+    """Conjunto en memoria de JTI revocados, respaldado por TokenRevocado."""
+
+    def __init__(self):
+        self._jtis = {}  # jti -> vencimiento
+        self._marca = 0  # último id de TokenRevocado cargado
+        self._lock = threading.Lock()
+        self._sincronizado = None
+        self._purgado = time.monotonic()
+
+    def _sincronizar(self):
+        ahora = time.monotonic()
+        if self._sincronizado is not None and ahora - self._sincronizado < getattr(settings, 'USERS_REVOCADOS_SYNC', 5):
+            return
+        self._sincronizado = ahora
+        nuevos = (
+            TokenRevocado.objects
+            .filter(id__gt=self._marca, expira__gt=timezone.now())
+            .order_by('id')
+            .values_list('id', 'jti', 'expira')
+        )
+        for pk, jti, expira in nuevos:
+            self._jtis[jti] = expira
+            self._marca = pk
+
+    def _purgar(self):
+        """Borra los revocados vencidos (en la base de datos y en memoria)."""
+        ahora = time.monotonic()
+        if ahora - self._purgado < getattr(settings, 'USERS_REVOCADOS_PURGA', 3600):
+            return
+        self._purgado = ahora
+        limite = timezone.now()
+        borrados, _ = TokenRevocado.objects.filter(expira__lte=limite).delete()
+        self._jtis = {jti: expira for jti, expira in self._jtis.items() if expira > limite}
+        if borrados:
+            logger.info(f"Tokens revocados vencidos eliminados: {borrados}")
+
+    def revocado(self, jti):
+        """Indica si el JTI ya fue revocado (sin consultar la base de datos entre sincronizaciones)."""
+        with self._lock:
+            self._sincronizar()
+            return jti in self._jtis
+
+    def revocar(self, jti, exp):
+        """
+        Revoca el JTI hasta su vencimiento `exp` (timestamp del claim).
+        Retorna False si ya estaba revocado, incluso por otro worker en ese instante.
+        """
+        expira = datetime.fromtimestamp(exp, tz=dt_timezone.utc)
+        with self._lock:
+            if jti in self._jtis:
+                return False
+        try:
+            with transaction.atomic():
+                TokenRevocado.objects.create(jti=jti, expira=expira)
+            revocado = True
+        except IntegrityError:
+            revocado = False
+        with self._lock:
+            self._jtis[jti] = expira
+            self._purgar()
+        return revocado
+
+    def limpiar(self):
+        with self._lock:
+            self._jtis.clear()
+            self._marca = 0
+            self._sincronizado = None
+
+
+registro_revocados = RegistroRevocados()
@@ -1,5 +1,14 @@
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher
 from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .claims import agregar_claims
+from .revocacion import registro_revocados
 from .models import Profile  
 
 # Serializador para el modelo User de Django
@@ -56,3 +65,82 @@ class RegisterSerializer(serializers.ModelSerializer):
             pass
 
         return user
+
+
+# Serializador de una fila de la importación masiva (sin consultas)
+class UsuarioImportacionSerializer(serializers.Serializer):
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField()
+    password = serializers.CharField(required=False, allow_blank=True)
+    # Hash ya calculado (por ejemplo, exportado de otro sistema Django): no se vuelve a calcular
+    password_hash = serializers.CharField(required=False, allow_blank=True)
+    first_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    nombre = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    telefono = serializers.CharField(max_length=30, required=False, allow_blank=True)
+    rol = serializers.ChoiceField(choices=Profile.ROLE_CHOICES, required=False, default='cliente')
+
+    def validate_password_hash(self, value):
+        if value:
+            try:
+                identify_hasher(value)
+            except ValueError:
+                raise serializers.ValidationError("Hash de contraseña no reconocido.")
+        return value
+
+    def validate(self, attrs):
+        if attrs.get('password') and attrs.get('password_hash'):
+            raise serializers.ValidationError("Use password o password_hash, no ambos.")
+        return attrs
+
+
+# Serializador de login: agrega rol e is_staff al token
+class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+
+    @classmethod
+    def get_token(cls, user):
+        return agregar_claims(super().get_token(user), user)
+
+
+# Serializador de refresh: vuelve a leer rol e is_staff para que los cambios se apliquen
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+
+    def validate(self, attrs):
+        """
+        Igual que TokenRefreshSerializer, pero con el usuario y su perfil en una
+        sola consulta, y reescribiendo los claims del nuevo token de acceso.
+        Los tokens rotados se revocan en registro_revocados: uno ya usado se
+        rechaza desde la memoria, sin consultas.
+        """
+        refresh = self.token_class(attrs["refresh"])
+        jti = refresh[api_settings.JTI_CLAIM]
+        if registro_revocados.revocado(jti):
+            raise InvalidToken("El token ya fue utilizado o revocado.")
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = None
+        if user_id is not None:
+            user = (
+                get_user_model().objects
+                .select_related('profile')
+                .filter(**{api_settings.USER_ID_FIELD: user_id})
+                .first()
+            )
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        agregar_claims(refresh, user)
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # El INSERT del JTI es atómico: si dos peticiones rotan el mismo token, solo una gana
+            if api_settings.BLACKLIST_AFTER_ROTATION and not registro_revocados.revocar(jti, refresh["exp"]):
+                raise InvalidToken("El token ya fue utilizado o revocado.")
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data["refresh"] = str(refresh)
+
+        return data
@@ -0,0 +1,32 @@
+"""
+Señales de la aplicación de Usuarios.
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidar_usuario
+from .models import Profile
+
+# Campos que cambian sin afectar la autenticación (por ejemplo, en cada login)
+CAMPOS_SIN_INVALIDAR = {'last_login'}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidar_usuario_guardado(sender, instance, created, update_fields=None, **kwargs):
+    """Un usuario modificado (desactivado, staff, datos) sale de la caché de autenticación."""
+    if created or (update_fields is not None and set(update_fields) <= CAMPOS_SIN_INVALIDAR):
+        return
+    invalidar_usuario(instance.pk)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidar_usuario_borrado(sender, instance, **kwargs):
+    invalidar_usuario(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidar_usuario_por_perfil(sender, instance, **kwargs):
+    """Un cambio de rol también invalida al usuario."""
+    invalidar_usuario(instance.user_id)
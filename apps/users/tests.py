@@ -1,9 +1,22 @@
 import pytest
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
-from apps.users.models import Profile
+from types import SimpleNamespace
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.users.models import Profile, TokenRevocado
+from apps.users.revocacion import RegistroRevocados
+from apps.users.permissions import IsEmployee, IsOwnerOrEmployee
+from apps.users.authentication import CachedJWTAuthentication, CacheUsuarios, cache_usuarios
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+import io
+import tempfile
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from apps.users.importacion import importar_usuarios, leer_csv, leer_jsonl
 
 # =========================
 # Tests para creación y validación de usuarios
@@ -122,3 +135,240 @@ class UserPermissionTests(TestCase):
         """Usuario no autenticado no puede acceder a endpoints protegidos"""
         response = self.client.get('/api/citas/')
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+# =========================
+# Tests para los claims de rol en el JWT
+# =========================
+@pytest.mark.unit
+class TokenClaimsTests(TestCase):
+    """Tests para los claims rol e is_staff del token"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='empleado2', password='pass123')
+        self.profile = Profile.objects.create(user=self.user, rol='empleado')
+
+    def _login(self):
+        response = self.client.post('/api/auth/auth/login/', {'username': 'empleado2', 'password': 'pass123'})
+        assert response.status_code == status.HTTP_200_OK
+        return response.data
+
+    def test_login_includes_role_claims(self):
+        """El token de acceso trae rol e is_staff"""
+        access = AccessToken(self._login()['access'])
+        assert access['rol'] == 'empleado'
+        assert access['is_staff'] is False
+
+    def test_refresh_applies_role_change(self):
+        """Un cambio de rol se aplica al refrescar el token"""
+        tokens = self._login()
+        self.profile.rol = 'cliente'
+        self.profile.save()
+
+        response = self.client.post('/api/auth/auth/refresh/', {'refresh': tokens['refresh']})
+        assert response.status_code == status.HTTP_200_OK
+        assert AccessToken(response.data['access'])['rol'] == 'cliente'
+
+    def test_claim_permission_without_queries(self):
+        """IsEmployee decide con los claims del token, sin consultar la base de datos"""
+        token = AccessToken(self._login()['access'])
+        request = SimpleNamespace(user=self.user, auth=token)
+        with self.assertNumQueries(0):
+            assert IsEmployee().has_permission(request, None)
+
+    def test_claim_permission_memo_without_token(self):
+        """Sin claims en el token el rol se consulta una sola vez por petición"""
+        request = SimpleNamespace(user=User.objects.get(pk=self.user.pk), auth=None)
+        with self.assertNumQueries(1):
+            assert IsEmployee().has_permission(request, None)
+            assert IsEmployee().has_permission(request, None)
+
+    def test_owner_or_employee_reads_role_claim(self):
+        """IsOwnerOrEmployee deja ver objetos ajenos a un empleado según el claim del token"""
+        token = AccessToken(self._login()['access'])
+        request = SimpleNamespace(user=self.user, auth=token)
+        ajeno = SimpleNamespace(cliente_id=self.user.pk + 1)
+        with self.assertNumQueries(0):
+            assert IsOwnerOrEmployee().has_object_permission(request, None, ajeno)
+
+        token['rol'] = 'cliente'
+        assert not IsOwnerOrEmployee().has_object_permission(request, None, ajeno)
+
+
+# =========================
+# Tests para la autenticación JWT con caché de usuarios
+# =========================
+@pytest.mark.unit
+class CachedJWTAuthenticationTests(TestCase):
+    """Tests para CachedJWTAuthentication"""
+
+    def setUp(self):
+        cache_usuarios.limpiar()
+        self.user = User.objects.create_user(username='cacheado', password='pass123', is_staff=True)
+        token = RefreshToken.for_user(self.user).access_token
+        self.request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_second_request_makes_no_queries(self):
+        """Con la caché caliente la autenticación no consulta la base de datos"""
+        with self.assertNumQueries(1):
+            CachedJWTAuthentication().authenticate(self.request)
+        with self.assertNumQueries(0):
+            user, _ = CachedJWTAuthentication().authenticate(self.request)
+        assert user.pk == self.user.pk
+        assert user.is_staff
+
+    def test_deactivated_user_is_invalidated(self):
+        """Desactivar al usuario lo saca de la caché"""
+        CachedJWTAuthentication().authenticate(self.request)
+        self.user.is_active = False
+        self.user.save()
+
+        with pytest.raises(AuthenticationFailed):
+            CachedJWTAuthentication().authenticate(self.request)
+
+    def test_each_request_gets_its_own_user(self):
+        """Cada petición recibe una instancia distinta del usuario"""
+        primero, _ = CachedJWTAuthentication().authenticate(self.request)
+        segundo, _ = CachedJWTAuthentication().authenticate(self.request)
+        primero.first_name = 'Cambiado'
+        assert segundo.first_name == ''
+
+    @override_settings(USERS_AUTH_CACHE_TTL=60, USERS_AUTH_CACHE_TTL_LOCAL=2)
+    def test_local_cache_backend_shortens_ttl(self):
+        """Con la caché de Django en memoria del proceso las filas viven poco"""
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            assert CacheUsuarios()._vida() == 2
+        with tempfile.TemporaryDirectory() as carpeta:
+            compartida = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': carpeta}
+            with override_settings(CACHES={'default': compartida}):
+                assert CacheUsuarios()._vida() == 60
+
+
+# =========================
+# Tests para la revocación de refresh tokens
+# =========================
+@pytest.mark.unit
+class RefreshRevocationTests(TestCase):
+    """Tests para el registro de refresh tokens revocados"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='rotador', password='pass123')
+        self.refresh = str(RefreshToken.for_user(self.user))
+
+    def _refresh(self, token):
+        return self.client.post('/api/auth/auth/refresh/', {'refresh': token})
+
+    def test_rotated_token_cannot_be_reused(self):
+        """Un refresh token rotado queda revocado y se guarda su JTI"""
+        response = self._refresh(self.refresh)
+        assert response.status_code == status.HTTP_200_OK
+        nuevo = response.data['refresh']
+        assert nuevo != self.refresh
+        assert TokenRevocado.objects.filter(jti=RefreshToken(self.refresh)['jti']).exists()
+
+        with self.assertNumQueries(0):
+            response = self._refresh(self.refresh)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+        # El token nuevo sí sirve
+        assert self._refresh(nuevo).status_code == status.HTTP_200_OK
+
+    def test_revocation_is_atomic_across_workers(self):
+        """Otro worker (otro registro en memoria) no puede rotar el mismo token"""
+        token = RefreshToken(self.refresh)
+        assert RegistroRevocados().revocar(token['jti'], token['exp'])
+        assert not RegistroRevocados().revocar(token['jti'], token['exp'])
+
+    def test_expired_entries_are_pruned(self):
+        """Las revocaciones vencidas se borran automáticamente"""
+        registro = RegistroRevocados()
+        registro._purgado = 0
+        with self.settings(USERS_REVOCADOS_PURGA=0):
+            registro.revocar('vencido', 1)
+            registro.revocar('vigente', RefreshToken(self.refresh)['exp'])
+        assert list(TokenRevocado.objects.values_list('jti', flat=True)) == ['vigente']
+
+
+# =========================
+# Tests para la importación masiva de usuarios
+# =========================
+@pytest.mark.unit
+class UserImportTests(TestCase):
+    """Tests para la importación de usuarios desde CSV y JSONL"""
+
+    def test_import_csv_creates_users_and_profiles(self):
+        """Cada fila crea un usuario con su perfil y contraseña hasheada"""
+        texto = io.StringIO(
+            "username,email,password,nombre,telefono,rol\n"
+            "ana,ana@example.com,secreta123,Ana,555,empleado\n"
+            "beto,beto@example.com,,Beto,,\n"
+        )
+        resultado = importar_usuarios(leer_csv(texto), procesos=1)
+
+        assert resultado == {'creados': 2, 'errores': []}
+        ana = User.objects.get(username='ana')
+        assert ana.check_password('secreta123')
+        assert ana.profile.rol == 'empleado'
+        assert ana.profile.telefono == '555'
+        beto = User.objects.get(username='beto')
+        assert not beto.has_usable_password()
+        assert beto.profile.rol == 'cliente'
+
+    def test_import_reports_errors_per_line(self):
+        """Las filas inválidas se informan con su línea y las demás se importan"""
+        User.objects.create_user(username='existente', password='pass123')
+        texto = io.StringIO(
+            '{"username": "nuevo", "email": "nuevo@example.com", "password_hash": "%s"}\n'
+            '{"username": "nuevo", "email": "otro@example.com"}\n'
+            '{"username": "malo", "email": "no-es-email"}\n'
+            '{"username": "existente", "email": "e@example.com"}\n'
+            'no es json\n' % make_password('desde-otro-sistema')
+        )
+        resultado = importar_usuarios(leer_jsonl(texto), procesos=1, lote=2)
+
+        assert resultado['creados'] == 1
+        assert [error['linea'] for error in resultado['errores']] == [2, 3, 4, 5]
+        assert 'email' in resultado['errores'][1]['errores']
+        assert User.objects.get(username='nuevo').check_password('desde-otro-sistema')
+        assert Profile.objects.filter(user__username='nuevo').exists()
+
+    def test_import_endpoint_requires_admin(self):
+        """Solo un admin puede importar usuarios"""
+        client = APIClient()
+        user = User.objects.create_user(username='normal', password='pass123')
+        client.force_authenticate(user=user)
+        archivo = SimpleUploadedFile('usuarios.csv', b'username,email\nzoe,zoe@example.com\n')
+        response = client.post('/api/auth/users/importar/', {'archivo': archivo}, format='multipart')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert not User.objects.filter(username='zoe').exists()
+
+    def test_import_endpoint_creates_users(self):
+        """El admin sube un CSV y recibe el resumen de la importación"""
+        client = APIClient()
+        admin = User.objects.create_superuser(username='admin', password='pass123')
+        client.force_authenticate(user=admin)
+        archivo = SimpleUploadedFile(
+            'usuarios.csv', 'username,email,nombre\nzoe,zoe@example.com,Zoë\nx y,mal\n'.encode('utf-8-sig'),
+        )
+        response = client.post('/api/auth/users/importar/', {'archivo': archivo}, format='multipart')
+
+        assert response.status_code == status.HTTP_207_MULTI_STATUS
+        assert response.data['creados'] == 1
+        assert response.data['errores'][0]['linea'] == 3
+        assert User.objects.get(username='zoe').profile.nombre == 'Zoë'
+
+    def test_import_endpoint_rejects_large_files(self):
+        """Más de USERS_IMPORTAR_MAX_FILAS filas: 413 sin importar ninguna"""
+        client = APIClient()
+        admin = User.objects.create_superuser(username='admin', password='pass123')
+        client.force_authenticate(user=admin)
+        filas = ''.join(f'usuario{i},usuario{i}@example.com\n' for i in range(3))
+        archivo = SimpleUploadedFile('usuarios.csv', f'username,email\n{filas}'.encode())
+        with self.settings(USERS_IMPORTAR_MAX_FILAS=2):
+            response = client.post('/api/auth/users/importar/', {'archivo': archivo}, format='multipart')
+
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert 'importar_usuarios' in response.data['detail']
+        assert not User.objects.filter(username__startswith='usuario').exists()
@@ -1,5 +1,8 @@
 from django.urls import path
-from .views import RegisterView, CustomTokenObtainPairView, CustomTokenRefreshView, ProfileView, UserListView
+from .views import (
+    RegisterView, CustomTokenObtainPairView, CustomTokenRefreshView, ProfileView, UserListView,
+    ImportarUsuariosView,
+)
 from rest_framework_simplejwt.views import TokenVerifyView
 
 urlpatterns = [
@@ -20,4 +23,7 @@ urlpatterns = [
 
     # Listar todos los usuarios (solo admin)
     path('users/', UserListView.as_view(), name='users-list'),
+
+    # Importar usuarios en bloque desde CSV o JSONL (solo admin)
+    path('users/importar/', ImportarUsuariosView.as_view(), name='users-importar'),
 ]
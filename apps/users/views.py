@@ -1,12 +1,22 @@
-from rest_framework import generics, permissions
+import io
+from itertools import islice
+
+from rest_framework import generics, permissions, status
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
 from django.contrib.auth.models import User
 
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
-from .serializers import UserSerializer, RegisterSerializer, ProfileSerializer
+from .serializers import (
+    UserSerializer, RegisterSerializer, ProfileSerializer,
+    CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer,
+)
 from .models import Profile
+from .importacion import FORMATOS, importar_usuarios
 
 # =========================
 # Registrar nuevo usuario
@@ -20,13 +30,15 @@ class RegisterView(generics.CreateAPIView):
 # Login JWT personalizado
 # =========================
 class CustomTokenObtainPairView(TokenObtainPairView):
-    pass
+    # El token incluye los claims rol e is_staff
+    serializer_class = CustomTokenObtainPairSerializer
 
 # =========================
 # Refrescar token JWT
 # =========================
 class CustomTokenRefreshView(TokenRefreshView):
-    pass
+    # Los claims se vuelven a leer del usuario: un cambio de rol se aplica al refrescar
+    serializer_class = CustomTokenRefreshSerializer
 
 # =========================
 # Obtener perfil del usuario actual
@@ -50,3 +62,62 @@ class UserListView(generics.ListAPIView):
     permission_classes = [IsAdminUser]  # Solo admin puede ver
     serializer_class = UserSerializer
     queryset = User.objects.all()
+
+# =========================
+# Importación masiva de usuarios (solo admin)
+# =========================
+class ImportarUsuariosView(APIView):
+    """
+    Recibe un archivo CSV o JSONL en el campo `archivo` (multipart) y crea los
+    usuarios con sus perfiles. El formato se toma del campo `formato` o de la
+    extensión del archivo. 201 si se importaron todas las filas, 207 si solo
+    algunas, 400 si ninguna.
+
+    Se importa dentro de la petición, en el propio worker y sin pool de
+    procesos, así que acepta como máximo USERS_IMPORTAR_MAX_FILAS filas (413
+    si hay más; el tope por defecto se hashea dentro del timeout del worker).
+    Las importaciones grandes van por manage.py importar_usuarios.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response({"detail": "Falta el archivo a importar."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        formato = request.data.get('formato') or archivo.name.rsplit('.', 1)[-1].lower()
+        if formato not in FORMATOS:
+            return Response({"detail": "Formato no soportado: use csv o jsonl."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        maximo = settings.USERS_IMPORTAR_MAX_FILAS
+        texto = io.TextIOWrapper(archivo.file, encoding='utf-8-sig', newline='')
+        try:
+            # Se leen (sin importar) hasta maximo + 1 filas para rechazar el archivo completo
+            filas = list(islice(FORMATOS[formato](texto), maximo + 1))
+        except UnicodeDecodeError:
+            return Response({"detail": "El archivo debe estar codificado en UTF-8."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(filas) > maximo:
+            return Response(
+                {"detail": f"El archivo tiene más de {maximo} filas: impórtelo con "
+                           f"'python manage.py importar_usuarios'."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        resultado = importar_usuarios(filas, procesos=1)
+
+        if resultado['creados'] and not resultado['errores']:
+            codigo = status.HTTP_201_CREATED
+        elif resultado['creados']:
+            codigo = status.HTTP_207_MULTI_STATUS
+        else:
+            codigo = status.HTTP_400_BAD_REQUEST
+
+        return Response({
+            "creados": resultado['creados'],
+            "con_error": len(resultado['errores']),
+            "errores": resultado['errores'],
+        }, status=codigo)
@@ -8,5 +8,8 @@ pip install -r requirements.txt
 # Recolectar archivos estáticos
 python manage.py collectstatic --no-input
 
+# Generar el esquema OpenAPI (lo sirve /openapi.json/ sin introspección por petición)
+python manage.py generar_openapi
+
 # Ejecutar migraciones
 python manage.py migrate
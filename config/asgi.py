@@ -3,6 +3,9 @@ ASGI config for reservas_citas project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Modo ASGI (uvicorn): usa config.urls_asgi, con vistas asíncronas para los
+listados más pedidos y las sondas de salud (ASGI_VISTAS_ASYNC=False lo desactiva).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
@@ -16,4 +19,8 @@ if os.getenv('DATABASE_URL'):
 else:
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.dev')
 
+os.environ.setdefault('ASGI_VISTAS_ASYNC', 'True')
+# Django no admite conexiones persistentes bajo ASGI: se usa DB_POOL
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
 application = get_asgi_application()
@@ -6,6 +6,7 @@ entre los entornos de desarrollo y producción.
 """
 
 import os
+import tempfile
 from pathlib import Path
 import environ
 from datetime import timedelta
@@ -39,7 +40,6 @@ INSTALLED_APPS = [
     # Third party apps
     'rest_framework',
     'rest_framework_simplejwt',
-    'drf_yasg',
     'corsheaders',
     'django_filters',
     
@@ -54,7 +54,12 @@ INSTALLED_APPS = [
 # ============================================================================
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Primero, para medir la petición completa (ver /metrics)
+    'apps.core.metricas.MetricasMiddleware',
+    # Encabezados X-Query-* y log de N+1 (solo con QUERY_INSPECTOR, por defecto en DEBUG)
+    'apps.core.consultas.InspectorConsultasMiddleware',
+    # WhiteNoise que no fuerza un hilo por petición en el modo ASGI
+    'apps.core.estaticos.WhiteNoiseAsyncMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,10 +70,16 @@ MIDDLEWARE = [
 ]
 
 # ============================================================================
-# CONFIGURACIÓN DE URLs Y WSGI
+# CONFIGURACIÓN DE URLs, WSGI Y ASGI
 # ============================================================================
-ROOT_URLCONF = 'config.urls'
+# ASGI_VISTAS_ASYNC: usa config.urls_asgi, donde los listados más pedidos y las
+# sondas de salud son vistas asíncronas. config/asgi.py lo activa por defecto;
+# con gunicorn + WSGI debe quedar en False (las vistas asíncronas bajo WSGI
+# corren con async_to_sync y son más lentas).
+ASGI_VISTAS_ASYNC = env.bool('ASGI_VISTAS_ASYNC', default=False)
+ROOT_URLCONF = 'config.urls_asgi' if ASGI_VISTAS_ASYNC else 'config.urls'
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 # ============================================================================
 # TEMPLATES
@@ -103,6 +114,49 @@ DATABASES = {
 
     }
 }
+
+# ============================================================================
+# CONEXIONES A LA BASE DE DATOS (dev.py y prod.py las aplican a su DATABASES)
+# ============================================================================
+# Segundos que cada hilo reutiliza su conexión entre peticiones (0: una por petición)
+DB_CONN_MAX_AGE = env.int('DB_CONN_MAX_AGE', default=60)
+# Antes de la primera consulta de cada petición se verifica que la conexión
+# reutilizada siga viva; si se cayó se abre otra en lugar de fallar
+DB_CONN_HEALTH_CHECKS = env.bool('DB_CONN_HEALTH_CHECKS', default=True)
+# Pool de psycopg 3 por proceso (solo PostgreSQL; reemplaza a DB_CONN_MAX_AGE).
+# Conexiones abiertas como máximo: workers x DB_POOL_MAX.
+DB_POOL = env.bool('DB_POOL', default=False)
+DB_POOL_MIN = env.int('DB_POOL_MIN', default=1)
+DB_POOL_MAX = env.int('DB_POOL_MAX', default=4)
+# Segundos de espera por una conexión libre antes de fallar
+DB_POOL_TIMEOUT = env.float('DB_POOL_TIMEOUT', default=10)
+# Segundos que vive una conexión ociosa (por encima de DB_POOL_MIN) y cualquier conexión
+DB_POOL_MAX_IDLE = env.float('DB_POOL_MAX_IDLE', default=600)
+DB_POOL_MAX_LIFETIME = env.float('DB_POOL_MAX_LIFETIME', default=1800)
+
+
+def configurar_conexiones(base_de_datos):
+    """
+    Agrega a `base_de_datos` (una entrada de DATABASES) la reutilización de
+    conexiones configurada con DB_*: el pool de psycopg 3 si DB_POOL está activo
+    y es PostgreSQL, o conexiones persistentes en los demás casos.
+    """
+    base_de_datos = dict(base_de_datos, CONN_MAX_AGE=DB_CONN_MAX_AGE, CONN_HEALTH_CHECKS=DB_CONN_HEALTH_CHECKS)
+    if DB_POOL and base_de_datos['ENGINE'] == 'django.db.backends.postgresql':
+        base_de_datos['OPTIONS'] = dict(base_de_datos.get('OPTIONS', {}), pool={
+            'min_size': DB_POOL_MIN,
+            'max_size': DB_POOL_MAX,
+            'timeout': DB_POOL_TIMEOUT,
+            'max_idle': DB_POOL_MAX_IDLE,
+            'max_lifetime': DB_POOL_MAX_LIFETIME,
+        })
+        # Django no admite conexiones persistentes junto con el pool. Con
+        # CONN_HEALTH_CHECKS el pool verifica cada conexión al entregarla.
+        base_de_datos['CONN_MAX_AGE'] = 0
+    return base_de_datos
+
+
+DATABASES['default'] = configurar_conexiones(DATABASES['default'])
 # --- Password validation ---
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -144,7 +198,8 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # ============================================================================
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT con caché de usuarios: sin consulta a la base de datos por petición
+        'apps.users.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -176,15 +231,128 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Caché de usuarios de CachedJWTAuthentication: vida de cada fila (segundos),
+# máximo de usuarios por proceso y cada cuántos segundos se revisan
+# invalidaciones hechas por otros workers. Las invalidaciones viajan por la
+# caché de Django (CACHES, más abajo): con la caché en memoria del proceso no
+# llegan a otros workers y la vida de cada fila baja a USERS_AUTH_CACHE_TTL_LOCAL
+USERS_AUTH_CACHE_TTL = env.int('USERS_AUTH_CACHE_TTL', default=60)
+USERS_AUTH_CACHE_TTL_LOCAL = env.int('USERS_AUTH_CACHE_TTL_LOCAL', default=5)
+USERS_AUTH_CACHE_MAX = env.int('USERS_AUTH_CACHE_MAX', default=1024)
+USERS_AUTH_CACHE_SYNC = env.int('USERS_AUTH_CACHE_SYNC', default=5)
+# Refresh tokens revocados: cada cuántos segundos cada worker trae las
+# revocaciones de los demás y cada cuántos se borran las vencidas
+USERS_REVOCADOS_SYNC = env.int('USERS_REVOCADOS_SYNC', default=5)
+USERS_REVOCADOS_PURGA = env.int('USERS_REVOCADOS_PURGA', default=3600)
+# Importación masiva de usuarios: filas por transacción y procesos para
+# hashear contraseñas (0 = uno por CPU, 1 = sin pool de procesos)
+USERS_IMPORTAR_LOTE = env.int('USERS_IMPORTAR_LOTE', default=1000)
+USERS_IMPORTAR_PROCESOS = env.int('USERS_IMPORTAR_PROCESOS', default=0)
+# Filas como máximo por petición a /api/auth/users/importar/. Se hashean una
+# tras otra dentro de la petición (PBKDF2, ~0,3 s cada contraseña), así que el
+# tope debe entrar en el timeout del worker (30 s por defecto en gunicorn); los
+# archivos más grandes se importan con manage.py importar_usuarios
+USERS_IMPORTAR_MAX_FILAS = env.int('USERS_IMPORTAR_MAX_FILAS', default=50)
+
+# ============================================================================
+# CACHÉ
+# ============================================================================
+# Por defecto en memoria del proceso; con varios workers conviene una caché
+# compartida, p. ej. CACHE_URL=filecache:///tmp/reservas_cache o redis://...
+# (la necesitan la invalidación de la caché de usuarios y el catálogo)
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# ============================================================================
+# SONDAS DE SALUD
+# ============================================================================
+# La sonda de readiness reutiliza el estado de la base de datos durante
+# HEALTH_DB_CACHE segundos y espera como máximo HEALTH_DB_TIMEOUT segundos
+# una comprobación nueva. HEALTH_DB_MUESTRAS: pings para los percentiles.
+HEALTH_DB_CACHE = env.float('HEALTH_DB_CACHE', default=5)
+HEALTH_DB_TIMEOUT = env.float('HEALTH_DB_TIMEOUT', default=2)
+HEALTH_DB_MUESTRAS = env.int('HEALTH_DB_MUESTRAS', default=120)
+
+# ============================================================================
+# MÉTRICAS
+# ============================================================================
+# Directorio donde cada worker vuelca sus métricas (como máximo cada
+# METRICS_VOLCADO segundos) para que /metrics sume las de todos; vacío = cada
+# proceso informa solo lo suyo.
+# Acceso a /metrics: con METRICS_TOKEN (Authorization: Bearer <token>) o desde
+# una IP o red de METRICS_IPS (REMOTE_ADDR, p. ej. 10.0.0.0/8). Sin ninguno de
+# los dos responde 403; el acceso anónimo hay que pedirlo con METRICS_PUBLICO.
+METRICS_DIR = env('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'reservas_citas_metricas'))
+METRICS_VOLCADO = env.float('METRICS_VOLCADO', default=1)
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+METRICS_IPS = env.list('METRICS_IPS', default=[])
+METRICS_PUBLICO = env.bool('METRICS_PUBLICO', default=False)
+
+# ============================================================================
+# INSPECCIÓN DE CONSULTAS SQL
+# ============================================================================
+# QUERY_INSPECTOR: activa los encabezados X-Query-* (sin definir = igual a DEBUG).
+# Se avisa en el log si una petición supera QUERY_PRESUPUESTO consultas o
+# repite una misma consulta QUERY_NPLUSONE_MIN veces o más (posible N+1).
+QUERY_INSPECTOR = env.bool('QUERY_INSPECTOR', default=None)
+QUERY_PRESUPUESTO = env.int('QUERY_PRESUPUESTO', default=50)
+QUERY_NPLUSONE_MIN = env.int('QUERY_NPLUSONE_MIN', default=3)
+
+# ============================================================================
+# ADMIN
+# ============================================================================
+# Máximo de filas que cuenta el paginador del admin en un listado filtrado
+# (sin filtros, en PostgreSQL, usa la estimación de la tabla)
+ADMIN_CONTEO_MAX = env.int('ADMIN_CONTEO_MAX', default=10000)
+
+# ============================================================================
+# AGENDA DE CITAS
+# ============================================================================
+# Horario de atención usado para calcular la disponibilidad (HH:MM)
+CITAS_HORARIO_INICIO = env('CITAS_HORARIO_INICIO', default='08:00')
+CITAS_HORARIO_FIN = env('CITAS_HORARIO_FIN', default='18:00')
+# Separación entre horarios ofrecidos; 0 = usar la duración del servicio
+CITAS_INTERVALO_MINUTOS = env.int('CITAS_INTERVALO_MINUTOS', default=0)
+# Máximo de días que se pueden consultar en una sola petición de disponibilidad
+CITAS_DISPONIBILIDAD_MAX_DIAS = env.int('CITAS_DISPONIBILIDAD_MAX_DIAS', default=62)
+# Máximo de citas por petición en la reserva por lote
+CITAS_LOTE_MAX = env.int('CITAS_LOTE_MAX', default=200)
+# Filas leídas por bloque al exportar citas en streaming
+CITAS_EXPORTAR_CHUNK_SIZE = env.int('CITAS_EXPORTAR_CHUNK_SIZE', default=2000)
+# Catálogo de servicios en caché: vida de las entradas y max-age para los clientes (segundos)
+CITAS_CATALOGO_TIMEOUT = env.int('CITAS_CATALOGO_TIMEOUT', default=3600)
+CITAS_CATALOGO_MAX_AGE = env.int('CITAS_CATALOGO_MAX_AGE', default=60)
+# Máximo de días que abarca un reporte de ocupación e ingresos
+CITAS_REPORTE_MAX_DIAS = env.int('CITAS_REPORTE_MAX_DIAS', default=1096)
+# Margen (segundos) con que manage.py actualizar_resumen vuelve a mirar las
+# citas modificadas antes de su última corrida (transacciones que confirmaron tarde)
+CITAS_RESUMEN_MARGEN = env.int('CITAS_RESUMEN_MARGEN', default=300)
+
 # ============================================================================
 # SWAGGER / OpenAPI
 # ============================================================================
+# /docs/, /redoc/, /swagger/ y /openapi.json/. Sin ellas drf_yasg no se carga.
+API_DOCS = env.bool('API_DOCS', default=True)
+if API_DOCS:
+    INSTALLED_APPS.append('drf_yasg')
+# Esquema generado en el build (python manage.py generar_openapi). Si falta,
+# cada proceso lo genera en la primera petición.
+OPENAPI_ESQUEMA = env('OPENAPI_ESQUEMA', default=str(BASE_DIR / 'openapi.json'))
+# max-age del esquema (solo cambia con un deploy; el ETag cubre el resto)
+OPENAPI_MAX_AGE = env.int('OPENAPI_MAX_AGE', default=86400)
+
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         'Bearer': {'type': 'apiKey', 'name': 'Authorization', 'in': 'header'}
     },
     'USE_SESSION_AUTH': False,
     'JSON_EDITOR': True,
+    # Las páginas descargan el esquema precalculado en lugar de generarlo
+    'SPEC_URL': ('openapi', {'format': '.json'}),
+}
+REDOC_SETTINGS = {
+    'SPEC_URL': ('openapi', {'format': '.json'}),
 }
 
 # ============================================================================
@@ -10,6 +10,7 @@ DATABASES = {
         "NAME": BASE_DIR / "db.sqlite3",
     }
 }
+DATABASES['default'] = configurar_conexiones(DATABASES['default'])
 
 # CORS durante dev (ajusta según necesites)
 CORS_ALLOWED_ORIGINS = env.list('CORS_ALLOWED_ORIGINS', default=[
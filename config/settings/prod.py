@@ -32,6 +32,17 @@ else:
             "NAME": BASE_DIR / "db.sqlite3",
         }
     }
+# Conexiones persistentes o pool de psycopg 3 (ver DB_* en base.py)
+DATABASES['default'] = configurar_conexiones(DATABASES['default'])
+
+# ============================================================================
+# CACHÉ
+# ============================================================================
+# Caché en archivos: la comparten todos los workers de Gunicorn de la instancia,
+# así la invalidación del catálogo de servicios llega a todos
+CACHES = {
+    'default': env.cache('CACHE_URL', default='filecache:///tmp/reservas_citas_cache'),
+}
 
 # ============================================================================
 # SEGURIDAD HTTPS
@@ -1,25 +1,11 @@
 """
 URL configuration for reservas_citas project.
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-# Configuración de Swagger/OpenAPI
-schema_view = get_schema_view(
-   openapi.Info(
-      title="API de Reservas de Citas",
-      default_version='v1',
-      description="API REST para gestión de citas y servicios",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="contact@reservas.local"),
-      license=openapi.License(name="MIT License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
+from apps.core import documentacion
+from apps.core.views import metrics
 
 urlpatterns = [
     # Admin
@@ -32,9 +18,16 @@ urlpatterns = [
         path('health/', include('apps.core.urls')),
     ])),
     
-    # Documentación Swagger
-    path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-    path('docs/', schema_view.with_ui('swagger', cache_timeout=0), name='docs'),
+    # Métricas para Prometheus
+    path('metrics', metrics, name='metrics'),
 ]
+
+# Documentación Swagger (esquema precalculado, ver apps/core/documentacion.py)
+if settings.API_DOCS:
+    urlpatterns += [
+        path('openapi<format>/', documentacion.esquema, name='openapi'),
+        path('swagger<format>/', documentacion.esquema, name='schema-json'),
+        path('swagger/', documentacion.swagger_ui, name='schema-swagger-ui'),
+        path('redoc/', documentacion.redoc, name='schema-redoc'),
+        path('docs/', documentacion.swagger_ui, name='docs'),
+    ]
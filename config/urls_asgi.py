@@ -0,0 +1,23 @@
+"""
+URLs del modo ASGI (ASGI_VISTAS_ASYNC, activado por config/asgi.py).
+
+Son las mismas rutas de config.urls, pero los listados de citas y servicios
+cuyos ViewSets tienen versión asíncrona (alist, amis_citas, apendientes) y las
+sondas de salud se atienden dentro del event loop con el ORM asíncrono.
+Ver apps.core.asincronas.
+"""
+from django.urls import include, path
+
+from apps.citas.urls import urlpatterns as citas_urlpatterns
+from apps.core.asincronas import rutas_asincronas
+from apps.core.views import liveness_async, readiness_async
+
+from .urls import urlpatterns as urlpatterns_wsgi
+
+urlpatterns = [
+    path('api/citas/', include(rutas_asincronas(citas_urlpatterns))),
+    path('api/health/', readiness_async, name='health'),
+    path('api/health/live/', liveness_async, name='health-live'),
+    path('api/health/ready/', readiness_async, name='health-ready'),
+    path('api/health/health/', readiness_async, name='health-legacy'),
+] + urlpatterns_wsgi